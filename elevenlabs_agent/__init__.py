@@ -1,4 +1,33 @@
 # -*- coding: utf-8 -*-
 
+from odoo.tools import SQL
+
 from . import models
-from . import controllers
\ No newline at end of file
+from . import controllers
+from .models.elevenlabs_usage_partition import KEY_TABLES, PARTITIONED_TABLES
+
+
+def uninstall_hook(env):
+    """
+    Drop the tables created outside the ORM, which it does not remove:
+    also the usage tables once converted to partitioned tables (with
+    their partitions) and the former tables of a conversion in progress
+    """
+    env.cr.execute("""
+        SELECT relname
+          FROM pg_class
+         WHERE relkind = 'p'
+           AND relname IN %s
+           AND relnamespace = current_schema()::regnamespace
+    """, [PARTITIONED_TABLES])
+    partitioned = [row[0] for row in env.cr.fetchall()]
+    env.cr.execute(SQL("DROP TABLE IF EXISTS %s CASCADE", SQL(", ").join(
+        SQL.identifier(table)
+        for table in [
+            'elevenlabs_product_search',
+            'elevenlabs_agent_usage_journal',
+            *(key_table for key_table, _columns in KEY_TABLES.values()),
+            *(table + '_heap' for table in PARTITIONED_TABLES),
+            *partitioned,
+        ]
+    )))
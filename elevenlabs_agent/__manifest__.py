@@ -59,6 +59,7 @@ Previous Fixes:
     'data': [
         'security/ir.model.access.csv',
         'security/elevenlabs_agent_security.xml',
+        'data/ir_cron.xml',
         'views/res_config_settings_views.xml',
         'views/assets.xml',
         'views/website_templates.xml',
@@ -73,4 +74,5 @@ Previous Fixes:
     'application': True,
     'auto_install': False,
     'license': 'LGPL-3',
+    'uninstall_hook': 'uninstall_hook',
 }
\ No newline at end of file
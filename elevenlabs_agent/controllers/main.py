@@ -2,9 +2,34 @@
 
 from odoo import http
 from odoo.http import request
+import hashlib
+import hmac
 import json
 import uuid
 
+from ..tools import cache, metrics, profiling
+from ..tools.rate_limiter import get_rate_limiter
+
+# Maximum number of usage events accepted by /api/elevenlabs/usage/batch
+MAX_BATCH_EVENTS = 100
+
+# Maximum number of products served by /api/elevenlabs/products/cards
+MAX_CARD_PRODUCTS = 20
+
+# Seconds browsers may reuse card payloads before revalidating them
+CARD_CACHE_MAX_AGE = 300
+
+# Maximum number of IDs and SKUs resolved by /api/elevenlabs/products/lookup
+MAX_LOOKUP_PRODUCTS = 50
+
+# Size and time to live (seconds) of the SKU to product ID cache
+SKU_CACHE_MAX_SIZE = 10000
+SKU_CACHE_TTL = 300
+
+# Seconds browsers and proxies keep a versioned widget config (one year)
+CONFIG_CACHE_MAX_AGE = 31536000
+
+
 class ElevenLabsController(http.Controller):
 
     # ============================================================
@@ -12,6 +37,8 @@ class ElevenLabsController(http.Controller):
     # ============================================================
 
     @http.route('/api/elevenlabs/usage/check', type='json', auth='public', methods=['POST'], csrf=False)
+    @metrics.instrument_route
+    @profiling.profile_route
     def check_usage_limits(self, **kwargs):
         """
         Check if user can start the widget based on usage limits.
@@ -25,61 +52,51 @@ class ElevenLabsController(http.Controller):
         }
         """
         try:
-            # Get settings
-            daily_limit = int(request.env['ir.config_parameter'].sudo().get_param(
-                'elevenlabs_agent.daily_usage_limit', '0'))
-            global_limit = int(request.env['ir.config_parameter'].sudo().get_param(
-                'elevenlabs_agent.global_usage_limit', '0'))
-
-            # Get current user info
-            user = request.env.user
-            is_public = user._is_public()
-
-            # Get user identifiers
-            if is_public:
-                user_id = None
-                # Generate public user ID from IP
-                ip_address = self._get_client_ip()
-                public_user_id = request.env['elevenlabs.agent.usage'].get_or_create_public_user_id(ip_address)
-            else:
-                user_id = user.id
-                public_user_id = None
-
-            # Check daily limit
-            daily_check = request.env['elevenlabs.agent.usage'].check_daily_limit(
-                user_id=user_id,
-                public_user_id=public_user_id,
-                daily_limit=daily_limit
-            )
+            visitor = self._get_visitor()
+            rate_limited = self._check_rate_limit('usage', visitor=visitor)
+            if rate_limited:
+                return dict(rate_limited, allowed=False)
 
-            # Check global limit
-            global_check = request.env['elevenlabs.agent.usage'].check_global_limit(
-                global_limit=global_limit
-            )
+            return dict(self._evaluate_usage_limits(visitor), success=True)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'allowed': False  # Fail closed for safety
+            }
 
-            # Determine if allowed
-            allowed = daily_check['allowed'] and global_check['allowed']
+    @http.route('/api/elevenlabs/bootstrap', type='json', auth='public', methods=['POST'], csrf=False)
+    @metrics.instrument_route
+    @profiling.profile_route
+    def bootstrap(self, **kwargs):
+        """
+        Everything per visitor the widget needs to start, in one uncached
+        round trip: the visitor identity and profile, and the usage limit
+        verdicts. The site-wide settings come from the versioned config
+        endpoint instead.
 
-            # Build reason if not allowed
-            reason = None
-            if not allowed:
-                reasons = []
-                if not daily_check['allowed']:
-                    reasons.append(f"Daily limit of {daily_limit} messages reached.")
-                if not global_check['allowed']:
-                    reasons.append(f"Global limit of {global_limit} messages reached.")
-                reason = " ".join(reasons)
+        Returns: dict with {
+            'success': bool,
+            'allowed': bool,
+            'reason': str if not allowed,
+            'daily_limit': dict,
+            'global_limit': dict,
+            'is_public': bool,
+            'user_id': int or None,
+            'public_user_id': str or None,
+            'user': dict with {user_id, user_name, user_login, user_email,
+                               user_is_public, user_is_admin, user_is_vip}
+        }
+        """
+        try:
+            visitor = self._get_visitor()
+            rate_limited = self._check_rate_limit('usage', visitor=visitor)
+            if rate_limited:
+                return dict(rate_limited, allowed=False)
 
-            return {
-                'success': True,
-                'allowed': allowed,
-                'reason': reason,
-                'daily_limit': daily_check,
-                'global_limit': global_check,
-                'is_public': is_public,
-                'user_id': user_id,
-                'public_user_id': public_user_id
-            }
+            result = self._evaluate_usage_limits(visitor)
+            result.update(success=True, user=self._get_user_profile())
+            return result
         except Exception as e:
             return {
                 'success': False,
@@ -87,7 +104,132 @@ class ElevenLabsController(http.Controller):
                 'allowed': False  # Fail closed for safety
             }
 
+    def _get_visitor(self):
+        """
+        Identify the current visitor, hashing the client IP once for public users.
+
+        Returns: dict with {'user_id', 'public_user_id', 'is_public'}
+        """
+        user = request.env.user
+        if user._is_public():
+            return {
+                'user_id': None,
+                'public_user_id': request.env['elevenlabs.agent.usage'].get_or_create_public_user_id(
+                    self._get_client_ip()),
+                'is_public': True,
+            }
+        return {'user_id': user.id, 'public_user_id': None, 'is_public': False}
+
+    def _get_user_profile(self):
+        """
+        Per-user data used by the widget for targeting and debugging,
+        formerly stamped on the page.
+
+        Returns: dict with {user_id, user_name, user_login, user_email,
+        user_is_public, user_is_admin, user_is_vip}
+        """
+        user = request.env.user
+        if user._is_public():
+            return {
+                'user_id': 0,
+                'user_name': 'Public User',
+                'user_login': '',
+                'user_email': '',
+                'user_is_public': True,
+                'user_is_admin': False,
+                'user_is_vip': False,
+            }
+        return {
+            'user_id': user.id,
+            'user_name': user.name,
+            'user_login': user.login,
+            'user_email': user.email or '',
+            'user_is_public': False,
+            'user_is_admin': user.has_group('base.group_system'),
+            'user_is_vip': user._is_elevenlabs_vip(),
+        }
+
+    @http.route('/api/elevenlabs/config/<string:version>.json', type='http', auth='public',
+                methods=['GET'], csrf=False)
+    @metrics.instrument_route
+    @profiling.profile_route
+    def get_widget_config(self, version, **kwargs):
+        """
+        Site-wide widget settings, at a URL versioned by their content hash.
+
+        The current version is served as immutable for a year, so browsers
+        and proxies only fetch it once per settings change. Pages rendered
+        before a change still point to the old version: they get the
+        current settings, but uncached.
+
+        Returns: JSON with the typed widget settings and their version
+        """
+        settings = request.env['elevenlabs.settings'].sudo()
+        current_version = settings.get_widget_config_version()
+        body = json.dumps(dict(settings.get_widget_config(), version=current_version), sort_keys=True)
+
+        if version == current_version:
+            cache_control = 'public, max-age=%s, immutable' % CONFIG_CACHE_MAX_AGE
+        else:
+            cache_control = 'no-cache'
+        response = request.make_response(body, headers=[
+            ('Content-Type', 'application/json'),
+            ('Cache-Control', cache_control),
+        ])
+        response.set_etag(current_version)
+        return response.make_conditional(request.httprequest)
+
+    def _evaluate_usage_limits(self, visitor):
+        """
+        Check the daily and global limits of a visitor against the settings snapshot.
+
+        Returns: dict with {allowed, reason, daily_limit, global_limit, is_public, user_id, public_user_id}
+        """
+        settings = request.env['elevenlabs.settings'].sudo()
+        daily_limit = settings.get('daily_usage_limit')
+        global_limit = settings.get('global_usage_limit')
+        Usage = request.env['elevenlabs.agent.usage']
+
+        # Check daily limit
+        daily_check = Usage.check_daily_limit(
+            user_id=visitor['user_id'],
+            public_user_id=visitor['public_user_id'],
+            daily_limit=daily_limit
+        )
+
+        # Check global limit
+        global_check = Usage.check_global_limit(
+            global_limit=global_limit
+        )
+
+        # Determine if allowed
+        allowed = daily_check['allowed'] and global_check['allowed']
+
+        # Build reason if not allowed
+        reason = None
+        if not allowed:
+            reasons = []
+            if not daily_check['allowed']:
+                metrics.count_limit_denial('daily_limit')
+                reasons.append(f"Daily limit of {daily_limit} messages reached.")
+            if not global_check['allowed']:
+                metrics.count_limit_denial('global_limit')
+                reasons.append(f"Global limit of {global_limit} messages reached.")
+            reason = " ".join(reasons)
+
+        return {
+            'allowed': allowed,
+            'reason': reason,
+            'daily_limit': daily_check,
+            'global_limit': global_check,
+            'is_public': visitor['is_public'],
+            'user_id': visitor['user_id'],
+            'public_user_id': visitor['public_user_id']
+        }
+
     @http.route('/api/elevenlabs/usage/session/start', type='json', auth='public', methods=['POST'], csrf=False)
+    @metrics.instrument_route
+    @profiling.profile_route
     def start_session(self, session_id, user_id=None, public_user_id=None, user_agent=None, referrer=None, **kwargs):
         """
         Record the start of a new conversation session.
@@ -102,30 +244,11 @@ class ElevenLabsController(http.Controller):
         Returns: dict with session info
         """
         try:
-            # Get IP address
-            ip_address = self._get_client_ip()
-
-            # Create usage record
-            usage_vals = {
-                'session_id': session_id,
-                'ip_address': ip_address,
-                'user_agent': user_agent,
-                'referrer': referrer,
-            }
+            rate_limited = self._check_rate_limit('usage')
+            if rate_limited:
+                return rate_limited
 
-            if user_id and user_id != '0' and user_id != 0:
-                usage_vals['user_id'] = int(user_id)
-            else:
-                usage_vals['public_user_id'] = public_user_id
-
-            usage = request.env['elevenlabs.agent.usage'].sudo().create(usage_vals)
-
-            return {
-                'success': True,
-                'session_id': session_id,
-                'message_count': 1,
-                'usage_id': usage.id
-            }
+            return self._start_usage_session(session_id, user_id, public_user_id, user_agent, referrer)
         except Exception as e:
             return {
                 'success': False,
@@ -133,6 +256,8 @@ class ElevenLabsController(http.Controller):
             }
 
     @http.route('/api/elevenlabs/usage/message', type='json', auth='public', methods=['POST'], csrf=False)
+    @metrics.instrument_route
+    @profiling.profile_route
     def record_message(self, session_id, **kwargs):
         """
         Record a message in a session (triggered by agent_response event).
@@ -149,29 +274,11 @@ class ElevenLabsController(http.Controller):
         }
         """
         try:
-            # Get session limit
-            session_limit = int(request.env['ir.config_parameter'].sudo().get_param(
-                'elevenlabs_agent.max_messages_per_conversation', '0'))
+            rate_limited = self._check_rate_limit('usage')
+            if rate_limited:
+                return rate_limited
 
-            # Increment message count
-            new_count = request.env['elevenlabs.agent.usage'].increment_session_messages(session_id)
-
-            if new_count is False:
-                return {
-                    'success': False,
-                    'error': 'Session not found'
-                }
-
-            # Check if limit exceeded
-            limit_exceeded = session_limit > 0 and new_count > session_limit
-
-            return {
-                'success': True,
-                'message_count': new_count,
-                'limit_exceeded': limit_exceeded,
-                'limit': session_limit,
-                'remaining': max(0, session_limit - new_count) if session_limit > 0 else -1
-            }
+            return self._record_usage_message(session_id)
         except Exception as e:
             return {
                 'success': False,
@@ -179,6 +286,8 @@ class ElevenLabsController(http.Controller):
             }
 
     @http.route('/api/elevenlabs/usage/session/end', type='json', auth='public', methods=['POST'], csrf=False)
+    @metrics.instrument_route
+    @profiling.profile_route
     def end_session(self, session_id, **kwargs):
         """
         Mark a session as ended.
@@ -189,9 +298,69 @@ class ElevenLabsController(http.Controller):
         Returns: dict with success status
         """
         try:
-            success = request.env['elevenlabs.agent.usage'].sudo().end_session(session_id)
+            rate_limited = self._check_rate_limit('usage')
+            if rate_limited:
+                return rate_limited
+
+            return self._end_usage_session(session_id)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    @http.route('/api/elevenlabs/usage/batch', type='json', auth='public', methods=['POST'], csrf=False)
+    @metrics.instrument_route
+    @profiling.profile_route
+    def record_usage_batch(self, events=None, **kwargs):
+        """
+        Apply an ordered batch of usage events in a single request and transaction.
+        The widget buffers its session start/message/end events and flushes
+        them here instead of sending one request per event. Each event runs
+        in its own savepoint: an event that fails is rolled back alone and
+        reported in its result, the other events are kept.
+
+        Args:
+            events: List of event dicts, each with a 'type' key:
+                - 'start': session_id, user_id, public_user_id, user_agent, referrer
+                - 'message': session_id
+                - 'end': session_id
+
+        Returns: dict with {
+            'success': bool,
+            'results': list of per-event results, in request order,
+            'limit_exceeded': bool (a message went over the conversation limit)
+        }
+        """
+        try:
+            events = events or []
+            if not isinstance(events, list):
+                return {
+                    'success': False,
+                    'error': 'events must be a list'
+                }
+            if len(events) > MAX_BATCH_EVENTS:
+                return {
+                    'success': False,
+                    'error': 'Too many events in batch (max %s)' % MAX_BATCH_EVENTS
+                }
+
+            rate_limited = self._check_rate_limit('usage', cost=max(1, len(events)))
+            if rate_limited:
+                return rate_limited
+
+            results = []
+            for event in events:
+                try:
+                    with request.env.cr.savepoint():
+                        results.append(self._apply_usage_event(event))
+                except Exception as e:
+                    results.append({'success': False, 'error': str(e)})
+
             return {
-                'success': success
+                'success': True,
+                'results': results,
+                'limit_exceeded': any(result.get('limit_exceeded') for result in results)
             }
         except Exception as e:
             return {
@@ -199,7 +368,85 @@ class ElevenLabsController(http.Controller):
                 'error': str(e)
             }
 
+    def _apply_usage_event(self, event):
+        """Apply one event of a usage batch, see record_usage_batch()"""
+        event_type = isinstance(event, dict) and event.get('type')
+        session_id = isinstance(event, dict) and event.get('session_id')
+        if not session_id:
+            return {'success': False, 'error': 'session_id is required'}
+        if event_type == 'start':
+            return self._start_usage_session(
+                session_id,
+                user_id=event.get('user_id'),
+                public_user_id=event.get('public_user_id'),
+                user_agent=event.get('user_agent'),
+                referrer=event.get('referrer'),
+            )
+        if event_type == 'message':
+            return self._record_usage_message(session_id)
+        if event_type == 'end':
+            return self._end_usage_session(session_id)
+        return {'success': False, 'error': 'Unknown event type: %s' % event_type}
+
+    def _get_usage_writer(self):
+        """Model recording the usage events: the usage records, or the write-behind journal"""
+        if request.env['elevenlabs.settings'].sudo().get('usage_write_mode') == 'journal':
+            return request.env['elevenlabs.agent.usage.journal'].sudo()
+        return request.env['elevenlabs.agent.usage'].sudo()
+
+    def _start_usage_session(self, session_id, user_id=None, public_user_id=None, user_agent=None, referrer=None):
+        """Record a conversation session, once per session_id"""
+        if user_id and user_id != '0' and user_id != 0:
+            user_id = int(user_id)
+        else:
+            user_id = None
+
+        result = self._get_usage_writer().start_session(
+            session_id,
+            user_id=user_id,
+            public_user_id=public_user_id,
+            ip_address=self._get_client_ip(),
+            user_agent=user_agent,
+            referrer=referrer,
+        )
+
+        return {
+            'success': True,
+            'session_id': session_id,
+            'message_count': result['message_count'],
+            'usage_id': result['usage_id'],
+            'created': result['created']
+        }
+
+    def _record_usage_message(self, session_id):
+        """Count a message in a session and evaluate the conversation limit"""
+        # Get session limit
+        session_limit = request.env['elevenlabs.settings'].sudo().get('max_messages_per_conversation')
+
+        # Increment message count and evaluate the limit in one statement
+        result = self._get_usage_writer().record_session_message(
+            session_id, session_limit=session_limit)
+
+        if result is False:
+            return {
+                'success': False,
+                'error': 'Session not found'
+            }
+        if result['limit_exceeded']:
+            metrics.count_limit_denial('conversation_limit')
+
+        return {'success': True, 'session_id': session_id, **result}
+
+    def _end_usage_session(self, session_id):
+        """Mark a session as ended"""
+        success = self._get_usage_writer().end_session(session_id)
+        return {
+            'success': success
+        }
+
     @http.route('/api/elevenlabs/usage/client-ip', type='json', auth='public', methods=['POST'], csrf=False)
+    @metrics.instrument_route
+    @profiling.profile_route
     def get_client_info(self, **kwargs):
         """
         Get client IP and generate public user ID.
@@ -211,6 +458,10 @@ class ElevenLabsController(http.Controller):
         }
         """
         try:
+            rate_limited = self._check_rate_limit('usage')
+            if rate_limited:
+                return rate_limited
+
             ip_address = self._get_client_ip()
             public_user_id = request.env['elevenlabs.agent.usage'].get_or_create_public_user_id(ip_address)
 
@@ -225,6 +476,47 @@ class ElevenLabsController(http.Controller):
                 'error': str(e)
             }
 
+    def _check_rate_limit(self, scope, cost=1, visitor=None):
+        """
+        Apply the configured rate limiter to the current visitor.
+
+        Args:
+            scope: Name of the endpoint group being limited
+            cost: Number of units consumed by the call
+            visitor: Visitor already identified by _get_visitor(), if any
+
+        Returns: None if the call is allowed, otherwise a dict with the
+        rate limiting error to return to the client
+        """
+        settings = request.env['elevenlabs.settings'].sudo()
+        if not settings.get('rate_limit_enabled'):
+            return None
+
+        limiter = get_rate_limiter(
+            request.env.cr.dbname,
+            algorithm=settings.get('rate_limit_algorithm'),
+            limit=max(1, settings.get('rate_limit_requests')),
+            window=max(1, settings.get('rate_limit_window')),
+            backend=settings.get('rate_limit_backend'),
+            redis_url=settings.get('rate_limit_redis_url'),
+        )
+
+        visitor = visitor or self._get_visitor()
+        if visitor['is_public']:
+            client_key = visitor['public_user_id']
+        else:
+            client_key = 'user_%s' % visitor['user_id']
+
+        decision = limiter.hit('%s:%s:%s' % (request.env.cr.dbname, scope, client_key), cost=cost)
+        if decision.allowed:
+            return None
+        metrics.count_limit_denial('rate_limited')
+        return {
+            'success': False,
+            'error': 'rate_limited',
+            'retry_after': round(decision.retry_after, 1)
+        }
+
     def _get_client_ip(self):
         """
         Get the client's IP address, checking various headers.
@@ -270,6 +562,8 @@ class ElevenLabsController(http.Controller):
         })
     
     @http.route('/api/elevenlabs/product/sku/<string:sku>', type='json', auth='public', methods=['POST'])
+    @metrics.instrument_route
+    @profiling.profile_route
     def get_product_by_sku(self, sku, **kwargs):
         """API endpoint to fetch product details by SKU"""
         product = request.env['product.product'].sudo().search([
@@ -279,21 +573,17 @@ class ElevenLabsController(http.Controller):
         ], limit=1)
         
         if product:
-            # Get the product image URL
-            image_url = None
-            if product.image_1920:
-                image_url = '/web/image/product.product/%s/image_1920' % product.id
-            
+            data = product._elevenlabs_serialize()[0]
             return {
                 'success': True,
                 'product': {
-                    'id': product.id,
-                    'name': product.name,
-                    'price': str(product.list_price),
-                    'image': image_url,
-                    'description': product.description_sale or '',
-                    'in_stock': product.qty_available > 0,
-                    'qty_available': product.qty_available
+                    'id': data['id'],
+                    'name': data['name'],
+                    'price': str(data['list_price']),
+                    'image': data['image'],
+                    'description': data['description_sale'],
+                    'in_stock': data['in_stock'],
+                    'qty_available': data['qty_available']
                 }
             }
         
@@ -319,6 +609,8 @@ class ElevenLabsController(http.Controller):
     @http.route('/api/elevenlabs/cart/add', type='json', auth='public', website=True, methods=['POST'])
     
     @http.route('/api/elevenlabs/product/<int:product_id>', type='json', auth='public', methods=['POST'])
+    @metrics.instrument_route
+    @profiling.profile_route
     def get_product_details(self, product_id, **kwargs):
         """Get detailed product information"""
         try:
@@ -326,39 +618,209 @@ class ElevenLabsController(http.Controller):
             if not product.exists():
                 return {'success': False, 'error': 'Product not found'}
             
-            # Get product images
-            images = []
-            if product.image_1920:
-                images.append(f'/web/image/product.product/{product.id}/image_1920')
-            
-            # Get product attributes/variants
-            variants = []
-            if product.product_template_attribute_value_ids:
-                for attr_value in product.product_template_attribute_value_ids:
-                    variants.append({
-                        'attribute': attr_value.attribute_id.name,
-                        'value': attr_value.name
-                    })
-            
+            data = product._elevenlabs_serialize()[0]
             return {
                 'success': True,
                 'product': {
-                    'id': product.id,
-                    'name': product.name,
-                    'sku': product.default_code or '',
-                    'price': product.list_price,
-                    'description': product.description_sale or product.description or '',
-                    'images': images,
-                    'in_stock': product.qty_available > 0,
-                    'qty_available': product.qty_available,
-                    'variants': variants,
-                    'category': product.categ_id.name if product.categ_id else None
+                    'id': data['id'],
+                    'name': data['name'],
+                    'sku': data['sku'],
+                    'price': data['list_price'],
+                    'description': data['description_sale'] or data['description'],
+                    'images': [data['image']] if data['image'] else [],
+                    'in_stock': data['in_stock'],
+                    'qty_available': data['qty_available'],
+                    'variants': data['variants'],
+                    'category': data['category']
                 }
             }
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    @http.route('/api/elevenlabs/products/cards', type='http', auth='public', methods=['GET'], csrf=False)
+    @metrics.instrument_route
+    @profiling.profile_route
+    def get_product_cards(self, ids='', **kwargs):
+        """
+        Card payloads of published products, cacheable by browsers and CDNs
+
+        Args:
+            ids: Comma-separated product.product IDs
+
+        Returns: JSON with {success, cards} in the requested order, with a
+        strong ETag so unchanged payloads are revalidated with a 304
+        """
+        try:
+            product_ids = []
+            for product_id in (ids or '').split(','):
+                product_id = product_id.strip()
+                if product_id.isdigit() and int(product_id) not in product_ids:
+                    product_ids.append(int(product_id))
+            product_ids = product_ids[:MAX_CARD_PRODUCTS]
+
+            products = request.env['product.product'].sudo().search([
+                ('id', 'in', product_ids),
+                ('sale_ok', '=', True),
+                ('website_published', '=', True),
+            ])
+            cards_by_id = {card['id']: card for card in products._elevenlabs_card_payload()}
+            body = json.dumps({
+                'success': True,
+                'cards': [cards_by_id[product_id] for product_id in product_ids if product_id in cards_by_id]
+            }, sort_keys=True)
+        except Exception as e:
+            return request.make_json_response({'success': False, 'error': str(e)}, status=500)
+
+        response = request.make_response(body, headers=[
+            ('Content-Type', 'application/json'),
+            ('Cache-Control', 'public, max-age=%s' % CARD_CACHE_MAX_AGE),
+        ])
+        response.set_etag(hashlib.sha256(body.encode()).hexdigest())
+        return response.make_conditional(request.httprequest)
+
+    @http.route('/api/elevenlabs/products/lookup', type='json', auth='public', methods=['POST'], csrf=False)
+    @metrics.instrument_route
+    @profiling.profile_route
+    def lookup_products(self, ids=None, skus=None, **kwargs):
+        """
+        Card payloads of several published products in one round trip
+
+        Args:
+            ids: List of product.product IDs
+            skus: List of SKUs (internal reference or barcode)
+
+        Returns: dict with {
+            'success': bool,
+            'results': list of dicts with {key ('id' or 'sku'), value,
+                not_found, product (card payload or None)}, for the IDs
+                then the SKUs, in the requested order,
+            'not_found': dict with {ids, skus} matching no published product
+        }
+        """
+        try:
+            if not self._is_lookup_list(ids) or not self._is_lookup_list(skus):
+                return {
+                    'success': False,
+                    'error': 'invalid_products',
+                    'error_message': 'ids and skus must be lists of product IDs and SKUs.'
+                }
+
+            requested = []
+            for value in ids or []:
+                product_id = str(value).strip()
+                requested.append(('id', int(product_id) if product_id.isdigit() else value))
+            for value in skus or []:
+                requested.append(('sku', str(value).strip()))
+            if len(requested) > MAX_LOOKUP_PRODUCTS:
+                return {
+                    'success': False,
+                    'error': 'too_many_products',
+                    'max_products': MAX_LOOKUP_PRODUCTS
+                }
+
+            sku_ids, products = self._resolve_lookup_products(requested)
+            cards_by_id = {card['id']: card for card in products._elevenlabs_card_payload()}
+
+            results = []
+            not_found = {'ids': [], 'skus': []}
+            for key, value in requested:
+                product_id = value if key == 'id' else sku_ids.get(value)
+                card = cards_by_id.get(product_id) if isinstance(product_id, int) else None
+                results.append({
+                    'key': key,
+                    'value': value,
+                    'not_found': card is None,
+                    'product': card
+                })
+                if card is None:
+                    not_found[key + 's'].append(value)
+
+            return {
+                'success': True,
+                'results': results,
+                'not_found': not_found
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def _is_lookup_list(self, values):
+        """Returns: whether ``values`` is None or a list of integers and strings"""
+        if values is None:
+            return True
+        return isinstance(values, list) and all(
+            isinstance(value, (int, str)) and not isinstance(value, bool) for value in values)
+
+    def _resolve_lookup_products(self, requested):
+        """
+        Fetch the published products matching the requested IDs and SKUs
+        in a single query on indexed columns. SKUs are first looked up in
+        the SKU cache; a cached product is only trusted while it is still
+        published with that SKU, so the SKUs are matched on the default
+        code and barcode in the same query and the ones the cache misses,
+        or whose product changed, are resolved from its result. The SKUs
+        found are cached for the next lookups. SKUs without a match are
+        not cached: a product published with that SKU is found by the
+        next lookup.
+
+        Args:
+            requested: list of ('id', int) and ('sku', str)
+
+        Returns: tuple (dict mapping each requested SKU to a product ID,
+        0 when unknown; product.product recordset)
+        """
+        Product = request.env['product.product'].sudo()
+        sku_cache = cache.get_cache(
+            request.env.cr.dbname, cache.PRODUCT_SKU_CACHE, max_size=SKU_CACHE_MAX_SIZE, ttl=SKU_CACHE_TTL)
+
+        product_ids = {value for key, value in requested if key == 'id' and isinstance(value, int)}
+        skus = {value for key, value in requested if key == 'sku' and value}
+        cached_ids = {}
+        for sku in skus:
+            product_id = sku_cache.get(sku)
+            if product_id is not None:
+                cached_ids[sku] = product_id
+
+        if not product_ids and not skus:
+            return {}, Product
+
+        products = Product.search_fetch([
+            ('sale_ok', '=', True),
+            ('website_published', '=', True),
+            '|', '|',
+            ('id', 'in', list(product_ids | set(cached_ids.values()))),
+            ('default_code', 'in', list(skus)),
+            ('barcode', 'in', list(skus)),
+        ], ['default_code', 'barcode'])
+
+        sku_ids = dict.fromkeys(skus, 0)
+        products_by_id = {product.id: product for product in products}
+        for sku, product_id in cached_ids.items():
+            product = products_by_id.get(product_id)
+            if product and sku in (product.default_code, product.barcode):
+                sku_ids[sku] = product_id
+
+        # Like the single SKU endpoint, the default code takes precedence
+        # over the barcode and the first product in search order wins
+        missing_skus = {sku for sku in skus if not sku_ids[sku]}
+        for field_name in ('default_code', 'barcode'):
+            for product in products:
+                sku = product[field_name]
+                if sku in missing_skus and not sku_ids[sku]:
+                    sku_ids[sku] = product.id
+        for sku in missing_skus:
+            if sku_ids[sku]:
+                sku_cache.set(sku, sku_ids[sku])
+
+        # Products fetched only through a stale cache entry are not returned
+        matched_ids = product_ids | set(sku_ids.values())
+        return sku_ids, products.filtered(lambda product: product.id in matched_ids)
+
     @http.route('/api/elevenlabs/products/recommended', type='json', auth='public', methods=['POST'])
+    @metrics.instrument_route
+    @profiling.profile_route
     def get_recommended_products(self, category_id=None, limit=6, **kwargs):
         """Get recommended products for display"""
         domain = [('sale_ok', '=', True), ('website_published', '=', True)]
@@ -369,19 +831,15 @@ class ElevenLabsController(http.Controller):
         products = request.env['product.product'].sudo().search(domain, limit=limit)
         
         result = []
-        for product in products:
-            image_url = None
-            if product.image_1920:
-                image_url = '/web/image/product.product/%s/image_1920' % product.id
-            
+        for data in products._elevenlabs_serialize():
             result.append({
-                'id': product.id,
-                'sku': product.default_code or '',
-                'name': product.name,
-                'price': str(product.list_price),
-                'image': image_url,
-                'description': product.description_sale or '',
-                'url': '/shop/product/%s' % product.id
+                'id': data['id'],
+                'sku': data['sku'],
+                'name': data['name'],
+                'price': str(data['list_price']),
+                'image': data['image'],
+                'description': data['description_sale'],
+                'url': data['url']
             })
         
         return {
@@ -390,6 +848,8 @@ class ElevenLabsController(http.Controller):
         }
     
     @http.route('/api/elevenlabs/products/search', type='json', auth='public', methods=['POST'])
+    @metrics.instrument_route
+    @profiling.profile_route
     def search_products(self, query='', category=None, min_price=None, max_price=None,
                         in_stock_only=False, limit=6, **kwargs):
         """
@@ -415,69 +875,162 @@ class ElevenLabsController(http.Controller):
                 'total_count': 0
             }
 
+        # Prices are compared as floats: normalize them before they reach
+        # the cache key, so equal bounds share an entry
+        try:
+            min_price = self._parse_price(min_price)
+            max_price = self._parse_price(max_price)
+        except (TypeError, ValueError):
+            return {
+                'success': False,
+                'error': 'invalid_price',
+                'error_message': 'Price filters must be numbers.',
+                'products': [],
+                'total_count': 0
+            }
+
+        settings = request.env['elevenlabs.settings'].sudo()
+
         # Get category include/exclude settings
-        categories_include = request.env['ir.config_parameter'].sudo().get_param(
-            'elevenlabs_agent.product_categories_include', '')
-        categories_exclude = request.env['ir.config_parameter'].sudo().get_param(
-            'elevenlabs_agent.product_categories_exclude', '')
+        categories_include = settings.get('product_categories_include')
+        categories_exclude = settings.get('product_categories_exclude')
 
         # Parse comma-separated category IDs/names
         include_list = [c.strip() for c in categories_include.split(',') if c.strip()] if categories_include else []
         exclude_list = [c.strip() for c in categories_exclude.split(',') if c.strip()] if categories_exclude else []
 
+        search_mode = settings.get('product_search_mode')
+        if search_mode == 'fulltext' and not request.env['elevenlabs.product.search.index'].sudo()._is_ready():
+            # the index is still being built
+            search_mode = 'ilike'
+
+        # Repeated searches are answered from the result cache. Word order
+        # and case do not change the matches, so the key uses the sorted
+        # lowercased words of the query.
+        search_cache = None
+        result = None
+        if settings.get('product_search_cache_enabled'):
+            search_cache = cache.get_cache(
+                request.env.cr.dbname, cache.PRODUCT_SEARCH_CACHE,
+                max_size=max(1, settings.get('product_search_cache_size')),
+                ttl=max(1, settings.get('product_search_cache_ttl')),
+            )
+            cache_key = (
+                tuple(sorted({w.lower() for w in query.split()})),
+                (category or '').strip().lower(),
+                min_price, max_price, bool(in_stock_only), limit,
+                tuple(include_list), tuple(exclude_list),
+                search_mode, request.env.lang,
+            )
+            result = search_cache.get(cache_key)
+
+        if result is None:
+            result = self._search_catalog_products(
+                query, category, min_price, max_price, in_stock_only, limit, search_mode)
+            if search_cache is not None:
+                search_cache.set(cache_key, result)
+
+        # If no products found in database, search static catalog
+        if not result:
+            result = self._search_static_catalog(query, category, min_price, max_price, in_stock_only, limit, include_list, exclude_list)
+
+        return {
+            'success': True,
+            'products': result,
+            'total_count': len(result),
+            'query': query,
+            'filters_applied': {
+                'category': category,
+                'min_price': min_price,
+                'max_price': max_price,
+                'in_stock_only': in_stock_only,
+                'categories_include': include_list if include_list else None,
+                'categories_exclude': exclude_list if exclude_list else None
+            }
+        }
+
+    @http.route('/api/elevenlabs/products/search/cache-stats', type='json', auth='user', methods=['POST'])
+    @metrics.instrument_route
+    @profiling.profile_route
+    def get_search_cache_stats(self, **kwargs):
+        """
+        Hit/miss counters of the product search cache of the worker
+        handling the request, for tuning its size and TTL
+
+        Returns: dict with {success, caches}
+        """
+        if not request.env.user.has_group('base.group_system'):
+            return {
+                'success': False,
+                'error': 'access_denied'
+            }
+        return {
+            'success': True,
+            'caches': cache.get_stats(request.env.cr.dbname)
+        }
+
+    @http.route('/api/elevenlabs/metrics', type='http', auth='public', methods=['GET'], csrf=False)
+    def get_metrics(self, **kwargs):
+        """
+        Metrics of the worker handling the request in the Prometheus text
+        format: per-route request counts, latency and SQL query count
+        histograms, limit denials and result cache hit ratios.
+
+        Scrapers authenticate with the configured metrics token as a
+        bearer token; administrators can also open it from their session.
+        """
+        token = request.env['elevenlabs.settings'].sudo().get('metrics_token')
+        authorization = request.httprequest.headers.get('Authorization', '')
+        authorized = bool(token) and hmac.compare_digest(authorization.encode(), ('Bearer %s' % token).encode())
+        if not authorized and not request.env.user.has_group('base.group_system'):
+            return request.make_response('Forbidden\n', headers=[('Content-Type', 'text/plain')], status=403)
+
+        body = metrics.render(cache_stats=cache.get_stats(request.env.cr.dbname))
+        return request.make_response(body, headers=[
+            ('Content-Type', 'text/plain; version=0.0.4; charset=utf-8'),
+            ('Cache-Control', 'no-store'),
+        ])
+
+    def _parse_price(self, value):
+        """
+        Returns: float, or None when no price is given
+
+        Raises: TypeError or ValueError when the value is not a number
+        """
+        if value is None or value == '':
+            return None
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise TypeError("Invalid price: %r" % (value,))
+        return float(value)
+
+    def _search_catalog_products(self, query, category=None, min_price=None, max_price=None,
+                                 in_stock_only=False, limit=6, search_mode='ilike'):
+        """
+        Search the published products of the database
+
+        Returns: list of product dicts as returned by /api/elevenlabs/products/search
+        """
         # Import expression module for proper domain building
         from odoo.osv import expression
 
         # Base domain - only saleable and published products
         domain = [('sale_ok', '=', True), ('website_published', '=', True)]
 
+        # Category include/exclude settings, resolved once into public
+        # category IDs including their children
+        include_ids, exclude_ids = request.env['elevenlabs.settings'].sudo().get_product_category_ids()
+
         # Apply category include filter (if set, only products in these categories will be shown)
-        if include_list:
-            # Try to find category IDs by name or use directly as IDs
-            category_ids = []
-            category_names = []
-            for cat in include_list:
-                # Try to find as ID first
-                try:
-                    cat_id = int(cat)
-                    category_ids.append(cat_id)
-                except ValueError:
-                    # Not an ID, treat as name
-                    category_names.append(cat)
-
-            # Build domain for included categories
-            include_domain_parts = []
-            if category_ids:
-                include_domain_parts.append([('public_categ_ids', 'in', category_ids)])
-            if category_names:
-                for cat_name in category_names:
-                    include_domain_parts.append([('public_categ_ids.name', 'ilike', cat_name)])
-
-            if include_domain_parts:
-                # OR logic between all include conditions
-                include_domain = expression.OR(include_domain_parts) if len(include_domain_parts) > 1 else include_domain_parts[0]
-                domain = expression.AND([domain, include_domain])
+        if include_ids is not None:
+            domain = expression.AND([domain, [('public_categ_ids', 'in', list(include_ids))]])
 
         # Apply category exclude filter (products in these categories will be hidden)
-        if exclude_list:
-            # Try to find category IDs by name or use directly as IDs
-            category_ids = []
-            category_names = []
-            for cat in exclude_list:
-                # Try to find as ID first
-                try:
-                    cat_id = int(cat)
-                    category_ids.append(cat_id)
-                except ValueError:
-                    # Not an ID, treat as name
-                    category_names.append(cat)
-
-            # Build domain for excluded categories
-            if category_ids:
-                domain = expression.AND([domain, [('public_categ_ids', 'not in', category_ids)]])
-            if category_names:
-                for cat_name in category_names:
-                    domain = expression.AND([domain, [('public_categ_ids.name', 'not ilike', cat_name)]])
+        if exclude_ids:
+            domain = expression.AND([domain, [('public_categ_ids', 'not in', list(exclude_ids))]])
+
+        # Full-text mode ranks matches through the indexed search documents,
+        # the text condition is then not part of the domain
+        use_fulltext = search_mode == 'fulltext'
 
         # Split query into words for better matching
         # This allows "wireless mouse" to find products with both words anywhere
@@ -486,7 +1039,7 @@ class ElevenLabsController(http.Controller):
         # Build search domain using Odoo's expression module
         # For each word, create an OR group of field matches
         # All word groups are ANDed together (all words must match)
-        if words:
+        if words and not use_fulltext:
             word_domains = []
             for word in words:
                 # For each word, match ANY field (OR logic within the word)
@@ -523,70 +1076,37 @@ class ElevenLabsController(http.Controller):
         if in_stock_only:
             domain = expression.AND([domain, [('qty_available', '>', 0)]])
 
-        # Search products - order by name for consistent results
-        products = request.env['product.product'].sudo().search(domain, limit=limit, order='name ASC')
+        if use_fulltext:
+            # Search products - best match first
+            products = request.env['elevenlabs.product.search.index'].sudo().search_ranked(query, domain, limit)
+        else:
+            # Search products - order by name for consistent results
+            products = request.env['product.product'].sudo().search(domain, limit=limit, order='name ASC')
 
         # Build enhanced result structure for AI
         result = []
-        for product in products:
-            image_url = None
-            if product.image_1920:
-                image_url = '/web/image/product.product/%s/image_1920' % product.id
-
+        for data in products._elevenlabs_serialize():
             # Get short description for AI consumption
-            description = product.description_sale or product.description or ''
+            description = data['description_sale'] or data['description']
             short_desc = description[:200] + '...' if len(description) > 200 else description
 
-            # Get category information
-            category_name = None
-            if product.categ_id:
-                category_name = product.categ_id.name
-
             result.append({
-                'id': product.id,
-                'sku': product.default_code or '',
-                'name': product.name,
-                'price': float(product.list_price),
-                'price_formatted': '${:.2f}'.format(product.list_price),
-                'image': image_url,
+                'id': data['id'],
+                'sku': data['sku'],
+                'name': data['name'],
+                'price': float(data['list_price']),
+                'price_formatted': '${:.2f}'.format(data['list_price']),
+                'image': data['image'],
                 'description': description,
                 'short_description': short_desc,
-                'category': category_name,
-                'in_stock': product.qty_available > 0,
-                'stock_quantity': int(product.qty_available),
-                'url': '/shop/product/%s' % product.id,
-                'variants': self._get_product_variants(product)
+                'category': data['category'],
+                'in_stock': data['in_stock'],
+                'stock_quantity': int(data['qty_available']),
+                'url': data['url'],
+                'variants': data['variants']
             })
 
-        # If no products found in database, search static catalog
-        if not result:
-            result = self._search_static_catalog(query, category, min_price, max_price, in_stock_only, limit, include_list, exclude_list)
-
-        return {
-            'success': True,
-            'products': result,
-            'total_count': len(result),
-            'query': query,
-            'filters_applied': {
-                'category': category,
-                'min_price': min_price,
-                'max_price': max_price,
-                'in_stock_only': in_stock_only,
-                'categories_include': include_list if include_list else None,
-                'categories_exclude': exclude_list if exclude_list else None
-            }
-        }
-
-    def _get_product_variants(self, product):
-        """Extract product variant/attribute information"""
-        variants = []
-        if product.product_template_attribute_value_ids:
-            for attr_value in product.product_template_attribute_value_ids:
-                variants.append({
-                    'attribute': attr_value.attribute_id.name,
-                    'value': attr_value.name
-                })
-        return variants
+        return result
 
     def _search_static_catalog(self, query, category=None, min_price=None, max_price=None,
                                 in_stock_only=False, limit=6, include_list=None, exclude_list=None):
@@ -739,6 +1259,8 @@ class ElevenLabsController(http.Controller):
     # ============================================================================
 
     @http.route('/api/elevenlabs/session/init', type='json', auth='public', methods=['GET', 'POST'])
+    @metrics.instrument_route
+    @profiling.profile_route
     def session_init(self, **kwargs):
         """
         Initialize a new session or retrieve existing session info.
@@ -750,6 +1272,10 @@ class ElevenLabsController(http.Controller):
             - isNewSession: Boolean indicating if this is a new session
         """
         try:
+            rate_limited = self._check_rate_limit('session')
+            if rate_limited:
+                return rate_limited
+
             # Get current user
             current_user = request.env.user
 
@@ -797,6 +1323,8 @@ class ElevenLabsController(http.Controller):
             }
 
     @http.route('/api/elevenlabs/session/record', type='json', auth='public', methods=['POST'])
+    @metrics.instrument_route
+    @profiling.profile_route
     def session_record(self, sessionId=None, userId=None, userIdentifier=None, **kwargs):
         """
         Record usage for a session.
@@ -812,6 +1340,10 @@ class ElevenLabsController(http.Controller):
             - isNewRecord: Boolean indicating if a new record was created
         """
         try:
+            rate_limited = self._check_rate_limit('session')
+            if rate_limited:
+                return rate_limited
+
             if not sessionId:
                 return {
                     'success': False,
@@ -846,6 +1378,8 @@ class ElevenLabsController(http.Controller):
             }
 
     @http.route('/api/elevenlabs/session/check', type='json', auth='public', methods=['GET', 'POST'])
+    @metrics.instrument_route
+    @profiling.profile_route
     def session_check(self, userId=None, userIdentifier=None, sessionId=None, **kwargs):
         """
         Check if user has exceeded any usage limits.
@@ -858,7 +1392,7 @@ class ElevenLabsController(http.Controller):
         Returns:
             - canShowWidget: Boolean indicating if widget should be shown
             - dailyUsage: Current daily message count
-            - globalUsage: Current all-time message count
+            - globalUsage: Message count over the usage history window
             - sessionUsage: Current session message count
             - dailyLimit: Daily limit setting
             - globalLimit: Global limit setting
@@ -866,6 +1400,10 @@ class ElevenLabsController(http.Controller):
             - reason: Reason if limit exceeded (null if OK)
         """
         try:
+            rate_limited = self._check_rate_limit('session')
+            if rate_limited:
+                return dict(rate_limited, canShowWidget=False)
+
             # Get limit settings
             daily_limit = int(request.env['ir.config_parameter'].sudo().get_param(
                 'elevenlabs_agent.daily_usage_limit', '50'))
@@ -881,9 +1419,12 @@ class ElevenLabsController(http.Controller):
                 daily_limit=daily_limit,
                 global_limit=global_limit,
                 session_limit=session_limit,
-                session_id=sessionId
+                session_id=sessionId,
+                history_days=request.env['elevenlabs.settings'].sudo().get('usage_history_window_days')
             )
 
+            if result.get('reason'):
+                metrics.count_limit_denial(result['reason'].replace('_exceeded', ''))
             result['success'] = True
             return result
         except Exception as e:
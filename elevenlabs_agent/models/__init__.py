@@ -1,6 +1,15 @@
 # -*- coding: utf-8 -*-
 
+from . import elevenlabs_settings
 from . import res_config_settings
 from . import res_users
 from . import elevenlabs_usage
 from . import elevenlabs_agent_usage
+from . import elevenlabs_agent_usage_daily
+from . import elevenlabs_agent_usage_journal
+from . import elevenlabs_usage_partition
+from . import elevenlabs_usage_retention
+from . import product_search_index
+from . import product_product
+from . import product_template
+from . import product_public_category
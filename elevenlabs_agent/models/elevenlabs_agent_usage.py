@@ -3,7 +3,11 @@
 from odoo import models, fields, api
 from odoo.exceptions import ValidationError
 import hashlib
-from datetime import datetime, timedelta
+import logging
+
+from .elevenlabs_usage_partition import SESSION_KEY_TABLE
+
+_logger = logging.getLogger(__name__)
 
 
 class ElevenLabsAgentUsage(models.Model):
@@ -64,6 +68,13 @@ class ElevenLabsAgentUsage(models.Model):
         readonly=True
     )
 
+    last_activity_date = fields.Datetime(
+        string='Last Activity',
+        default=fields.Datetime.now,
+        readonly=True,
+        help='When the last message of this session was recorded'
+    )
+
     # Additional metadata
     user_agent = fields.Char(
         string='User Agent',
@@ -75,14 +86,189 @@ class ElevenLabsAgentUsage(models.Model):
         help='Page referrer'
     )
 
+    def init(self):
+        # Fold duplicate rows left by repeated session starts into the oldest
+        # one, then guarantee a single row per conversation
+        self.env.cr.execute("""
+            WITH dup AS (
+                SELECT session_id,
+                       MIN(id) AS keep_id,
+                       SUM(message_count) AS message_count,
+                       MIN(session_start_date) AS session_start_date,
+                       MAX(session_end_date) AS session_end_date,
+                       bool_or(is_active) AS is_active
+                  FROM elevenlabs_agent_usage
+              GROUP BY session_id
+                HAVING COUNT(*) > 1
+            ), merged AS (
+                UPDATE elevenlabs_agent_usage u
+                   SET message_count = dup.message_count,
+                       session_start_date = dup.session_start_date,
+                       session_end_date = dup.session_end_date,
+                       is_active = dup.is_active
+                  FROM dup
+                 WHERE u.id = dup.keep_id
+            )
+            DELETE FROM elevenlabs_agent_usage u
+                  USING dup
+                  WHERE u.session_id = dup.session_id
+                    AND u.id <> dup.keep_id
+        """)
+        # Partitioned storage enforces it through the session key table
+        partitioned = self.env['elevenlabs.usage.partition']._is_partitioned(self._table)
+        if not partitioned:
+            self.env.cr.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS elevenlabs_agent_usage_session_id_unique
+                    ON elevenlabs_agent_usage (session_id)
+            """)
+        else:
+            # The ORM does not add columns to partitioned tables
+            self.env.cr.execute("""
+                ALTER TABLE elevenlabs_agent_usage ADD COLUMN IF NOT EXISTS last_activity_date TIMESTAMP
+            """)
+
+        # Only active sessions are scanned by the inactivity job
+        self.env.cr.execute("""
+            UPDATE elevenlabs_agent_usage
+               SET last_activity_date = COALESCE(write_date, create_date)
+             WHERE is_active AND last_activity_date IS NULL
+        """)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS elevenlabs_agent_usage_active_last_activity_idx
+                ON elevenlabs_agent_usage (last_activity_date)
+             WHERE is_active
+        """)
+
     @api.constrains('user_id', 'public_user_id')
     def _check_user_identification(self):
         """Ensure either user_id or public_user_id is set, but not both"""
         for record in self:
-            if not record.user_id and not record.public_user_id:
-                raise ValidationError("Either User or Public User ID must be set.")
-            if record.user_id and record.public_user_id:
-                raise ValidationError("Cannot set both User and Public User ID.")
+            self._validate_user_identification(record.user_id.id, record.public_user_id)
+
+    @api.model
+    def _validate_user_identification(self, user_id, public_user_id):
+        if not user_id and not public_user_id:
+            raise ValidationError("Either User or Public User ID must be set.")
+        if user_id and public_user_id:
+            raise ValidationError("Cannot set both User and Public User ID.")
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        # Sessions start with their first message counted
+        self.env['elevenlabs.agent.usage.daily'].add_usage([
+            (record.user_id.id or None, record.public_user_id or None, record.message_count)
+            for record in records
+        ])
+        return records
+
+    @api.model
+    def start_session(self, session_id, user_id=None, public_user_id=None, ip_address=None,
+                      user_agent=None, referrer=None, day=None):
+        """
+        Record the start of a conversation in a single idempotent statement.
+
+        Duplicate start events, page reloads and retries of the same
+        conversation hit the unique session_id index (or the session key
+        table with partitioned storage) and return the existing row; only a
+        genuinely new session counts its first message in the daily rollup,
+        of ``day`` (default: today).
+
+        Returns: dict with {
+            'usage_id': int,
+            'message_count': int,
+            'created': bool
+        }
+        """
+        user_id = user_id or None
+        public_user_id = None if user_id else public_user_id
+        self._validate_user_identification(user_id, public_user_id)
+
+        columns = """
+            (session_id, user_id, public_user_id, ip_address, user_agent, referrer,
+             message_count, is_active, session_start_date, last_activity_date,
+             create_uid, create_date, write_uid, write_date)
+        """
+        values = """
+            %(session_id)s, %(user_id)s, %(public_user_id)s, %(ip_address)s,
+            %(user_agent)s, %(referrer)s,
+            1, TRUE, (now() at time zone 'UTC'), (now() at time zone 'UTC'),
+            %(uid)s, (now() at time zone 'UTC'), %(uid)s, (now() at time zone 'UTC')
+        """
+        rollup = self.env['elevenlabs.agent.usage.daily']._get_upsert_query('(SELECT * FROM src WHERE created) src')
+
+        if self.env['elevenlabs.usage.partition']._is_partitioned(self._table):
+            # Partitions cannot hold a unique session_id index: the row is
+            # only inserted when its key is new in the session key table
+            query = """
+                WITH session_key AS (
+                    INSERT INTO %(key_table)s (session_id, create_date)
+                    VALUES (%%(session_id)s, (now() at time zone 'UTC'))
+                    ON CONFLICT (session_id) DO NOTHING
+                    RETURNING session_id
+                ), src AS (
+                    INSERT INTO elevenlabs_agent_usage %(columns)s
+                    SELECT %(values)s FROM session_key
+                 RETURNING id, message_count, user_id, public_user_id, 1 AS amount, TRUE AS created
+                ), rollup AS (
+                    %(rollup)s
+                )
+                SELECT id, message_count, created FROM src
+            """ % {'key_table': SESSION_KEY_TABLE, 'columns': columns, 'values': values, 'rollup': rollup}
+        else:
+            # xmax is only zero on rows inserted by this statement
+            query = """
+                WITH src AS (
+                    INSERT INTO elevenlabs_agent_usage %(columns)s
+                    VALUES (%(values)s)
+                    ON CONFLICT (session_id) DO UPDATE
+                       SET last_activity_date = EXCLUDED.last_activity_date,
+                           write_uid = EXCLUDED.write_uid,
+                           write_date = EXCLUDED.write_date
+                 RETURNING id, message_count, user_id, public_user_id, 1 AS amount, (xmax = 0) AS created
+                ), rollup AS (
+                    %(rollup)s
+                )
+                SELECT id, message_count, created FROM src
+            """ % {'columns': columns, 'values': values, 'rollup': rollup}
+
+        self.env.cr.execute(query, {
+            'uid': self.env.uid,
+            'session_id': session_id,
+            'user_id': user_id,
+            'public_user_id': public_user_id,
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'referrer': referrer,
+            'day': day or fields.Date.today(),
+        })
+        row = self.env.cr.fetchone()
+        partition = self.env['elevenlabs.usage.partition']
+        # The session key already existed. Its row is read by a separate
+        # statement: when a concurrent start just inserted it, the
+        # snapshot of the statement above predates that row. A row not
+        # moved yet by the conversion to partitions is moved first.
+        while not row:
+            self.env.cr.execute("""
+                SELECT id, message_count, FALSE
+                  FROM elevenlabs_agent_usage
+                 WHERE session_id = %s
+              ORDER BY id
+                 LIMIT 1
+            """, [session_id])
+            row = self.env.cr.fetchone()
+            if row or not partition._move_heap_sessions(self._table, [session_id]):
+                break
+        if not row:
+            # The key outlived its session row, which was already purged
+            return {'usage_id': False, 'message_count': 0, 'created': False}
+        usage_id, message_count, created = row
+        self.invalidate_model(['last_activity_date', 'write_uid', 'write_date'])
+        return {
+            'usage_id': usage_id,
+            'message_count': message_count,
+            'created': created
+        }
 
     @api.model
     def get_or_create_public_user_id(self, ip_address):
@@ -98,6 +284,14 @@ class ElevenLabsAgentUsage(models.Model):
         # Use first 16 characters as the public user ID
         return 'public_' + hex_dig[:16]
 
+    @api.model
+    def _get_daily_message_count(self, key):
+        """Today's messages of a rollup key, including the ones still in the write-behind journal"""
+        total_messages = self.env['elevenlabs.agent.usage.daily'].get_message_count(key)
+        if self.env['elevenlabs.settings'].sudo().get('usage_write_mode') == 'journal':
+            total_messages += self.env['elevenlabs.agent.usage.journal'].get_pending_message_count(key)
+        return total_messages
+
     @api.model
     def check_daily_limit(self, user_id=None, public_user_id=None, daily_limit=0):
         """
@@ -113,23 +307,10 @@ class ElevenLabsAgentUsage(models.Model):
         if daily_limit <= 0:
             return {'allowed': True, 'current_count': 0, 'remaining': -1, 'limit': 0}
 
-        # Get today's start
-        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-
-        # Build domain for counting messages
-        domain = [
-            ('create_date', '>=', today_start),
-            ('is_active', '=', True)
-        ]
-
-        if user_id:
-            domain.append(('user_id', '=', user_id))
-        else:
-            domain.append(('public_user_id', '=', public_user_id))
-
-        # Count total messages from all sessions today
-        usage_records = self.search_read(domain, ['message_count'])
-        total_messages = sum(record['message_count'] for record in usage_records)
+        # Single indexed lookup in the daily rollup
+        daily_usage = self.env['elevenlabs.agent.usage.daily']
+        total_messages = self._get_daily_message_count(
+            daily_usage._get_key(user_id=user_id, public_user_id=public_user_id))
 
         return {
             'allowed': total_messages < daily_limit,
@@ -153,17 +334,8 @@ class ElevenLabsAgentUsage(models.Model):
         if global_limit <= 0:
             return {'allowed': True, 'current_count': 0, 'remaining': -1, 'limit': 0}
 
-        # Get today's start
-        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-
-        # Count all messages globally for today
-        domain = [
-            ('create_date', '>=', today_start),
-            ('is_active', '=', True)
-        ]
-
-        usage_records = self.search_read(domain, ['message_count'])
-        total_messages = sum(record['message_count'] for record in usage_records)
+        # Single indexed lookup in the daily rollup
+        total_messages = self._get_daily_message_count('global')
 
         return {
             'allowed': total_messages < global_limit,
@@ -172,6 +344,17 @@ class ElevenLabsAgentUsage(models.Model):
             'limit': global_limit
         }
 
+    @api.model
+    def _search_session(self, session_id):
+        """
+        Returns: the usage record of a session, moving it out of the former
+        table first while the conversion to partitions is in progress
+        """
+        session = self.search([('session_id', '=', session_id)], limit=1)
+        if not session and self.env['elevenlabs.usage.partition']._move_heap_sessions(self._table, [session_id]):
+            session = self.search([('session_id', '=', session_id)], limit=1)
+        return session
+
     @api.model
     def get_session_message_count(self, session_id):
         """
@@ -179,7 +362,7 @@ class ElevenLabsAgentUsage(models.Model):
 
         Returns: int - current message count
         """
-        session = self.search([('session_id', '=', session_id)], limit=1)
+        session = self._search_session(session_id)
         if session:
             return session.message_count
         return 0
@@ -191,11 +374,64 @@ class ElevenLabsAgentUsage(models.Model):
 
         Returns: int - new message count, or False if session not found
         """
-        session = self.search([('session_id', '=', session_id)], limit=1)
-        if session:
-            session.message_count += 1
-            return session.message_count
-        return False
+        result = self.record_session_message(session_id)
+        return result['message_count'] if result else False
+
+    @api.model
+    def record_session_message(self, session_id, session_limit=0):
+        """
+        Atomically increment the message count of a session, add the message
+        to the daily rollup and evaluate the per-conversation limit, in a
+        single UPDATE ... RETURNING statement on the session's unique row.
+
+        Concurrent messages on the same session serialize on the row lock
+        instead of losing increments in an ORM read-modify-write.
+
+        Returns: dict with {
+            'message_count': int,
+            'limit_exceeded': bool,
+            'limit': int,
+            'remaining': int
+        } or False if session not found
+        """
+        # The daily rollup is updated by the same statement
+        query = """
+            WITH src AS (
+                UPDATE elevenlabs_agent_usage
+                   SET message_count = message_count + 1,
+                       last_activity_date = (now() at time zone 'UTC'),
+                       write_uid = %%(uid)s,
+                       write_date = (now() at time zone 'UTC')
+                 WHERE session_id = %%(session_id)s
+             RETURNING message_count, user_id, public_user_id, 1 AS amount
+            ), rollup AS (
+                %s
+            )
+            SELECT message_count FROM src
+        """ % self.env['elevenlabs.agent.usage.daily']._get_upsert_query('src')
+        params = {
+            'uid': self.env.uid,
+            'session_id': session_id,
+            'day': fields.Date.today(),
+        }
+        self.env.cr.execute(query, params)
+        row = self.env.cr.fetchone()
+        if not row and self.env['elevenlabs.usage.partition']._move_heap_sessions(self._table, [session_id]):
+            # the session was not moved to the partitions yet
+            self.env.cr.execute(query, params)
+            row = self.env.cr.fetchone()
+        # The ORM cache may hold the previous value for this session
+        self.invalidate_model(['message_count', 'last_activity_date', 'write_uid', 'write_date'])
+        if not row:
+            return False
+
+        new_count = row[0]
+        return {
+            'message_count': new_count,
+            'limit_exceeded': session_limit > 0 and new_count > session_limit,
+            'limit': session_limit,
+            'remaining': max(0, session_limit - new_count) if session_limit > 0 else -1
+        }
 
     @api.model
     def end_session(self, session_id):
@@ -204,7 +440,7 @@ class ElevenLabsAgentUsage(models.Model):
 
         Returns: bool - True if successful
         """
-        session = self.search([('session_id', '=', session_id)], limit=1)
+        session = self._search_session(session_id)
         if session:
             session.write({
                 'is_active': False,
@@ -213,13 +449,42 @@ class ElevenLabsAgentUsage(models.Model):
             return True
         return False
 
-    def name_get(self):
+    @api.model
+    def _cron_end_inactive_sessions(self):
+        """
+        End every active session without activity for longer than the
+        configured timeout, in a single UPDATE served by the partial index
+        on active sessions.
+
+        Returns: int - number of sessions ended
+        """
+        settings = self.env['elevenlabs.settings'].sudo()
+        if not settings.get('auto_end_inactive_conversations'):
+            return 0
+
+        timeout = max(1, settings.get('inactive_conversation_timeout'))
+        self.flush_model(['is_active', 'last_activity_date', 'session_end_date'])
+        self.env.cr.execute("""
+            UPDATE elevenlabs_agent_usage
+               SET is_active = FALSE,
+                   session_end_date = last_activity_date,
+                   write_uid = %s,
+                   write_date = (now() at time zone 'UTC')
+             WHERE is_active
+               AND last_activity_date < (now() at time zone 'UTC') - make_interval(mins => %s)
+        """, [self.env.uid, timeout])
+        ended = self.env.cr.rowcount
+        self.invalidate_model(['is_active', 'session_end_date', 'write_uid', 'write_date'])
+        _logger.info("ElevenLabs: ended %s sessions inactive for more than %s minutes", ended, timeout)
+        self.env['ir.cron']._notify_progress(done=ended, remaining=0)
+        return ended
+
+    @api.depends('user_id', 'public_user_id', 'session_id', 'message_count')
+    def _compute_display_name(self):
         """Custom display name for records"""
-        result = []
         for record in self:
             if record.user_id:
                 name = f"{record.user_id.name} - {record.session_id[:8]}... ({record.message_count} messages)"
             else:
-                name = f"Public ({record.public_user_id[:16]}...) - {record.session_id[:8]}... ({record.message_count} messages)"
-            result.append((record.id, name))
-        return result
+                name = f"Public ({(record.public_user_id or '')[:16]}...) - {record.session_id[:8]}... ({record.message_count} messages)"
+            record.display_name = name
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api
+
+
+class ElevenLabsAgentUsageDaily(models.Model):
+    _name = 'elevenlabs.agent.usage.daily'
+    _description = 'ElevenLabs Agent Daily Usage Rollup'
+    _order = 'day desc, key'
+    _rec_name = 'key'
+
+    day = fields.Date(
+        string='Day',
+        required=True,
+        readonly=True
+    )
+
+    scope = fields.Selection([
+        ('user', 'Logged-in User'),
+        ('public', 'Public User'),
+        ('global', 'Global'),
+    ], string='Scope',
+        required=True,
+        readonly=True
+    )
+
+    key = fields.Char(
+        string='Key',
+        required=True,
+        readonly=True,
+        help='user:<user id>, public:<public user id> or global'
+    )
+
+    user_id = fields.Many2one(
+        'res.users',
+        string='User',
+        ondelete='cascade',
+        readonly=True
+    )
+
+    public_user_id = fields.Char(
+        string='Public User ID',
+        readonly=True
+    )
+
+    message_count = fields.Integer(
+        string='Message Count',
+        default=0,
+        readonly=True,
+        help='Messages recorded on this day'
+    )
+
+    _sql_constraints = [
+        (
+            'day_key_unique',
+            'UNIQUE(day, key)',
+            'There can only be one usage rollup per day and key.'
+        )
+    ]
+
+    def init(self):
+        # Seed today's rollup from existing sessions when the table is first created
+        self.env.cr.execute("SELECT 1 FROM elevenlabs_agent_usage_daily LIMIT 1")
+        if self.env.cr.fetchone():
+            return
+        today = fields.Date.today()
+        self.env.cr.execute(self._get_upsert_query("""(
+            SELECT user_id, public_user_id, message_count AS amount
+              FROM elevenlabs_agent_usage
+             WHERE create_date >= %(day)s
+        ) src"""), {'day': today, 'uid': self.env.uid})
+
+    @api.model
+    def _get_key(self, user_id=None, public_user_id=None):
+        """Rollup key of a logged-in or public user"""
+        if user_id:
+            return 'user:%s' % user_id
+        return 'public:%s' % public_user_id
+
+    @api.model
+    def _get_upsert_query(self, source):
+        """
+        Build the statement adding usage to the per-user and global rows of a day.
+
+        Args:
+            source: SQL relation aliased ``src`` exposing user_id,
+                public_user_id and amount columns (a CTE, subquery or VALUES list)
+
+        The query expects the named parameters ``day`` and ``uid``.
+        """
+        return """
+            INSERT INTO elevenlabs_agent_usage_daily
+                   (day, scope, key, user_id, public_user_id, message_count,
+                    create_uid, create_date, write_uid, write_date)
+            SELECT %%(day)s, r.scope, r.key, r.user_id, r.public_user_id, sum(r.amount),
+                   %%(uid)s, (now() at time zone 'UTC'), %%(uid)s, (now() at time zone 'UTC')
+              FROM (
+                    SELECT CASE WHEN src.user_id IS NOT NULL THEN 'user' ELSE 'public' END AS scope,
+                           CASE WHEN src.user_id IS NOT NULL THEN 'user:' || src.user_id
+                                ELSE 'public:' || src.public_user_id END AS key,
+                           src.user_id, src.public_user_id, src.amount
+                      FROM %(source)s
+                     UNION ALL
+                    SELECT 'global', 'global', NULL, NULL, src.amount
+                      FROM %(source)s
+                   ) r
+          GROUP BY r.scope, r.key, r.user_id, r.public_user_id
+            ON CONFLICT (day, key) DO UPDATE
+               SET message_count = elevenlabs_agent_usage_daily.message_count + EXCLUDED.message_count,
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+        """ % {'source': source}
+
+    @api.model
+    def add_usage(self, entries, day=None):
+        """
+        Add messages to the daily rollup in a single upsert.
+
+        Args:
+            entries: list of (user_id, public_user_id, amount) tuples
+            day: date of the usage (defaults to today)
+        """
+        entries = [entry for entry in entries if entry[2]]
+        if not entries:
+            return
+        values = ', '.join(
+            self.env.cr.mogrify('(%s::int, %s::varchar, %s::int)', entry).decode().replace('%', '%%')
+            for entry in entries
+        )
+        source = '(VALUES %s) AS src(user_id, public_user_id, amount)' % values
+        self.env.cr.execute(self._get_upsert_query(source), {
+            'day': day or fields.Date.today(),
+            'uid': self.env.uid,
+        })
+        self.invalidate_model(['message_count'])
+
+    @api.model
+    def get_message_count(self, key, day=None):
+        """
+        Messages recorded for a rollup key on a day, as one indexed lookup.
+
+        Returns: int - message count (0 if nothing was recorded)
+        """
+        self.env.cr.execute("""
+            SELECT message_count
+              FROM elevenlabs_agent_usage_daily
+             WHERE day = %s AND key = %s
+        """, (day or fields.Date.today(), key))
+        row = self.env.cr.fetchone()
+        return row[0] if row else 0
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import time
+from collections import defaultdict
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+# Events taken from the journal per flush transaction
+FLUSH_BATCH_SIZE = 5000
+
+# First key of the transaction advisory locks taken per session
+SESSION_LOCK_NAMESPACE = 0x454c4a53
+
+
+class ElevenLabsAgentUsageJournal(models.AbstractModel):
+    """
+    Write-behind journal of widget usage events.
+
+    In journal mode the usage endpoints only append compact rows to an
+    UNLOGGED staging table, which skips the WAL and holds no lock on the
+    usage rows, and a scheduled job merges them into elevenlabs.agent.usage
+    in bulk. Being unlogged, pending events are lost if the database server
+    crashes; they are otherwise kept until flushed.
+    """
+    _name = 'elevenlabs.agent.usage.journal'
+    _description = 'ElevenLabs Agent Usage Journal'
+
+    def init(self):
+        self.env.cr.execute("""
+            CREATE UNLOGGED TABLE IF NOT EXISTS elevenlabs_agent_usage_journal (
+                id BIGSERIAL PRIMARY KEY,
+                event VARCHAR NOT NULL,
+                session_id VARCHAR NOT NULL,
+                user_id INTEGER,
+                public_user_id VARCHAR,
+                ip_address VARCHAR,
+                user_agent VARCHAR,
+                referrer VARCHAR,
+                create_date TIMESTAMP NOT NULL DEFAULT (now() at time zone 'UTC')
+            )
+        """)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS elevenlabs_agent_usage_journal_session_id_idx
+                ON elevenlabs_agent_usage_journal (session_id)
+        """)
+
+    @api.model
+    def _lock_session(self, session_id):
+        """
+        Serialize the events of a session until the end of the transaction,
+        so that reading its state and appending an event cannot interleave
+        with a concurrent request for the same session.
+        """
+        self.env.cr.execute("SELECT pg_advisory_xact_lock(%s, hashtext(%s))", [SESSION_LOCK_NAMESPACE, session_id])
+
+    @api.model
+    def _get_session_state(self, session_id):
+        """
+        Current state of a session, including its pending events.
+
+        Returns: dict with {user_id, public_user_id, message_count, is_active},
+        or None when the session is neither stored nor pending
+        """
+        query = """
+            WITH stored AS (
+                SELECT user_id, public_user_id, message_count, is_active
+                  FROM elevenlabs_agent_usage
+                 WHERE session_id = %(session_id)s
+                 LIMIT 1
+            ), pending AS (
+                SELECT (array_agg(user_id ORDER BY id) FILTER (WHERE event = 'start'))[1] AS user_id,
+                       (array_agg(public_user_id ORDER BY id) FILTER (WHERE event = 'start'))[1] AS public_user_id,
+                       COUNT(*) FILTER (WHERE event = 'start') AS starts,
+                       COUNT(*) FILTER (WHERE event = 'message') AS messages,
+                       COUNT(*) FILTER (WHERE event = 'end') AS ends
+                  FROM elevenlabs_agent_usage_journal
+                 WHERE session_id = %(session_id)s
+            )
+            SELECT COALESCE(stored.user_id, pending.user_id),
+                   COALESCE(stored.public_user_id, pending.public_user_id),
+                   COALESCE(stored.message_count, 1) + pending.messages,
+                   COALESCE(stored.is_active, TRUE) AND pending.ends = 0
+              FROM pending
+         LEFT JOIN stored ON TRUE
+             WHERE stored.message_count IS NOT NULL OR pending.starts > 0
+        """
+        self.env.cr.execute(query, {'session_id': session_id})
+        row = self.env.cr.fetchone()
+        if not row and self.env['elevenlabs.usage.partition']._move_heap_sessions(
+                'elevenlabs_agent_usage', [session_id]):
+            # the session was not moved to the partitions yet
+            self.env.cr.execute(query, {'session_id': session_id})
+            row = self.env.cr.fetchone()
+        if not row:
+            return None
+        return {
+            'user_id': row[0],
+            'public_user_id': row[1],
+            'message_count': row[2],
+            'is_active': row[3],
+        }
+
+    @api.model
+    def _append(self, event, session_id, user_id=None, public_user_id=None, ip_address=None,
+                user_agent=None, referrer=None):
+        self.env.cr.execute("""
+            INSERT INTO elevenlabs_agent_usage_journal
+                   (event, session_id, user_id, public_user_id, ip_address, user_agent, referrer)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, (event, session_id, user_id, public_user_id, ip_address, user_agent, referrer))
+
+    @api.model
+    def start_session(self, session_id, user_id=None, public_user_id=None, ip_address=None,
+                      user_agent=None, referrer=None):
+        """
+        Journal the start of a conversation. Starting a known session again
+        appends nothing.
+
+        Returns: dict with {'usage_id', 'message_count', 'created'} like
+        elevenlabs.agent.usage.start_session, usage_id being False until
+        the session is flushed
+        """
+        user_id = user_id or None
+        public_user_id = None if user_id else public_user_id
+        self.env['elevenlabs.agent.usage']._validate_user_identification(user_id, public_user_id)
+
+        self._lock_session(session_id)
+        state = self._get_session_state(session_id)
+        if state:
+            return {'usage_id': False, 'message_count': state['message_count'], 'created': False}
+        self._append('start', session_id, user_id, public_user_id, ip_address, user_agent, referrer)
+        return {'usage_id': False, 'message_count': 1, 'created': True}
+
+    @api.model
+    def record_session_message(self, session_id, session_limit=0):
+        """
+        Journal a message, evaluating the conversation limit on the stored
+        count plus the pending messages.
+
+        Returns: same dict as elevenlabs.agent.usage.record_session_message,
+        or False if session not found
+        """
+        self._lock_session(session_id)
+        state = self._get_session_state(session_id)
+        if not state:
+            return False
+        self._append('message', session_id, state['user_id'], state['public_user_id'])
+
+        new_count = state['message_count'] + 1
+        return {
+            'message_count': new_count,
+            'limit_exceeded': session_limit > 0 and new_count > session_limit,
+            'limit': session_limit,
+            'remaining': max(0, session_limit - new_count) if session_limit > 0 else -1
+        }
+
+    @api.model
+    def end_session(self, session_id):
+        """
+        Journal the end of a session.
+
+        Returns: bool - True if the session exists
+        """
+        self._lock_session(session_id)
+        state = self._get_session_state(session_id)
+        if not state:
+            return False
+        self._append('end', session_id, state['user_id'], state['public_user_id'])
+        return True
+
+    @api.model
+    def get_pending_message_count(self, key):
+        """
+        Messages of today still waiting in the journal for a daily rollup key.
+
+        Today starts at the same boundary as the daily rollup rows, so the
+        pending events of a day are counted with the rollup of that day.
+
+        Returns: int - pending message count
+        """
+        if key == 'global':
+            condition, params = "TRUE", []
+        elif key.startswith('user:'):
+            condition, params = "user_id = %s", [int(key[len('user:'):])]
+        else:
+            condition, params = "public_user_id = %s", [key[len('public:'):]]
+        self.env.cr.execute("""
+            SELECT COUNT(*)
+              FROM elevenlabs_agent_usage_journal
+             WHERE event IN ('start', 'message')
+               AND create_date >= %%s
+               AND %s
+        """ % condition, [fields.Date.today()] + params)
+        return self.env.cr.fetchone()[0]
+
+    @api.model
+    def _flush(self, limit=FLUSH_BATCH_SIZE):
+        """
+        Merge the oldest journal events into the usage tables.
+
+        Starts go through the idempotent start statement; messages are
+        summed per session and day and applied, with the daily rollup, in one
+        statement per day; ends are applied in one UPDATE.
+
+        Returns: int - number of events flushed
+        """
+        cr = self.env.cr
+        cr.execute("""
+            DELETE FROM elevenlabs_agent_usage_journal
+             WHERE id IN (SELECT id FROM elevenlabs_agent_usage_journal ORDER BY id LIMIT %s)
+         RETURNING id, event, session_id, user_id, public_user_id, ip_address, user_agent, referrer, create_date
+        """, [limit])
+        events = sorted(cr.fetchall())
+        if not events:
+            return 0
+
+        Usage = self.env['elevenlabs.agent.usage']
+        messages = defaultdict(lambda: [0, None])
+        ends = {}
+        for _id, event, session_id, user_id, public_user_id, ip_address, user_agent, referrer, date in events:
+            if event == 'start':
+                # counted on the day of the event, like the pending events
+                Usage.start_session(session_id, user_id=user_id, public_user_id=public_user_id,
+                                    ip_address=ip_address, user_agent=user_agent, referrer=referrer,
+                                    day=date.date())
+            elif event == 'message':
+                message = messages[(date.date(), session_id)]
+                message[0] += 1
+                message[1] = date
+            elif event == 'end':
+                ends[session_id] = date
+
+        # Sessions not moved to the partitions yet are moved before their update
+        self.env['elevenlabs.usage.partition']._move_heap_sessions(
+            'elevenlabs_agent_usage', list({key[1] for key in messages} | set(ends)))
+
+        by_day = defaultdict(list)
+        for (day, session_id), (amount, last_date) in messages.items():
+            by_day[day].append((session_id, amount, last_date))
+        for day, entries in by_day.items():
+            values = ', '.join(
+                cr.mogrify('(%s::varchar, %s::int, %s::timestamp)', entry).decode().replace('%', '%%')
+                for entry in entries
+            )
+            cr.execute("""
+                WITH pending (session_id, amount, last_date) AS (
+                    VALUES %s
+                ), src AS (
+                    UPDATE elevenlabs_agent_usage u
+                       SET message_count = u.message_count + pending.amount,
+                           last_activity_date = GREATEST(u.last_activity_date, pending.last_date),
+                           write_uid = %%(uid)s,
+                           write_date = (now() at time zone 'UTC')
+                      FROM pending
+                     WHERE u.session_id = pending.session_id
+                 RETURNING u.user_id, u.public_user_id, pending.amount
+                ), rollup AS (
+                    %s
+                )
+                SELECT COUNT(*) FROM src
+            """ % (values, self.env['elevenlabs.agent.usage.daily']._get_upsert_query('src')), {
+                'uid': self.env.uid,
+                'day': day,
+            })
+
+        if ends:
+            values = ', '.join(
+                cr.mogrify('(%s::varchar, %s::timestamp)', entry).decode()
+                for entry in ends.items()
+            )
+            cr.execute("""
+                UPDATE elevenlabs_agent_usage u
+                   SET is_active = FALSE,
+                       session_end_date = ended.end_date,
+                       write_uid = %%s,
+                       write_date = (now() at time zone 'UTC')
+                  FROM (VALUES %s) AS ended (session_id, end_date)
+                 WHERE u.session_id = ended.session_id
+            """ % values.replace('%', '%%'), [self.env.uid])
+
+        Usage.invalidate_model()
+        self.env['elevenlabs.agent.usage.daily'].invalidate_model(['message_count'])
+        return len(events)
+
+    @api.model
+    def _cron_flush_journal(self, time_budget=50):
+        """
+        Scheduled flush of the usage journal, one committed batch at a time
+        until it is empty or ``time_budget`` seconds are spent.
+
+        Returns: int - number of events flushed
+        """
+        deadline = time.monotonic() + time_budget
+        flushed = 0
+        while True:
+            count = self._flush()
+            self.env.cr.commit()
+            flushed += count
+            if count < FLUSH_BATCH_SIZE or time.monotonic() >= deadline:
+                break
+        if flushed:
+            _logger.info("ElevenLabs: flushed %s usage journal events", flushed)
+        self.env['ir.cron']._notify_progress(done=flushed, remaining=1 if count == FLUSH_BATCH_SIZE else 0)
+        return flushed
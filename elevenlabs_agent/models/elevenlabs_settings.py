@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+
+from odoo import models, api, tools
+from odoo.http import request
+
+from ..tools import visibility
+
+PARAM_PREFIX = 'elevenlabs_agent.'
+
+# Every elevenlabs_agent.* parameter read by the module: key -> (type, default).
+# Defaults mirror the ones historically used by the website templates.
+SETTINGS_SPEC = {
+    'agent_id': ('char', ''),
+    'enabled': ('bool', False),
+    'widget_position': ('char', 'bottom-right'),
+
+    # Trigger Options
+    'trigger_delay': ('int', 0),
+    'trigger_on_scroll': ('float', 0.0),
+    'trigger_on_time': ('int', 0),
+    'trigger_on_exit_intent': ('bool', False),
+    'show_first_time_visitors_only': ('bool', False),
+
+    # Integration Controls
+    'enable_show_product_card': ('bool', True),
+    'enable_add_to_cart': ('bool', True),
+    'enable_search_products': ('bool', True),
+    'cart_integration_method': ('char', 'direct_add'),
+
+    # Targeting Controls
+    'geographic_restrictions': ('char', ''),
+    'device_filtering': ('char', 'all'),
+    'customer_segment_targeting': ('char', 'all'),
+    'exclude_public_users': ('bool', False),
+
+    # Session Controls
+    'max_messages_per_session': ('int', 0),
+    'conversation_history_retention': ('int', 24),
+    'auto_end_inactive_conversations': ('bool', True),
+    'inactive_conversation_timeout': ('int', 30),
+    'save_user_info': ('bool', False),
+    'enable_conversation_logging': ('bool', False),
+    'daily_usage_limit': ('int', 0),
+    'global_usage_limit': ('int', 0),
+    'usage_history_window_days': ('int', 30),
+    'usage_retention_days': ('int', 30),
+    'conversation_retention_days': ('int', 365),
+    'usage_partitioning': ('bool', False),
+    'usage_write_mode': ('char', 'direct'),
+    'max_messages_per_conversation': ('int', 0),
+    'performance_metrics_dashboard': ('char', ''),
+    'metrics_token': ('char', ''),
+    'profiling_enabled': ('bool', False),
+    'profiling_slow_threshold': ('int', 500),
+    'profiling_sample_rate': ('float', 0.0),
+
+    # Rate Limiting
+    'rate_limit_enabled': ('bool', False),
+    'rate_limit_algorithm': ('char', 'token_bucket'),
+    'rate_limit_requests': ('int', 60),
+    'rate_limit_window': ('int', 60),
+    'rate_limit_backend': ('char', 'memory'),
+    'rate_limit_redis_url': ('char', ''),
+
+    # Product Integration
+    'product_categories_include': ('char', ''),
+    'product_categories_exclude': ('char', ''),
+    'featured_products_priority': ('char', ''),
+    'out_of_stock_handling': ('char', 'hide'),
+    'product_search_mode': ('char', 'ilike'),
+    'product_search_cache_enabled': ('bool', True),
+    'product_search_cache_size': ('int', 512),
+    'product_search_cache_ttl': ('int', 60),
+
+    # Page Visibility Controls
+    'pages_to_show': ('char', ''),
+    'pages_to_hide': ('char', ''),
+
+    # Theme Settings
+    'theme_type': ('char', 'light'),
+    'primary_color': ('char', '#667eea'),
+    'secondary_color': ('char', '#764ba2'),
+    'swiper_url': ('char', 'https://cdn.jsdelivr.net/npm/swiper@11'),
+}
+
+# Site-wide settings served to the widget by the config endpoint
+WIDGET_ATTRIBUTES = [
+    'agent_id',
+    'enabled',
+    'widget_position',
+    'trigger_delay',
+    'trigger_on_scroll',
+    'trigger_on_time',
+    'trigger_on_exit_intent',
+    'show_first_time_visitors_only',
+    'enable_show_product_card',
+    'enable_add_to_cart',
+    'enable_search_products',
+    'cart_integration_method',
+    'geographic_restrictions',
+    'device_filtering',
+    'customer_segment_targeting',
+    'exclude_public_users',
+    'max_messages_per_session',
+    'conversation_history_retention',
+    'auto_end_inactive_conversations',
+    'save_user_info',
+    'enable_conversation_logging',
+    'daily_usage_limit',
+    'global_usage_limit',
+    'max_messages_per_conversation',
+    'product_categories_include',
+    'product_categories_exclude',
+    'featured_products_priority',
+    'out_of_stock_handling',
+    'pages_to_show',
+    'pages_to_hide',
+    'theme_type',
+    'primary_color',
+    'secondary_color',
+    'swiper_url',
+]
+
+
+def _parse_value(value_type, raw, default):
+    """Convert a raw ir.config_parameter string to its typed value"""
+    if raw is None or raw is False:
+        return default
+    if value_type == 'bool':
+        return raw == 'True'
+    try:
+        if value_type == 'int':
+            return int(raw)
+        if value_type == 'float':
+            return float(raw)
+    except (ValueError, TypeError):
+        return default
+    return raw
+
+
+class ElevenLabsSettings(models.AbstractModel):
+    _name = 'elevenlabs.settings'
+    _description = 'ElevenLabs Settings Snapshot'
+
+    @api.model
+    @tools.ormcache()
+    def _get_snapshot(self):
+        """
+        Load every elevenlabs_agent.* parameter in a single query.
+
+        The result is cached per registry (i.e. per database) and dropped
+        whenever the registry cache is cleared, which happens on every
+        ir.config_parameter write and when the settings are saved.
+
+        Returns: frozendict mapping setting name (without prefix) to its typed value
+        """
+        params = self.env['ir.config_parameter'].sudo().search_read(
+            [('key', '=like', PARAM_PREFIX + '%')], ['key', 'value'])
+        raw_values = {param['key'][len(PARAM_PREFIX):]: param['value'] for param in params}
+
+        snapshot = {}
+        for name, (value_type, default) in SETTINGS_SPEC.items():
+            snapshot[name] = _parse_value(value_type, raw_values.get(name), default)
+        return tools.frozendict(snapshot)
+
+    @api.model
+    def _get_category_tree_version(self):
+        """
+        Returns: tuple identifying the current state of the public category
+        tree, which changes with every created, written or deleted category
+        """
+        self.env['product.public.category'].flush_model(['write_date'])
+        self.env.cr.execute("SELECT COUNT(*), MAX(write_date) FROM product_public_category")
+        return self.env.cr.fetchone()
+
+    @api.model
+    @tools.ormcache('tree_version')
+    def _get_product_category_ids(self, tree_version):
+        """
+        Resolve the product category include/exclude settings once per
+        version of the category tree.
+
+        Entries are public category IDs or names (matched case-insensitively
+        as a substring), and every matching category brings its children.
+        Like the snapshot, the result is dropped when the settings are saved;
+        a change of the category tree changes ``tree_version`` instead, so
+        category edits do not clear the caches of the registry.
+
+        Returns: tuple (include_ids, exclude_ids) of tuples of IDs, where
+        include_ids is None when no include filter is configured
+        """
+        snapshot = self._get_snapshot()
+        return (
+            self._resolve_product_categories(snapshot['product_categories_include']),
+            self._resolve_product_categories(snapshot['product_categories_exclude']) or (),
+        )
+
+    @api.model
+    def _resolve_product_categories(self, raw):
+        """
+        Returns: sorted tuple of category IDs including their children, or
+        None when the setting holds no entry
+        """
+        entries = [entry.strip() for entry in (raw or '').split(',') if entry.strip()]
+        if not entries:
+            return None
+        Category = self.env['product.public.category'].sudo().with_context(active_test=False)
+        category_ids = set()
+        for entry in entries:
+            if entry.isdigit():
+                category_ids.add(int(entry))
+            else:
+                category_ids.update(Category.search([('name', 'ilike', entry)]).ids)
+        if not category_ids:
+            return ()
+        return tuple(sorted(Category.search([('id', 'child_of', list(category_ids))]).ids))
+
+    @api.model
+    @tools.ormcache()
+    def _get_widget_config(self):
+        """
+        Typed widget settings, as served to the widget at startup.
+
+        Returns: frozendict mapping setting name to its typed value
+        """
+        snapshot = self._get_snapshot()
+        return tools.frozendict({name: snapshot[name] for name in WIDGET_ATTRIBUTES})
+
+    @api.model
+    @tools.ormcache()
+    def _get_widget_config_version(self):
+        """
+        Content hash of the widget config, used to version its URL: any
+        settings change yields a new URL, so each version can be cached
+        as immutable.
+
+        Returns: str
+        """
+        payload = json.dumps(dict(self._get_widget_config()), sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+    @api.model
+    @tools.ormcache()
+    def _get_visibility_rules(self):
+        """
+        Parse the settings deciding which requests get the widget.
+
+        Returns: frozendict with {pages_to_show, pages_to_hide, countries,
+        device_filtering, customer_segment_targeting, exclude_public_users}
+        """
+        snapshot = self._get_snapshot()
+        return tools.frozendict({
+            'pages_to_show': visibility.parse_page_types(snapshot['pages_to_show']),
+            'pages_to_hide': visibility.parse_page_types(snapshot['pages_to_hide']),
+            'countries': visibility.parse_country_codes(snapshot['geographic_restrictions']),
+            'device_filtering': snapshot['device_filtering'],
+            'customer_segment_targeting': snapshot['customer_segment_targeting'],
+            'exclude_public_users': snapshot['exclude_public_users'],
+        })
+
+    @api.model
+    def is_widget_visible(self):
+        """
+        Evaluate the page, device, geographic and customer rules for the
+        current website request, so that pages not meant to show the
+        widget do not even reference its assets.
+
+        Visitors whose country cannot be resolved (no GeoIP database,
+        private address) are not restricted.
+
+        Returns: bool
+        """
+        if not request or not self.get('enabled'):
+            return False
+        rules = self._get_visibility_rules()
+        httprequest = request.httprequest
+        self._set_visibility_headers(rules)
+
+        lang = getattr(request, 'lang', None)
+        page_type = visibility.get_page_type(httprequest.path, lang and lang.url_code)
+        if page_type in rules['pages_to_hide']:
+            return False
+        if rules['pages_to_show'] and page_type not in rules['pages_to_show']:
+            return False
+
+        if rules['device_filtering'] in ('desktop', 'mobile'):
+            if visibility.get_device_class(httprequest.user_agent.string) != rules['device_filtering']:
+                return False
+
+        if rules['countries']:
+            country_code = visibility.get_country_code(httprequest.remote_addr)
+            if country_code and country_code not in rules['countries']:
+                return False
+
+        user = request.env.user
+        if rules['exclude_public_users'] and user._is_public():
+            return False
+        if rules['customer_segment_targeting'] == 'vip' and not user._is_elevenlabs_vip():
+            return False
+        return True
+
+    @api.model
+    def _set_visibility_headers(self, rules):
+        """
+        Declare what the rendered page depends on, so that shared caches
+        do not serve a page rendered for one device or country to another:
+        the device rule varies on the User-Agent, and as the client country
+        is not a request header, country gated pages are made private.
+        """
+        headers = request.future_response.headers
+        if rules['device_filtering'] in ('desktop', 'mobile'):
+            headers.add('Vary', 'User-Agent')
+        if rules['countries']:
+            headers.add('Cache-Control', 'private')
+
+    @api.model
+    def get(self, name):
+        """Return a single typed setting from the cached snapshot"""
+        return self._get_snapshot()[name]
+
+    @api.model
+    def get_product_category_ids(self):
+        """Public accessor for the resolved category include/exclude IDs"""
+        snapshot = self._get_snapshot()
+        if not snapshot['product_categories_include'] and not snapshot['product_categories_exclude']:
+            return None, ()
+        return self._get_product_category_ids(self._get_category_tree_version())
+
+    @api.model
+    def get_widget_config(self):
+        """Public accessor for the typed widget settings"""
+        return self._get_widget_config()
+
+    @api.model
+    def get_widget_config_version(self):
+        """Public accessor for the current widget config version"""
+        return self._get_widget_config_version()
+
+    @api.model
+    def invalidate_snapshot(self):
+        """Drop the cached snapshot in every worker of this database"""
+        self.env.registry.clear_cache()
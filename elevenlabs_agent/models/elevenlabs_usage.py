@@ -1,9 +1,14 @@
 # -*- coding: utf-8 -*-
 
 from odoo import models, fields, api
+from odoo.exceptions import ValidationError
+from odoo.tools import SQL
 from datetime import datetime, timedelta
+import psycopg2
 import uuid
 
+from .elevenlabs_usage_partition import USAGE_KEY_TABLE
+
 
 class ElevenLabsUsage(models.Model):
     _name = 'elevenlabs.usage'
@@ -69,6 +74,31 @@ class ElevenLabsUsage(models.Model):
         )
     ]
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        if self.env['elevenlabs.usage.partition']._is_partitioned(self._table):
+            records._register_usage_keys()
+        return records
+
+    def _register_usage_keys(self):
+        """
+        Enforce unique_session_user on partitioned storage, where it is
+        kept in the usage key table instead of a unique index
+        """
+        try:
+            with self.env.cr.savepoint(flush=False):
+                self.env.cr.execute(SQL(
+                    "INSERT INTO %s (session_id, user_id, user_identifier, create_date) VALUES %s",
+                    SQL.identifier(USAGE_KEY_TABLE),
+                    SQL(", ").join(
+                        SQL("(%s, %s, %s, %s)", record.session_id, record.user_id.id or None,
+                            record.user_identifier or None, record.create_date)
+                        for record in self
+                    )))
+        except psycopg2.errors.UniqueViolation:
+            raise ValidationError('A usage record for this session/user combination already exists.')
+
     @api.model
     def get_or_create_usage_record(self, session_id, user_id=None, user_identifier=None, ip_address=None, user_agent=None):
         """
@@ -84,6 +114,10 @@ class ElevenLabsUsage(models.Model):
             domain.append(('user_identifier', '=', user_identifier))
 
         usage_record = self.search(domain, limit=1)
+        if not usage_record and self.env['elevenlabs.usage.partition']._move_heap_sessions(
+                self._table, [session_id]):
+            # the session was not moved to the partitions yet
+            usage_record = self.search(domain, limit=1)
 
         if usage_record:
             # Increment message count
@@ -105,11 +139,27 @@ class ElevenLabsUsage(models.Model):
             usage_record = self.create(record_data)
             return usage_record, True
 
+    def init(self):
+        # Composite indexes serving the bounded per-user counts of check_user_limits
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS elevenlabs_usage_user_id_create_date_idx
+                ON elevenlabs_usage (user_id, create_date)
+        """)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS elevenlabs_usage_user_identifier_create_date_idx
+                ON elevenlabs_usage (user_identifier, create_date)
+        """)
+
     @api.model
-    def check_user_limits(self, user_id=None, user_identifier=None, daily_limit=0, global_limit=0, session_limit=0, session_id=None):
+    def check_user_limits(self, user_id=None, user_identifier=None, daily_limit=0, global_limit=0, session_limit=0,
+                          session_id=None, history_days=30):
         """
         Check if user has exceeded any usage limits.
 
+        All counts come from a single query. The global usage only covers
+        the last ``history_days`` days so its cost does not grow with the
+        history kept in the table.
+
         Returns a dictionary with:
         - can_show_widget: bool
         - daily_usage: int
@@ -122,30 +172,31 @@ class ElevenLabsUsage(models.Model):
         """
         now = fields.Datetime.now()
         today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-
-        # Build domain for counting
-        daily_domain = [('create_date', '>=', today_start)]
-        global_domain = []
+        window_start = min(today_start, now - timedelta(days=max(1, history_days)))
 
         if user_id:
-            daily_domain.append(('user_id', '=', user_id))
-            global_domain.append(('user_id', '=', user_id))
+            user_condition = SQL("user_id = %s", int(user_id))
         elif user_identifier:
-            daily_domain.append(('user_identifier', '=', user_identifier))
-            global_domain.append(('user_identifier', '=', user_identifier))
-
-        # Count daily usage
-        daily_usage = self.search_count(daily_domain)
-
-        # Count global usage
-        global_usage = self.search_count(global_domain)
+            user_condition = SQL("user_identifier = %s", user_identifier)
+        else:
+            user_condition = SQL("TRUE")
 
-        # Count session usage
-        session_usage = 0
-        if session_id:
-            session_domain = [('session_id', '=', session_id)]
-            session_records = self.search(session_domain)
-            session_usage = sum(session_records.mapped('message_count'))
+        columns = ['session_id', 'user_id', 'user_identifier', 'message_count', 'create_date']
+        self.flush_model(columns)
+        # Includes the rows not moved yet while converting to partitions
+        source = self.env['elevenlabs.usage.partition']._get_heap_source(self._table, columns)
+        self.env.cr.execute(SQL("""
+            SELECT COUNT(*) FILTER (WHERE create_date >= %(today_start)s),
+                   COUNT(*),
+                   (SELECT COALESCE(SUM(message_count), 0)
+                      FROM %(source)s
+                     WHERE session_id = %(session_id)s)
+              FROM %(source)s
+             WHERE create_date >= %(window_start)s
+               AND %(user_condition)s
+        """, today_start=today_start, window_start=window_start, session_id=session_id or None,
+            user_condition=user_condition, source=source))
+        daily_usage, global_usage, session_usage = self.env.cr.fetchone()
 
         # Check limits
         result = {
@@ -194,9 +245,14 @@ class ElevenLabsUsage(models.Model):
     @api.model
     def cleanup_old_records(self, days_to_keep=30):
         """
-        Clean up usage records older than specified days.
+        Clean up usage records older than specified days, in bounded
+        primary key range batches instead of one large unlink.
+
+        Returns: int - number of records deleted
         """
         cutoff_date = fields.Datetime.now() - timedelta(days=days_to_keep)
-        old_records = self.search([('create_date', '<', cutoff_date)])
-        old_records.unlink()
-        return len(old_records)
+        self.flush_model()
+        deleted, _remaining = self.env['elevenlabs.usage.retention']._purge_expired(
+            self._table, 'create_date', cutoff_date)
+        self.invalidate_model()
+        return deleted
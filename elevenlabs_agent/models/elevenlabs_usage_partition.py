@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import re
+import time
+from datetime import datetime
+
+import psycopg2
+from dateutil.relativedelta import relativedelta
+
+from odoo import models, fields, api, tools
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+# Usage tables that can be stored in monthly partitions on create_date
+PARTITIONED_TABLES = ('elevenlabs_usage', 'elevenlabs_agent_usage')
+
+# Number of monthly partitions kept ready ahead of the current month
+PARTITION_MONTHS_AHEAD = 3
+
+# Rows moved into the partitions per transaction during the conversion
+PARTITION_BATCH_SIZE = 10000
+
+# Partitions cannot enforce the unique keys of the usage tables: they are
+# registered in these regular tables instead
+SESSION_KEY_TABLE = 'elevenlabs_agent_usage_session'
+USAGE_KEY_TABLE = 'elevenlabs_usage_session'
+
+# Key table and unique key columns, per usage table
+KEY_TABLES = {
+    'elevenlabs_agent_usage': (SESSION_KEY_TABLE, ('session_id',)),
+    'elevenlabs_usage': (USAGE_KEY_TABLE, ('session_id', 'user_id', 'user_identifier')),
+}
+
+KEY_COLUMN_TYPES = {
+    'session_id': 'VARCHAR NOT NULL',
+    'user_id': 'INTEGER',
+    'user_identifier': 'VARCHAR',
+}
+
+
+class ElevenLabsUsagePartition(models.AbstractModel):
+    _name = 'elevenlabs.usage.partition'
+    _description = 'ElevenLabs Usage Partitioning'
+
+    @api.model
+    @tools.ormcache()
+    def _get_partitioned_tables(self):
+        """
+        Returns: frozenset of the usage tables stored as partitioned tables
+        """
+        self.env.cr.execute("""
+            SELECT relname
+              FROM pg_class
+             WHERE relkind = 'p'
+               AND relname IN %s
+               AND relnamespace = current_schema()::regnamespace
+        """, [PARTITIONED_TABLES])
+        return frozenset(row[0] for row in self.env.cr.fetchall())
+
+    @api.model
+    def _is_partitioned(self, table):
+        return table in self._get_partitioned_tables()
+
+    @api.model
+    @tools.ormcache()
+    def _get_heap_tables(self):
+        """
+        Returns: frozenset of the usage tables whose former rows are still
+        being moved into the partitions, from ``<table>_heap``
+        """
+        self.env.cr.execute("""
+            SELECT relname
+              FROM pg_class
+             WHERE relkind = 'r'
+               AND relname IN %s
+               AND relnamespace = current_schema()::regnamespace
+        """, [tuple(table + '_heap' for table in PARTITIONED_TABLES)])
+        return frozenset(row[0][:-len('_heap')] for row in self.env.cr.fetchall())
+
+    @api.model
+    def _get_heap_source(self, table, columns):
+        """
+        Returns: SQL of a FROM source named ``table`` that also holds the
+        rows not yet moved out of its former table, with the given columns
+        """
+        if table not in self._get_heap_tables():
+            return SQL.identifier(table)
+        select = SQL(", ").join(SQL.identifier(column) for column in columns)
+        return SQL("(SELECT %s FROM %s UNION ALL SELECT %s FROM %s) AS %s",
+                   select, SQL.identifier(table), select, SQL.identifier(table + '_heap'),
+                   SQL.identifier(table))
+
+    @api.model
+    def _move_heap_sessions(self, table, session_ids):
+        """
+        Move the rows of the given sessions that are still in the former
+        table of ``table`` into its partitions, so that the lookups by
+        session find them while the conversion is in progress.
+
+        Returns: int - number of rows moved
+        """
+        if table not in self._get_heap_tables() or not session_ids:
+            return 0
+        try:
+            with self.env.cr.savepoint(flush=False):
+                self.env.cr.execute(self._get_move_query(
+                    table, SQL("session_id IN %s", tuple(session_ids))))
+        except psycopg2.errors.UndefinedTable:
+            # the conversion just moved the last rows
+            return 0
+        return self.env.cr.rowcount
+
+    @api.model
+    def _enable_partitioning(self, batch_size=PARTITION_BATCH_SIZE, deadline=None, commit=False):
+        """
+        Convert the usage tables that are still regular tables, then move
+        their rows into the partitions. The ORM no longer manages the
+        schema of a partitioned table, so the conversion is one-way.
+
+        The work is resumable: a run stopped by ``deadline`` (or a crash)
+        continues with the rows left where the next run picks them up.
+
+        Args:
+            deadline: time.monotonic() value after which no new batch is started
+            commit: commit after each step (only from the scheduler)
+
+        Returns: bool - True when every table is converted and emptied of
+        its former rows
+        """
+        for table in PARTITIONED_TABLES:
+            if not self._is_partitioned(table):
+                self._switch_to_partitioned_table(table, batch_size=batch_size, commit=commit)
+                # _get_partitioned_tables, in every worker
+                self.env.registry.clear_cache()
+                if commit:
+                    self.env.cr.commit()
+            if not self._move_heap_rows(table, batch_size=batch_size, deadline=deadline, commit=commit):
+                return False
+        return True
+
+    @api.model
+    def _switch_to_partitioned_table(self, table, batch_size=PARTITION_BATCH_SIZE, commit=False):
+        """
+        Put an empty table partitioned by month on create_date in place of
+        ``table``, keeping its sequence, foreign keys and indexes. The
+        former table is renamed to ``<table>_heap``, from which
+        _move_heap_rows() moves the rows in batches.
+
+        The table is locked only for the renames and the DDL of the empty
+        table: no row is copied under the lock. Unique indexes cannot be
+        kept, as partitions only enforce uniqueness within themselves: the
+        unique keys of the usage tables (the session_id of the agent usage,
+        the session and user of the usage records) are registered in key
+        tables instead, filled before the lock is taken.
+        """
+        cr = self.env.cr
+        ident = SQL.identifier
+        heap = table + '_heap'
+
+        cr.execute(SQL("SELECT date_trunc('month', MIN(COALESCE(create_date, write_date))) FROM %s",
+                       ident(table)))
+        first_month = cr.fetchone()[0]
+        self._create_key_table(table)
+        registered_id = self._register_keys(table, batch_size=batch_size, commit=commit)
+
+        cr.execute(SQL("LOCK TABLE %s IN ACCESS EXCLUSIVE MODE", ident(table)))
+        # rows created since the batches above
+        self._register_keys(table, after_id=registered_id)
+        cr.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        sequence = cr.fetchone()[0]
+        cr.execute("""
+            SELECT i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+              FROM pg_index i
+             WHERE i.indrelid = %s::regclass AND NOT i.indisunique
+        """, [table])
+        indexes = cr.fetchall()
+        cr.execute("""
+            SELECT conname, pg_get_constraintdef(oid)
+              FROM pg_constraint
+             WHERE conrelid = %s::regclass AND contype = 'f'
+        """, [table])
+        foreign_keys = cr.fetchall()
+        cr.execute("""
+            SELECT conname
+              FROM pg_constraint
+             WHERE conrelid = %s::regclass AND contype = 'p'
+        """, [table])
+        primary_key = cr.fetchone()[0]
+
+        # The index names are needed for the partitioned table; the former
+        # table keeps its indexes under new names, as it is still read
+        # until its rows are moved
+        cr.execute(SQL("ALTER TABLE %s RENAME TO %s", ident(table), ident(heap)))
+        cr.execute(SQL("ALTER TABLE %s RENAME CONSTRAINT %s TO %s",
+                       ident(heap), ident(primary_key), ident(heap + '_pkey')))
+        for name, _definition in indexes:
+            cr.execute(SQL("ALTER INDEX %s RENAME TO %s", SQL(name), ident(name.strip('"')[:58] + '_heap')))
+        cr.execute(SQL("ALTER SEQUENCE %s OWNED BY NONE", SQL(sequence)))
+
+        cr.execute(SQL("""
+            CREATE TABLE %s (LIKE %s INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+            PARTITION BY RANGE (create_date)
+        """, ident(table), ident(heap)))
+        cr.execute(SQL("CREATE TABLE %s PARTITION OF %s DEFAULT", ident(table + '_default'), ident(table)))
+        self._create_partitions(table, first_month)
+        cr.execute(SQL("ALTER SEQUENCE %s OWNED BY %s.id", SQL(sequence), ident(table)))
+        cr.execute(SQL("ALTER TABLE %s ADD PRIMARY KEY (id, create_date)", ident(table)))
+        for name, definition in foreign_keys:
+            cr.execute(SQL("ALTER TABLE %s ADD CONSTRAINT %s %s", ident(table), ident(name), SQL(definition)))
+        for _name, definition in indexes:
+            cr.execute(definition)
+        _logger.info("ElevenLabs usage table %s switched to monthly partitions", table)
+
+    @api.model
+    def _move_heap_rows(self, table, batch_size=PARTITION_BATCH_SIZE, deadline=None, commit=False):
+        """
+        Move the rows left in the former table of ``table`` into its
+        partitions, newest first so that ongoing conversations are back
+        first, and drop the former table once empty.
+
+        Returns: bool - True when no row is left to move
+        """
+        cr = self.env.cr
+        heap = table + '_heap'
+        cr.execute("SELECT to_regclass(%s)", [heap])
+        if not cr.fetchone()[0]:
+            return True
+
+        moved = 0
+        while True:
+            if deadline is not None and time.monotonic() >= deadline:
+                _logger.info("ElevenLabs usage table %s: %s rows moved to partitions, more to go", table, moved)
+                return False
+            cr.execute(self._get_move_query(table, SQL(
+                "id IN (SELECT id FROM %s ORDER BY id DESC LIMIT %s)", SQL.identifier(heap), batch_size)))
+            count = cr.rowcount
+            moved += count
+            if not count:
+                cr.execute(SQL("DROP TABLE %s", SQL.identifier(heap)))
+                # _get_heap_tables, in every worker
+                self.env.registry.clear_cache()
+                if commit:
+                    cr.commit()
+                _logger.info("ElevenLabs usage table %s: every row moved to partitions", table)
+                return True
+            if commit:
+                cr.commit()
+
+    @api.model
+    def _get_move_query(self, table, condition):
+        """
+        Returns: SQL moving the rows of the former table of ``table``
+        matching ``condition`` into its partitions, in one statement
+        """
+        ident = SQL.identifier
+        heap = table + '_heap'
+        self.env.cr.execute("""
+            SELECT attname
+              FROM pg_attribute
+             WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+          ORDER BY attnum
+        """, [heap])
+        column_names = [row[0] for row in self.env.cr.fetchall()]
+        columns = SQL(", ").join(ident(name) for name in column_names)
+        # create_date is part of the primary key of the partitioned table
+        values = SQL(", ").join(
+            SQL("COALESCE(create_date, write_date, now() at time zone 'UTC')") if name == 'create_date'
+            else ident(name)
+            for name in column_names
+        )
+        return SQL("""
+            WITH moved AS (
+                DELETE FROM %s
+                 WHERE %s
+             RETURNING *
+            )
+            INSERT INTO %s (%s)
+            SELECT %s FROM moved
+        """, ident(heap), condition, ident(table), columns, values)
+
+    @api.model
+    def _create_key_table(self, table):
+        """Create the table registering the unique keys of ``table``"""
+        key_table, key_columns = KEY_TABLES[table]
+        self.env.cr.execute(SQL("""
+            CREATE TABLE IF NOT EXISTS %s (
+                id SERIAL PRIMARY KEY,
+                %s,
+                create_date TIMESTAMP NOT NULL,
+                UNIQUE (%s)
+            )
+        """, SQL.identifier(key_table),
+            SQL(", ").join(SQL("%s %s", SQL.identifier(column), SQL(KEY_COLUMN_TYPES[column]))
+                           for column in key_columns),
+            SQL(", ").join(SQL.identifier(column) for column in key_columns)))
+        self.env.cr.execute(SQL("""
+            CREATE INDEX IF NOT EXISTS %s ON %s (create_date)
+        """, SQL.identifier(key_table + '_create_date_idx'), SQL.identifier(key_table)))
+
+    @api.model
+    def _register_keys(self, table, after_id=0, batch_size=None, commit=False):
+        """
+        Register the unique keys of the rows of ``table`` whose id is above
+        ``after_id`` in its key table, once per key, by ranges of
+        ``batch_size`` ids (all at once when not given).
+
+        Returns: int - highest id registered
+        """
+        cr = self.env.cr
+        key_table, key_columns = KEY_TABLES[table]
+        columns = SQL(", ").join(SQL.identifier(column) for column in key_columns)
+        cr.execute(SQL("SELECT COALESCE(MAX(id), 0) FROM %s", SQL.identifier(table)))
+        max_id = cr.fetchone()[0]
+        start_id = after_id
+        while start_id < max_id:
+            end_id = min(max_id, start_id + batch_size) if batch_size else max_id
+            cr.execute(SQL("""
+                INSERT INTO %s (%s, create_date)
+                SELECT %s, MIN(COALESCE(create_date, write_date, now() at time zone 'UTC'))
+                  FROM %s
+                 WHERE id > %s AND id <= %s
+              GROUP BY %s
+                ON CONFLICT DO NOTHING
+            """, SQL.identifier(key_table), columns, columns, SQL.identifier(table), start_id, end_id, columns))
+            if commit:
+                cr.commit()
+            start_id = end_id
+        return max_id
+
+    @api.model
+    def _cron_convert_usage_tables(self, batch_size=PARTITION_BATCH_SIZE, time_budget=120):
+        """
+        Scheduled conversion of the usage tables, requested from the
+        settings. The job deactivates itself once the conversion is done;
+        until then the scheduler runs it again to move the remaining rows.
+
+        Returns: bool - True when the conversion is done
+        """
+        if not self.env['elevenlabs.settings'].sudo().get('usage_partitioning'):
+            return False
+        deadline = time.monotonic() + time_budget
+        done = self._enable_partitioning(batch_size=batch_size, deadline=deadline, commit=True)
+        if done:
+            self.env.ref('elevenlabs_agent.ir_cron_elevenlabs_usage_partitioning').sudo().active = False
+            _logger.info("ElevenLabs usage tables converted to monthly partitions")
+        self.env['ir.cron']._notify_progress(done=0, remaining=0 if done else 1)
+        return done
+
+    @api.model
+    def _create_partitions(self, table, first_month=None):
+        """
+        Create the monthly partitions from ``first_month`` (default: the
+        current month) up to PARTITION_MONTHS_AHEAD months ahead.
+
+        A month whose rows already landed in the default partition is left
+        there, with a warning, as the partition could not be attached.
+        """
+        current_month = fields.Datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        month = min(first_month or current_month, current_month)
+        last_month = current_month + relativedelta(months=PARTITION_MONTHS_AHEAD)
+        while month <= last_month:
+            next_month = month + relativedelta(months=1)
+            try:
+                with self.env.cr.savepoint():
+                    self.env.cr.execute(SQL(
+                        "CREATE TABLE IF NOT EXISTS %s PARTITION OF %s FOR VALUES FROM (%s) TO (%s)",
+                        SQL.identifier('%s_p%s' % (table, month.strftime('%Y%m'))), SQL.identifier(table),
+                        month, next_month))
+            except psycopg2.Error as e:
+                _logger.warning("ElevenLabs usage partition of %s for %s not created: %s",
+                                table, month.strftime('%Y-%m'), e)
+            month = next_month
+
+    @api.model
+    def _drop_expired_partitions(self, table, cutoff):
+        """
+        Drop the monthly partitions whose whole range is before ``cutoff``.
+
+        Returns: int - number of rows dropped
+        """
+        cr = self.env.cr
+        cr.execute("""
+            SELECT c.relname
+              FROM pg_inherits i
+              JOIN pg_class c ON c.oid = i.inhrelid
+             WHERE i.inhparent = %s::regclass
+        """, [table])
+        pattern = re.compile(r'^%s_p(\d{4})(\d{2})$' % re.escape(table))
+        dropped = 0
+        for (partition,) in cr.fetchall():
+            match = pattern.match(partition)
+            if not match:
+                continue
+            month = datetime(int(match.group(1)), int(match.group(2)), 1)
+            if month + relativedelta(months=1) > cutoff:
+                continue
+            cr.execute(SQL("SELECT COUNT(*) FROM %s", SQL.identifier(partition)))
+            dropped += cr.fetchone()[0]
+            cr.execute(SQL("DROP TABLE %s", SQL.identifier(partition)))
+            _logger.info("ElevenLabs retention: dropped partition %s", partition)
+        return dropped
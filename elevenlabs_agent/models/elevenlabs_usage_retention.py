@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import time
+from datetime import timedelta
+
+from odoo import models, fields, api
+from odoo.tools import SQL
+
+from .elevenlabs_usage_partition import SESSION_KEY_TABLE, USAGE_KEY_TABLE
+
+_logger = logging.getLogger(__name__)
+
+
+class ElevenLabsUsageRetention(models.AbstractModel):
+    _name = 'elevenlabs.usage.retention'
+    _description = 'ElevenLabs Usage Retention'
+
+    @api.model
+    def _get_retention_targets(self):
+        """
+        Tables purged by the retention job and their cutoffs.
+
+        Returns: list of (table, date column, cutoff) tuples
+        """
+        settings = self.env['elevenlabs.settings'].sudo()
+        now = fields.Datetime.now()
+        retention_days = max(1, settings.get('usage_retention_days'))
+        conversation_days = max(1, settings.get('conversation_retention_days'))
+        targets = [
+            ('elevenlabs_agent_usage', 'create_date', now - timedelta(days=conversation_days)),
+            ('elevenlabs_usage', 'create_date', now - timedelta(days=retention_days)),
+            ('elevenlabs_agent_usage_daily', 'day', (now - timedelta(days=retention_days)).date()),
+        ]
+        if self.env['elevenlabs.usage.partition']._is_partitioned('elevenlabs_agent_usage'):
+            targets.append((SESSION_KEY_TABLE, 'create_date', now - timedelta(days=conversation_days)))
+        if self.env['elevenlabs.usage.partition']._is_partitioned('elevenlabs_usage'):
+            targets.append((USAGE_KEY_TABLE, 'create_date', now - timedelta(days=retention_days)))
+        return targets
+
+    @api.model
+    def _purge_expired(self, table, column, cutoff, batch_size=5000, deadline=None, commit=False):
+        """
+        Delete the rows of ``table`` whose ``column`` is before ``cutoff``,
+        one primary key range of ``batch_size`` ids at a time so that every
+        statement stays short and only locks the rows of its range.
+
+        Args:
+            deadline: time.monotonic() value after which no new chunk is started
+            commit: commit after each chunk (only from the scheduler)
+
+        Returns: tuple (rows deleted, whether expired rows remain)
+        """
+        deleted = 0
+        next_id = 0
+        while True:
+            self.env.cr.execute(SQL("""
+                SELECT id FROM %s
+                 WHERE %s < %s AND id >= %s
+              ORDER BY id
+                 LIMIT 1
+            """, SQL.identifier(table), SQL.identifier(column), cutoff, next_id))
+            row = self.env.cr.fetchone()
+            if not row:
+                return deleted, False
+            if deadline is not None and time.monotonic() >= deadline:
+                return deleted, True
+
+            start_id = row[0]
+            next_id = start_id + batch_size
+            self.env.cr.execute(SQL("""
+                DELETE FROM %s
+                 WHERE id >= %s AND id < %s AND %s < %s
+            """, SQL.identifier(table), start_id, next_id, SQL.identifier(column), cutoff))
+            deleted += self.env.cr.rowcount
+            if commit:
+                self.env.cr.commit()
+
+    @api.model
+    def _cron_purge_expired_usage(self, batch_size=5000, time_budget=120):
+        """
+        Scheduled retention purge of the usage tables.
+
+        Partitioned tables first get their upcoming monthly partitions and
+        drop the partitions that expired as a whole, so only the rows of
+        the partially expired month are deleted row by row.
+
+        Stops starting new chunks once ``time_budget`` seconds are spent; the
+        scheduler then runs the job again to finish the remaining rows.
+
+        Returns: dict mapping table name to the number of rows purged
+        """
+        deadline = time.monotonic() + time_budget
+        partitions = self.env['elevenlabs.usage.partition']
+
+        purged = {}
+        remaining = False
+        for table, column, cutoff in self._get_retention_targets():
+            purged[table] = 0
+            if partitions._is_partitioned(table):
+                partitions._create_partitions(table)
+                purged[table] = partitions._drop_expired_partitions(table, cutoff)
+                self.env.cr.commit()
+            deleted, remaining = self._purge_expired(
+                table, column, cutoff, batch_size=batch_size, deadline=deadline, commit=True)
+            purged[table] += deleted
+            _logger.info("ElevenLabs retention: purged %s rows from %s older than %s",
+                         purged[table], table, cutoff)
+            if remaining:
+                break
+
+        for model in ('elevenlabs.agent.usage', 'elevenlabs.usage', 'elevenlabs.agent.usage.daily'):
+            self.env[model].invalidate_model()
+        self.env['ir.cron']._notify_progress(done=sum(purged.values()), remaining=1 if remaining else 0)
+        return purged
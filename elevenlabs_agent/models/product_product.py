@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+
+from odoo import models, api
+
+from .product_search_index import INDEXED_PRODUCT_FIELDS
+from ..tools import cache
+
+
+class ProductProduct(models.Model):
+    _inherit = 'product.product'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        products = super().create(vals_list)
+        products._elevenlabs_refresh_search_index()
+        self._elevenlabs_invalidate_search_cache()
+        return products
+
+    def write(self, vals):
+        res = super().write(vals)
+        if INDEXED_PRODUCT_FIELDS & set(vals):
+            self._elevenlabs_refresh_search_index()
+        self._elevenlabs_invalidate_search_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self._elevenlabs_invalidate_search_cache()
+        return res
+
+    @api.model
+    def _elevenlabs_invalidate_search_cache(self):
+        """
+        Drop the cached agent search results and SKU lookups of this
+        worker once the transaction is committed. Other workers catch up
+        when their entries expire.
+        """
+        postcommit = self.env.cr.postcommit
+        if postcommit.data.get('elevenlabs_search_cache_invalidated'):
+            return
+        postcommit.data['elevenlabs_search_cache_invalidated'] = True
+        dbname = self.env.cr.dbname
+
+        def invalidate():
+            cache.invalidate(dbname, cache.PRODUCT_SEARCH_CACHE)
+            cache.invalidate(dbname, cache.PRODUCT_SKU_CACHE)
+
+        postcommit.add(invalidate)
+
+    def _elevenlabs_refresh_search_index(self):
+        """
+        Keep the ElevenLabs full-text search documents of these variants up
+        to date. Nothing is done outside the full-text search mode: the
+        whole index is rebuilt when that mode is switched on.
+        """
+        if self.ids and self.env['elevenlabs.product.search.index']._is_enabled():
+            self.flush_recordset()
+            self.env['elevenlabs.product.search.index']._refresh(self.ids)
+
+    def _elevenlabs_serialize(self):
+        """
+        Serialize variants for the ElevenLabs agent APIs.
+
+        Every field is loaded for the whole recordset at once: the image is
+        only checked for existence (bin_size), stock is computed for the
+        batch in one pass and category/attribute names are read in bulk,
+        so the number of queries does not depend on the number of products.
+
+        Returns: list of dicts, in recordset order
+        """
+        field_names = [
+            'name', 'default_code', 'barcode', 'list_price', 'description_sale',
+            'description', 'image_1920', 'categ_id', 'product_template_attribute_value_ids',
+        ]
+        # qty_available is only defined when the stock module is installed
+        has_stock = 'qty_available' in self._fields
+        if has_stock:
+            field_names.append('qty_available')
+
+        rows = self.with_context(bin_size=True).read(field_names)
+
+        categ_ids = {row['categ_id'][0] for row in rows if row['categ_id']}
+        category_names = {
+            category['id']: category['name']
+            for category in self.env['product.category'].browse(categ_ids).read(['name'])
+        }
+
+        ptav_ids = {ptav_id for row in rows for ptav_id in row['product_template_attribute_value_ids']}
+        attribute_values = {
+            ptav['id']: {'attribute': ptav['attribute_id'][1], 'value': ptav['name']}
+            for ptav in self.env['product.template.attribute.value'].browse(ptav_ids).read(['name', 'attribute_id'])
+        }
+
+        result = []
+        for row in rows:
+            qty_available = row['qty_available'] if has_stock else 0.0
+            result.append({
+                'id': row['id'],
+                'name': row['name'],
+                'sku': row['default_code'] or '',
+                'barcode': row['barcode'] or '',
+                'list_price': row['list_price'],
+                'description_sale': row['description_sale'] or '',
+                'description': row['description'] or '',
+                'image': '/web/image/product.product/%s/image_1920' % row['id'] if row['image_1920'] else None,
+                'category': category_names.get(row['categ_id'][0]) if row['categ_id'] else None,
+                'in_stock': qty_available > 0,
+                'qty_available': qty_available,
+                'variants': [attribute_values[ptav_id] for ptav_id in row['product_template_attribute_value_ids']],
+                'url': '/shop/product/%s' % row['id'],
+            })
+        return result
+
+    def _elevenlabs_card_payload(self):
+        """
+        Build the product card payloads displayed by the website widget.
+
+        Images point to the thumbnail sized fields with a ``unique`` stamp
+        derived from the last change of the variant and its template, so
+        browsers can keep them for as long as they do not change.
+
+        Returns: list of dicts, in recordset order
+        """
+        stamps = {}
+        for product in self:
+            last_change = max(product.write_date, product.product_tmpl_id.write_date)
+            stamps[product.id] = hashlib.sha512(str(last_change).encode()).hexdigest()[:7]
+
+        cards = []
+        for data in self._elevenlabs_serialize():
+            image = image_large = None
+            if data['image']:
+                image = '/web/image/product.product/%s/image_256?unique=%s' % (data['id'], stamps[data['id']])
+                image_large = '/web/image/product.product/%s/image_512?unique=%s' % (data['id'], stamps[data['id']])
+            cards.append({
+                'id': data['id'],
+                'sku': data['sku'],
+                'name': data['name'],
+                'price': '%.2f' % data['list_price'],
+                'image': image,
+                'image_large': image_large,
+                'in_stock': data['in_stock'],
+                'url': data['url'],
+            })
+        return cards
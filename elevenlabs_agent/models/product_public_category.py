@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, api
+
+# Fields changing which categories a configured include/exclude entry resolves to
+RESOLVED_CATEGORY_FIELDS = {'name', 'parent_id'}
+
+
+class ProductPublicCategory(models.Model):
+    _inherit = 'product.public.category'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        categories = super().create(vals_list)
+        self._elevenlabs_invalidate_resolved_categories()
+        return categories
+
+    def write(self, vals):
+        res = super().write(vals)
+        if RESOLVED_CATEGORY_FIELDS & set(vals):
+            self._elevenlabs_invalidate_resolved_categories()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self._elevenlabs_invalidate_resolved_categories()
+        return res
+
+    @api.model
+    def _elevenlabs_invalidate_resolved_categories(self):
+        """
+        The category tree changed: drop the cached searches. The resolved
+        include/exclude categories follow the tree version by themselves.
+        """
+        self.env['product.product']._elevenlabs_invalidate_search_cache()
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import re
+import time
+
+from odoo import models, api
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+# Fields feeding the search document, per model
+INDEXED_PRODUCT_FIELDS = {'default_code', 'barcode', 'product_tmpl_id'}
+INDEXED_TEMPLATE_FIELDS = {'name', 'description_sale'}
+
+# Variants indexed per transaction by the scheduled rebuild
+REBUILD_BATCH_SIZE = 5000
+
+# Set while the scheduled rebuild has not indexed every variant yet
+REBUILD_PENDING_PARAM = 'elevenlabs_agent.product_search_index_pending'
+
+
+class ElevenLabsProductSearchIndex(models.AbstractModel):
+    _name = 'elevenlabs.product.search.index'
+    _description = 'ElevenLabs Product Full-Text Search Index'
+
+    def init(self):
+        cr = self.env.cr
+        cr.execute("""
+            CREATE TABLE IF NOT EXISTS elevenlabs_product_search (
+                product_id INTEGER PRIMARY KEY REFERENCES product_product(id) ON DELETE CASCADE,
+                document TSVECTOR NOT NULL
+            )
+        """)
+        cr.execute("""
+            CREATE INDEX IF NOT EXISTS elevenlabs_product_search_document_idx
+                ON elevenlabs_product_search USING GIN (document)
+        """)
+        cr.execute("SELECT 1 FROM elevenlabs_product_search LIMIT 1")
+        if not cr.fetchone() and self._is_enabled():
+            self._refresh()
+
+    @api.model
+    def _is_enabled(self):
+        """The documents are only kept up to date while the full-text search mode is on"""
+        return self.env['elevenlabs.settings'].sudo().get('product_search_mode') == 'fulltext'
+
+    @api.model
+    def _is_ready(self):
+        """Full-text searches are answered from the index once it is complete"""
+        return self._is_enabled() and not self.env['ir.config_parameter'].sudo().get_param(REBUILD_PENDING_PARAM)
+
+    @api.model
+    def _request_rebuild(self):
+        """
+        Empty the index and rebuild it in the background, by a scheduled
+        action indexing the variants in batches. Searches keep using
+        pattern matching until it is done.
+        """
+        self.env.cr.execute("TRUNCATE elevenlabs_product_search")
+        self.env['ir.config_parameter'].sudo().set_param(REBUILD_PENDING_PARAM, True)
+        cron = self.env.ref('elevenlabs_agent.ir_cron_elevenlabs_product_search_index').sudo()
+        cron.active = True
+        cron._trigger()
+
+    @api.model
+    def _cron_rebuild(self, batch_size=REBUILD_BATCH_SIZE, time_budget=120):
+        """
+        Scheduled rebuild of the index, requested by _request_rebuild().
+        Indexes the variants without a search document, one committed
+        batch at a time; variants edited meanwhile are already indexed by
+        their write. The job deactivates itself once every variant is
+        indexed; until then the scheduler runs it again.
+
+        Returns: bool - True when the index is complete
+        """
+        params = self.env['ir.config_parameter'].sudo()
+        cron = self.env.ref('elevenlabs_agent.ir_cron_elevenlabs_product_search_index').sudo()
+        if not self._is_enabled() or not params.get_param(REBUILD_PENDING_PARAM):
+            cron.active = False
+            return True
+
+        deadline = time.monotonic() + time_budget
+        while True:
+            self.env.cr.execute("""
+                SELECT pp.id
+                  FROM product_product pp
+                 WHERE NOT EXISTS (SELECT 1 FROM elevenlabs_product_search s WHERE s.product_id = pp.id)
+              ORDER BY pp.id
+                 LIMIT %s
+            """, [batch_size])
+            product_ids = [row[0] for row in self.env.cr.fetchall()]
+            if not product_ids:
+                break
+            self._refresh(product_ids)
+            self.env.cr.commit()
+            if time.monotonic() > deadline:
+                self.env['ir.cron']._notify_progress(done=len(product_ids), remaining=1)
+                return False
+
+        params.set_param(REBUILD_PENDING_PARAM, False)
+        cron.active = False
+        self.env['product.product']._elevenlabs_invalidate_search_cache()
+        self.env['ir.cron']._notify_progress(done=0, remaining=0)
+        _logger.info("ElevenLabs product search index rebuilt")
+        return True
+
+    @api.model
+    def _refresh(self, product_ids=None):
+        """
+        (Re)build the search documents of the given variants, or of every
+        variant when no ids are given.
+
+        Names and sales descriptions are indexed in all their translations.
+        """
+        where = SQL("WHERE pp.id IN %s", tuple(product_ids)) if product_ids else SQL("")
+        self.env.cr.execute(SQL("""
+            INSERT INTO elevenlabs_product_search (product_id, document)
+            SELECT pp.id,
+                   setweight(to_tsvector('simple', coalesce((
+                       SELECT string_agg(value, ' ') FROM jsonb_each_text(pt.name)), '')), 'A')
+                || setweight(to_tsvector('simple', coalesce(pp.default_code, '')), 'A')
+                || setweight(to_tsvector('simple', coalesce(pp.barcode, '')), 'B')
+                || setweight(to_tsvector('simple', coalesce((
+                       SELECT string_agg(value, ' ') FROM jsonb_each_text(pt.description_sale)), '')), 'C')
+              FROM product_product pp
+              JOIN product_template pt ON pt.id = pp.product_tmpl_id
+              %s
+            ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document
+        """, where))
+
+    @api.model
+    def _build_tsquery(self, query):
+        """
+        Turn a free text query into a prefix-matching tsquery where every
+        word must match, e.g. "wireless mou" -> "wireless:* & mou:*".
+
+        Returns: str, or None when the query holds no searchable word
+        """
+        words = re.findall(r'\w+', (query or '').lower())
+        if not words:
+            return None
+        return ' & '.join('%s:*' % word for word in words)
+
+    @api.model
+    def search_ranked(self, query, domain, limit):
+        """
+        Full-text search of product variants, ranked by relevance.
+
+        Args:
+            query: Free text search query
+            domain: Additional product.product domain the results must match
+            limit: Maximum number of results
+
+        Returns: product.product recordset, best match first
+        """
+        Product = self.env['product.product']
+        tsquery = self._build_tsquery(query)
+        if not tsquery:
+            return Product
+        allowed = Product._search(domain)
+        self.env.cr.execute(SQL("""
+            SELECT s.product_id
+              FROM elevenlabs_product_search s
+             WHERE s.document @@ to_tsquery('simple', %s)
+               AND s.product_id IN %s
+          ORDER BY ts_rank(s.document, to_tsquery('simple', %s)) DESC, s.product_id
+             LIMIT %s
+        """, tsquery, allowed.subselect(), tsquery, limit))
+        return Product.browse([row[0] for row in self.env.cr.fetchall()])
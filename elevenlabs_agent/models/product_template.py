@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, api
+
+from .product_search_index import INDEXED_TEMPLATE_FIELDS
+
+
+class ProductTemplate(models.Model):
+    _inherit = 'product.template'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        templates = super().create(vals_list)
+        self.env['product.product']._elevenlabs_invalidate_search_cache()
+        return templates
+
+    def write(self, vals):
+        res = super().write(vals)
+        if INDEXED_TEMPLATE_FIELDS & set(vals) and self.env['elevenlabs.product.search.index']._is_enabled():
+            self.flush_recordset()
+            self.with_context(active_test=False).product_variant_ids._elevenlabs_refresh_search_index()
+        self.env['product.product']._elevenlabs_invalidate_search_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env['product.product']._elevenlabs_invalidate_search_cache()
+        return res
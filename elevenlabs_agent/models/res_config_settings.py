@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 
 from odoo import models, fields, api
+from odoo.exceptions import UserError
+
+from ..tools.rate_limiter import check_redis_url
 
 
 class ResConfigSettings(models.TransientModel):
@@ -164,6 +167,13 @@ class ResConfigSettings(models.TransientModel):
         help='Automatically end conversations after period of inactivity.'
     )
 
+    elevenlabs_inactive_conversation_timeout = fields.Integer(
+        string='Inactivity Timeout (minutes)',
+        config_parameter='elevenlabs_agent.inactive_conversation_timeout',
+        default=30,
+        help='Conversations without any message for this long are ended automatically.'
+    )
+
     elevenlabs_save_user_info = fields.Boolean(
         string='Save User Info',
         config_parameter='elevenlabs_agent.save_user_info',
@@ -192,6 +202,51 @@ class ResConfigSettings(models.TransientModel):
         help='Global daily usage limit across all users (0 for unlimited).'
     )
 
+    elevenlabs_usage_history_window_days = fields.Integer(
+        string='Usage History Window (days)',
+        config_parameter='elevenlabs_agent.usage_history_window_days',
+        default=30,
+        help='Number of days of usage history counted by the session limit checks.'
+    )
+
+    elevenlabs_usage_retention_days = fields.Integer(
+        string='Usage Retention (days)',
+        config_parameter='elevenlabs_agent.usage_retention_days',
+        default=30,
+        help='Usage records and daily usage totals older than this are purged by the "ElevenLabs: Purge '
+             'Expired Usage" scheduled action, which is inactive until you activate it.'
+    )
+
+    elevenlabs_conversation_retention_days = fields.Integer(
+        string='Conversation Retention (days)',
+        config_parameter='elevenlabs_agent.conversation_retention_days',
+        default=365,
+        help='Conversation usage records (messages per conversation) older than this are purged by the '
+             '"ElevenLabs: Purge Expired Usage" scheduled action, once activated.'
+    )
+
+    # Not saved with the other settings: the conversion is requested with a
+    # dedicated button, after a confirmation
+    elevenlabs_usage_partitioning = fields.Boolean(
+        string='Partition Usage History by Month',
+        compute='_compute_elevenlabs_usage_partitioning',
+        help='Store usage records in monthly PostgreSQL partitions so expired months are dropped at once and '
+             'recent usage queries only read recent partitions. The existing tables are converted by a '
+             'scheduled action in the background; the conversion cannot be undone.'
+    )
+
+    elevenlabs_usage_write_mode = fields.Selection([
+        ('direct', 'Direct'),
+        ('journal', 'Write-Behind Journal'),
+    ], string='Usage Write Mode',
+        config_parameter='elevenlabs_agent.usage_write_mode',
+        default='direct',
+        required=True,
+        help='Direct writes each widget event to the usage records during the request. The write-behind '
+             'journal only appends events to a staging table merged in bulk every minute; limit checks '
+             'include the pending events. Pending events are lost if the database server crashes.'
+    )
+
     elevenlabs_max_messages_per_conversation = fields.Integer(
         string='Max Messages Per Conversation',
         config_parameter='elevenlabs_agent.max_messages_per_conversation',
@@ -199,12 +254,91 @@ class ResConfigSettings(models.TransientModel):
         help='Maximum number of messages allowed per conversation/session (0 for unlimited).'
     )
 
+    # Rate Limiting
+    elevenlabs_rate_limit_enabled = fields.Boolean(
+        string='Enable API Rate Limiting',
+        config_parameter='elevenlabs_agent.rate_limit_enabled',
+        default=False,
+        help='Limit how many usage and session API calls each visitor can make.'
+    )
+
+    elevenlabs_rate_limit_algorithm = fields.Selection([
+        ('token_bucket', 'Token Bucket'),
+        ('sliding_window', 'Sliding Window'),
+    ], string='Rate Limiting Algorithm',
+        config_parameter='elevenlabs_agent.rate_limit_algorithm',
+        default='token_bucket',
+        help='Token bucket allows short bursts, sliding window enforces a smooth rate.'
+    )
+
+    elevenlabs_rate_limit_requests = fields.Integer(
+        string='Requests Per Window',
+        config_parameter='elevenlabs_agent.rate_limit_requests',
+        default=60,
+        help='Number of API calls allowed per visitor within the window.'
+    )
+
+    elevenlabs_rate_limit_window = fields.Integer(
+        string='Rate Limit Window (seconds)',
+        config_parameter='elevenlabs_agent.rate_limit_window',
+        default=60,
+        help='Length of the rate limiting window in seconds.'
+    )
+
+    elevenlabs_rate_limit_backend = fields.Selection([
+        ('memory', 'In-Process Memory'),
+        ('redis', 'Shared (Redis)'),
+    ], string='Rate Limiter Backend',
+        config_parameter='elevenlabs_agent.rate_limit_backend',
+        default='memory',
+        help='In-process memory is counted per worker. Use a shared backend so all workers agree on the counts. '
+             'While the shared backend does not answer, requests are counted per worker and a warning is logged.'
+    )
+
+    elevenlabs_rate_limit_redis_url = fields.Char(
+        string='Rate Limiter Redis URL',
+        config_parameter='elevenlabs_agent.rate_limit_redis_url',
+        help='Connection URL of the shared backend (e.g., redis://localhost:6379/0).'
+    )
+
     elevenlabs_performance_metrics_dashboard = fields.Char(
         string='Performance Metrics Dashboard Link',
         config_parameter='elevenlabs_agent.performance_metrics_dashboard',
         help='Link to the performance metrics dashboard.'
     )
 
+    elevenlabs_metrics_token = fields.Char(
+        string='Metrics Token',
+        config_parameter='elevenlabs_agent.metrics_token',
+        help='Bearer token of the /api/elevenlabs/metrics endpoint for Prometheus scrapers. '
+             'Without a token, only administrators can read the metrics.'
+    )
+
+    elevenlabs_profiling_enabled = fields.Boolean(
+        string='Profile API Calls',
+        config_parameter='elevenlabs_agent.profiling_enabled',
+        default=False,
+        help='Measure the wall time, SQL query count and SQL time of every ElevenLabs API call and log '
+             'the calls slower than the threshold.'
+    )
+
+    elevenlabs_profiling_slow_threshold = fields.Integer(
+        string='Slow Call Threshold (ms)',
+        config_parameter='elevenlabs_agent.profiling_slow_threshold',
+        default=500,
+        help='API calls taking longer than this are logged with their parameters (redacted) and '
+             'their most expensive SQL statements.'
+    )
+
+    elevenlabs_profiling_sample_rate = fields.Float(
+        string='Profile Sample Rate',
+        config_parameter='elevenlabs_agent.profiling_sample_rate',
+        default=0.0,
+        digits=(3, 3),
+        help='Fraction of the API calls (0 to 1) run under cProfile, their dump being written to the '
+             'elevenlabs_profiles directory of the data directory.'
+    )
+
     # Product Integration
     elevenlabs_product_categories_include = fields.Char(
         string='Include Product Categories',
@@ -218,6 +352,40 @@ class ResConfigSettings(models.TransientModel):
         help='Comma-separated list of product category IDs to exclude.'
     )
 
+    elevenlabs_product_search_mode = fields.Selection([
+        ('ilike', 'Pattern Matching'),
+        ('fulltext', 'Full-Text Index'),
+    ], string='Product Search Mode',
+        config_parameter='elevenlabs_agent.product_search_mode',
+        default='ilike',
+        required=True,
+        help='Pattern matching scans products for each word. The full-text index answers from an indexed '
+             'search document and ranks products by relevance instead of name. When it is turned on, the index '
+             'is built in the background; searches use pattern matching until it is complete.'
+    )
+
+    elevenlabs_product_search_cache_enabled = fields.Boolean(
+        string='Cache Product Searches',
+        config_parameter='elevenlabs_agent.product_search_cache_enabled',
+        default=True,
+        help='Answer repeated agent searches from an in-memory result cache.'
+    )
+
+    elevenlabs_product_search_cache_size = fields.Integer(
+        string='Search Cache Size',
+        config_parameter='elevenlabs_agent.product_search_cache_size',
+        default=512,
+        help='Maximum number of cached searches per worker. The least recently used searches are dropped first.'
+    )
+
+    elevenlabs_product_search_cache_ttl = fields.Integer(
+        string='Search Cache Lifetime (seconds)',
+        config_parameter='elevenlabs_agent.product_search_cache_ttl',
+        default=60,
+        help='How long a cached search is reused. Product changes clear the cache of the worker saving them, '
+             'other workers pick them up once their entries expire.'
+    )
+
     elevenlabs_featured_products_priority = fields.Char(
         string='Featured Products Priority',
         config_parameter='elevenlabs_agent.featured_products_priority',
@@ -271,4 +439,41 @@ class ResConfigSettings(models.TransientModel):
         config_parameter='elevenlabs_agent.secondary_color',
         default='#764ba2',
         help='Secondary/accent color for the widget (hex color, e.g., #764ba2).'
-    )
\ No newline at end of file
+    )
+
+    elevenlabs_swiper_url = fields.Char(
+        string='Carousel Library URL',
+        config_parameter='elevenlabs_agent.swiper_url',
+        default='https://cdn.jsdelivr.net/npm/swiper@11',
+        help='Base URL of the Swiper 11 files (swiper-bundle.min.js and swiper-bundle.min.css), loaded the '
+             'first time product cards are shown. Point it to a copy served by your website to avoid the CDN.'
+    )
+
+    def _compute_elevenlabs_usage_partitioning(self):
+        requested = self.env['elevenlabs.settings'].sudo().get('usage_partitioning')
+        for settings in self:
+            settings.elevenlabs_usage_partitioning = requested
+
+    def action_elevenlabs_enable_usage_partitioning(self):
+        """
+        Request the conversion of the usage tables to monthly partitions,
+        run in the background by a scheduled action
+        """
+        self.env['ir.config_parameter'].sudo().set_param('elevenlabs_agent.usage_partitioning', True)
+        cron = self.env.ref('elevenlabs_agent.ir_cron_elevenlabs_usage_partitioning').sudo()
+        cron.active = True
+        cron._trigger()
+
+    def set_values(self):
+        if self.elevenlabs_rate_limit_backend == 'redis':
+            try:
+                check_redis_url(self.elevenlabs_rate_limit_redis_url)
+            except ValueError as e:
+                raise UserError(str(e))
+        previous_search_mode = self.env['elevenlabs.settings'].sudo().get('product_search_mode')
+        super().set_values()
+        if self.elevenlabs_product_search_mode == 'fulltext' and previous_search_mode != 'fulltext':
+            # The search documents are not maintained in the other modes
+            self.env['elevenlabs.product.search.index'].sudo()._request_rebuild()
+        # Drop the cached settings snapshot so widget rendering picks up the new values
+        self.env['elevenlabs.settings'].invalidate_snapshot()
@@ -12,3 +12,10 @@ class ResUsers(models.Model):
         default=False,
         help='Mark this user as a VIP customer for ElevenLabs AI Assistant targeting.'
     )
+
+    def _is_elevenlabs_vip(self):
+        """VIP for the widget targeting: flagged as VIP customer or VIP manager"""
+        self.ensure_one()
+        if self._is_public():
+            return False
+        return bool(self.sudo().is_elevenlabs_vip or self.has_group('elevenlabs_agent.group_elevenlabs_vip_manager'))
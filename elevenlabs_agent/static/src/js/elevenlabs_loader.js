@@ -0,0 +1,201 @@
+/**
+ * ElevenLabs Agent loader
+ *
+ * Small script included on every website page instead of the widget
+ * bundle. It fetches the site-wide config, applies the page and device
+ * rules, waits for the configured trigger and only then loads the widget
+ * stylesheet and script. Visitors for whom no trigger fires never
+ * download the bundle.
+ */
+(function() {
+    'use strict';
+
+    var WIDGET_CSS_URL = '/elevenlabs_agent/static/src/css/elevenlabs_agent.css?v=2.0';
+    var WIDGET_JS_URL = '/elevenlabs_agent/static/src/js/elevenlabs_widget.js?v=2.0';
+
+    // Shared with the widget script: config request and trigger state
+    var loader = window.ElevenLabsLoader = window.ElevenLabsLoader || {};
+    if (loader.started) {
+        return;
+    }
+    loader.started = true;
+    loader.loaded = false;
+    loader.triggered = false;
+
+    function getCurrentPageType() {
+        var pathname = window.location.pathname;
+        if (pathname === '/') {
+            return 'homepage';
+        }
+        var pathSegments = pathname.split('/').filter(function(segment) {
+            return segment !== '';
+        });
+        return pathSegments.length > 0 ? pathSegments[0] : 'other';
+    }
+
+    function splitPages(pages) {
+        return (pages || '').split(',').map(function(page) {
+            return page.trim();
+        }).filter(function(page) {
+            return page !== '';
+        });
+    }
+
+    function shouldShowOnCurrentPage(config) {
+        var currentPage = getCurrentPageType();
+        if (splitPages(config.pages_to_hide).indexOf(currentPage) !== -1) {
+            return false;
+        }
+        var allowedPages = splitPages(config.pages_to_show);
+        return allowedPages.length === 0 || allowedPages.indexOf(currentPage) !== -1;
+    }
+
+    function passesDeviceFiltering(config) {
+        var isMobile = /Android|webOS|iPhone|iPad|iPod|BlackBerry|IEMobile|Opera Mini/i.test(navigator.userAgent);
+        if (config.device_filtering === 'desktop') {
+            return !isMobile;
+        }
+        if (config.device_filtering === 'mobile') {
+            return isMobile;
+        }
+        return true;
+    }
+
+    /**
+     * Append the widget stylesheet and script, once
+     */
+    function loadWidget() {
+        if (loader.loaded) {
+            return;
+        }
+        loader.loaded = true;
+
+        var link = document.createElement('link');
+        link.rel = 'stylesheet';
+        link.type = 'text/css';
+        link.href = WIDGET_CSS_URL;
+        document.head.appendChild(link);
+
+        var script = document.createElement('script');
+        script.type = 'text/javascript';
+        script.src = WIDGET_JS_URL;
+        script.async = true;
+        document.head.appendChild(script);
+    }
+
+    /**
+     * Wait for the first configured trigger, then load the widget. The
+     * widget creates the agent right away as the trigger already fired.
+     */
+    function watchTriggers(config) {
+        var triggerDelay = parseInt(config.trigger_delay) || 0;
+        var triggerOnScroll = parseFloat(config.trigger_on_scroll) || 0;
+        var triggerOnTime = parseInt(config.trigger_on_time) || 0;
+        var triggerOnExitIntent = config.trigger_on_exit_intent === true;
+        var cleanups = [];
+
+        function fire() {
+            if (loader.triggered) {
+                return;
+            }
+            loader.triggered = true;
+            cleanups.forEach(function(cleanup) {
+                cleanup();
+            });
+            loadWidget();
+        }
+
+        if (triggerDelay > 0) {
+            var delayTimer = setTimeout(fire, triggerDelay * 1000);
+            cleanups.push(function() {
+                clearTimeout(delayTimer);
+            });
+        }
+
+        if (triggerOnScroll > 0) {
+            var handleScroll = function() {
+                var scrollTop = window.pageYOffset || document.documentElement.scrollTop;
+                var docHeight = document.documentElement.scrollHeight - window.innerHeight;
+                if ((scrollTop / docHeight) * 100 >= triggerOnScroll) {
+                    fire();
+                }
+            };
+            window.addEventListener('scroll', handleScroll, { passive: true });
+            cleanups.push(function() {
+                window.removeEventListener('scroll', handleScroll);
+            });
+        }
+
+        if (triggerOnTime > 0) {
+            var timeTimer = setTimeout(fire, triggerOnTime * 1000);
+            cleanups.push(function() {
+                clearTimeout(timeTimer);
+            });
+        }
+
+        if (triggerOnExitIntent) {
+            var handleMouseOut = function(e) {
+                var from = e.relatedTarget || e.toElement;
+                if (!from || from.nodeName === 'HTML') {
+                    fire();
+                }
+            };
+            var handleMouseMove = function(e) {
+                if (e.clientY < 50) {
+                    fire();
+                }
+            };
+            document.addEventListener('mouseout', handleMouseOut, true);
+            document.addEventListener('mousemove', handleMouseMove, true);
+            cleanups.push(function() {
+                document.removeEventListener('mouseout', handleMouseOut, true);
+                document.removeEventListener('mousemove', handleMouseMove, true);
+            });
+        }
+
+        if (triggerDelay === 0 && triggerOnScroll === 0 && triggerOnTime === 0 && !triggerOnExitIntent) {
+            fire();
+        }
+    }
+
+    function start() {
+        var container = document.querySelector('.elevenlabs-agent-container');
+        if (!container || !container.dataset.configUrl) {
+            return;
+        }
+
+        loader.config = fetch(container.dataset.configUrl, { credentials: 'same-origin' })
+            .then(function(response) {
+                if (!response.ok) {
+                    throw new Error('HTTP ' + response.status);
+                }
+                return response.json();
+            })
+            .catch(function(error) {
+                console.error('ElevenLabs widget config could not be loaded:', error);
+                return null;
+            });
+
+        // The debug panel needs the widget script whatever the rules
+        if (new URLSearchParams(window.location.search).get('debug') === '1') {
+            loadWidget();
+            return;
+        }
+
+        loader.config.then(function(config) {
+            if (!config || !config.enabled) {
+                return;
+            }
+            if (!shouldShowOnCurrentPage(config) || !passesDeviceFiltering(config)) {
+                return;
+            }
+            watchTriggers(config);
+        });
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', start);
+    } else {
+        start();
+    }
+})();
@@ -27,13 +27,19 @@
         }
     }
 
-    // Wait for DOM to be ready
-    document.addEventListener('DOMContentLoaded', function() {
+    function onDomReady() {
         initializeElevenLabsWidget();
         
         // Ensure viewport positioning is correct
         ensureFixedPositioning();
-    });
+    }
+
+    // Wait for DOM to be ready, the loader may add this script later
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', onDomReady);
+    } else {
+        onDomReady();
+    }
     
     function ensureFixedPositioning() {
         // Check and fix positioning every second for first 5 seconds
@@ -79,25 +85,29 @@
 
             usageCheckInProgress = true;
 
-            // Check if limits are configured
-            var hasDailyLimit = dailyUsageLimit > 0;
-            var hasGlobalLimit = globalUsageLimit > 0;
-
-            // If no limits are set, create widget immediately
-            if (!hasDailyLimit && !hasGlobalLimit) {
-                debugLog('No usage limits configured, creating widget');
-                createWidgetOnce();
-                usageCheckInProgress = false;
-                return;
-            }
+            // Check if limits are configured: the verdict only gates the widget then
+            var hasUsageLimit = dailyUsageLimit > 0 || globalUsageLimit > 0;
 
-            debugLog('Checking usage limits... daily:', dailyUsageLimit, 'global:', globalUsageLimit);
+            debugLog('Bootstrapping widget... daily limit:', dailyUsageLimit, 'global limit:', globalUsageLimit);
 
-            // Check usage limits
-            checkUsageLimits(userId, publicUserId)
+            // Reuses the bootstrap made at startup for the visitor data
+            bootstrapWidget()
                 .then(function(result) {
                     usageCheckInProgress = false;
 
+                    // Update publicUserId if it was returned by the backend
+                    if (result.public_user_id && !publicUserId) {
+                        publicUserId = result.public_user_id;
+                        debugLog('Public user ID from backend:', publicUserId);
+                    }
+
+                    // If no limits are set, create widget immediately
+                    if (!hasUsageLimit) {
+                        debugLog('No usage limits configured, creating widget');
+                        createWidgetOnce();
+                        return;
+                    }
+
                     if (!result.success) {
                         debugError('Usage check failed:', result.error);
                         // If check fails, show error and don't create widget
@@ -119,18 +129,16 @@
                         return;
                     }
 
-                    // Update publicUserId if it was returned by the backend
-                    if (result.public_user_id && !publicUserId) {
-                        publicUserId = result.public_user_id;
-                        debugLog('Public user ID from backend:', publicUserId);
-                    }
-
                     debugLog('Usage limits check passed. Daily remaining:', result.daily_limit.remaining, 'Global remaining:', result.global_limit.remaining);
                     createWidgetOnce();
                 })
                 .catch(function(error) {
                     usageCheckInProgress = false;
                     debugError('Usage check error:', error);
+                    if (!hasUsageLimit) {
+                        createWidgetOnce();
+                        return;
+                    }
                     showToast(
                         'Connection Error',
                         'Unable to connect to the server. Please check your internet connection.',
@@ -317,12 +325,18 @@
     var elevenlabsMaxMessagesPerConversation = 0;
     var elevenlabsSessionMessageCount = 0;
 
+    var bootstrapRequest = null;
+
     /**
-     * Check usage limits before creating the widget
-     * Returns a promise that resolves with the check result
+     * Fetch the visitor ID, user data and usage limit verdicts in one request
+     * Returns a promise that resolves with the bootstrap result, made once per page.
+     * A failed bootstrap (error, rate limited) is not kept: the next call retries.
      */
-    function checkUsageLimits(userId, publicUserId) {
-        return fetch('/api/elevenlabs/usage/check', {
+    function bootstrapWidget() {
+        if (bootstrapRequest) {
+            return bootstrapRequest;
+        }
+        bootstrapRequest = fetch('/api/elevenlabs/bootstrap', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -330,10 +344,7 @@
             body: JSON.stringify({
                 jsonrpc: '2.0',
                 method: 'call',
-                params: {
-                    user_id: userId,
-                    public_user_id: publicUserId
-                },
+                params: {},
                 id: Math.floor(Math.random() * 1000000)
             })
         })
@@ -342,104 +353,191 @@
         })
         .then(function(data) {
             if (data.result) {
+                if (!data.result.success) {
+                    bootstrapRequest = null;
+                }
                 return data.result;
             }
+            bootstrapRequest = null;
             return { success: false, allowed: false, error: 'Invalid response' };
         })
         .catch(function(error) {
-            debugError('Usage check failed:', error);
+            debugError('Widget bootstrap failed:', error);
+            bootstrapRequest = null;
             // Fail closed - if check fails, don't allow widget
             return { success: false, allowed: false, error: error.message };
         });
+        return bootstrapRequest;
     }
 
+    // Buffered usage events, flushed in batches to /api/elevenlabs/usage/batch
+    var USAGE_FLUSH_DELAY = 1000;
+    var usageEventQueue = [];
+    var usageFlushTimer = null;
+    var usageLifecycleListenersAdded = false;
+
     /**
-     * Start a new usage session when conversation is initiated
+     * Queue a usage event and schedule a flush
      */
-    function startUsageSession(sessionId, userId, publicUserId) {
-        elevenlabsSessionId = sessionId;
-        elevenlabsUserId = userId;
-        elevenlabsPublicUserId = publicUserId;
-        elevenlabsSessionMessageCount = 0;
-
-        return fetch('/api/elevenlabs/usage/session/start', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                jsonrpc: '2.0',
-                method: 'call',
-                params: {
-                    session_id: sessionId,
-                    user_id: userId,
-                    public_user_id: publicUserId,
-                    user_agent: navigator.userAgent,
-                    referrer: document.referrer
-                },
-                id: Math.floor(Math.random() * 1000000)
-            })
-        })
-        .then(function(response) {
-            return response.json();
-        })
-        .then(function(data) {
-            if (data.result && data.result.success) {
-                debugLog('Usage session started:', data.result);
-                return data.result;
-            }
-            debugError('Failed to start usage session:', data);
-            return null;
-        })
-        .catch(function(error) {
-            debugError('Session start failed:', error);
-            return null;
-        });
+    function queueUsageEvent(event) {
+        usageEventQueue.push(event);
+        if (!usageFlushTimer) {
+            usageFlushTimer = setTimeout(function() {
+                flushUsageEvents(false);
+            }, USAGE_FLUSH_DELAY);
+        }
+        addUsageLifecycleListeners();
     }
 
     /**
-     * Record a message in the current session
+     * Flush buffered usage events in one request.
+     * When the page is being hidden, sendBeacon is used so the events
+     * survive the page unload.
      */
-    function recordMessage(sessionId) {
-        return fetch('/api/elevenlabs/usage/message', {
+    function flushUsageEvents(useBeacon) {
+        if (usageFlushTimer) {
+            clearTimeout(usageFlushTimer);
+            usageFlushTimer = null;
+        }
+        if (usageEventQueue.length === 0) {
+            return Promise.resolve(null);
+        }
+
+        var events = usageEventQueue;
+        usageEventQueue = [];
+
+        var body = JSON.stringify({
+            jsonrpc: '2.0',
+            method: 'call',
+            params: {
+                events: events
+            },
+            id: Math.floor(Math.random() * 1000000)
+        });
+
+        if (useBeacon && navigator.sendBeacon) {
+            var queued = navigator.sendBeacon(
+                '/api/elevenlabs/usage/batch',
+                new Blob([body], { type: 'application/json' })
+            );
+            debugLog('Usage events sent with beacon:', events.length, 'queued:', queued);
+            return Promise.resolve(null);
+        }
+
+        return fetch('/api/elevenlabs/usage/batch', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({
-                jsonrpc: '2.0',
-                method: 'call',
-                params: {
-                    session_id: sessionId
-                },
-                id: Math.floor(Math.random() * 1000000)
-            })
+            body: body,
+            keepalive: true
         })
         .then(function(response) {
             return response.json();
         })
         .then(function(data) {
-            if (data.result && data.result.success) {
-                elevenlabsSessionMessageCount = data.result.message_count;
+            if (!data.result || !data.result.success) {
+                debugError('Failed to record usage events:', data);
+                return null;
+            }
+
+            debugLog('Usage events recorded:', data.result);
+
+            // Apply the latest message result of the current session
+            var lastMessageResult = null;
+            data.result.results.forEach(function(result, index) {
+                if (events[index].type === 'message' && result.success &&
+                    events[index].session_id === elevenlabsSessionId) {
+                    lastMessageResult = result;
+                }
+            });
+
+            if (lastMessageResult) {
+                elevenlabsSessionMessageCount = lastMessageResult.message_count;
 
                 // Log full response for debugging
-                debugLog('Message recorded. Count:', data.result.message_count, 'Limit exceeded:', data.result.limit_exceeded, 'Remaining:', data.result.remaining);
+                debugLog('Message recorded. Count:', lastMessageResult.message_count, 'Limit exceeded:', lastMessageResult.limit_exceeded, 'Remaining:', lastMessageResult.remaining);
 
                 // Check if limit exceeded
-                if (data.result.limit_exceeded) {
-                    handleSessionLimitExceeded(data.result);
+                if (lastMessageResult.limit_exceeded) {
+                    handleSessionLimitExceeded(lastMessageResult);
                 }
-
-                return data.result;
             }
-            return null;
+
+            return data.result;
         })
         .catch(function(error) {
-            debugError('Message recording failed:', error);
+            debugError('Usage events flush failed:', error);
             return null;
         });
     }
 
+    /**
+     * Flush pending events when the page is hidden, and end the
+     * conversation when the page is unloaded
+     */
+    function addUsageLifecycleListeners() {
+        if (usageLifecycleListenersAdded) {
+            return;
+        }
+        usageLifecycleListenersAdded = true;
+
+        document.addEventListener('visibilitychange', function() {
+            if (document.visibilityState === 'hidden') {
+                flushUsageEvents(true);
+            }
+        });
+
+        window.addEventListener('pagehide', function() {
+            if (elevenlabsSessionId) {
+                usageEventQueue.push({
+                    type: 'end',
+                    session_id: elevenlabsSessionId
+                });
+                elevenlabsSessionId = null;
+            }
+            flushUsageEvents(true);
+        });
+    }
+
+    /**
+     * Start a new usage session when conversation is initiated
+     */
+    function startUsageSession(sessionId, userId, publicUserId) {
+        // A new conversation in the same page ends the previous one
+        if (elevenlabsSessionId && elevenlabsSessionId !== sessionId) {
+            queueUsageEvent({
+                type: 'end',
+                session_id: elevenlabsSessionId
+            });
+        }
+
+        elevenlabsSessionId = sessionId;
+        elevenlabsUserId = userId;
+        elevenlabsPublicUserId = publicUserId;
+        elevenlabsSessionMessageCount = 0;
+
+        debugLog('Usage session start queued:', sessionId);
+        queueUsageEvent({
+            type: 'start',
+            session_id: sessionId,
+            user_id: userId,
+            public_user_id: publicUserId,
+            user_agent: navigator.userAgent,
+            referrer: document.referrer
+        });
+    }
+
+    /**
+     * Record a message in the current session
+     */
+    function recordMessage(sessionId) {
+        queueUsageEvent({
+            type: 'message',
+            session_id: sessionId
+        });
+    }
+
     /**
      * Handle session limit exceeded - remove widget and show toast
      */
@@ -461,37 +559,6 @@
         );
     }
 
-    /**
-     * Get client IP and generate public user ID
-     */
-    function getClientInfo() {
-        return fetch('/api/elevenlabs/usage/client-ip', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                jsonrpc: '2.0',
-                method: 'call',
-                params: {},
-                id: Math.floor(Math.random() * 1000000)
-            })
-        })
-        .then(function(response) {
-            return response.json();
-        })
-        .then(function(data) {
-            if (data.result && data.result.success) {
-                return data.result;
-            }
-            return null;
-        })
-        .catch(function(error) {
-            debugError('Failed to get client info:', error);
-            return null;
-        });
-    }
-
     /**
      * Show a toast notification
      */
@@ -760,6 +827,38 @@
     // END USAGE TRACKING AND RATE LIMITING FUNCTIONS
     // ============================================================
 
+    /**
+     * Fetch the site-wide config from its versioned URL, cached by the browser
+     * Returns a promise that resolves with the config, or null on failure
+     */
+    function loadWidgetConfig(configUrl) {
+        return fetch(configUrl, { credentials: 'same-origin' })
+            .then(function(response) {
+                if (!response.ok) {
+                    throw new Error('HTTP ' + response.status);
+                }
+                return response.json();
+            })
+            .catch(function(error) {
+                debugError('Widget config could not be loaded:', error);
+                return null;
+            });
+    }
+
+    /**
+     * Store fetched values as data attributes of the container, the way
+     * the settings used to be rendered in the page
+     */
+    function setContainerData(container, values) {
+        Object.keys(values).forEach(function(name) {
+            var key = name.replace(/_([a-z])/g, function(match, letter) {
+                return letter.toUpperCase();
+            });
+            var value = values[name];
+            container.dataset[key] = value === null || value === undefined ? '' : String(value);
+        });
+    }
+
     function initializeElevenLabsWidget() {
         // Find the container element
         var container = document.querySelector('.elevenlabs-agent-container');
@@ -767,7 +866,36 @@
             debugLog('ElevenLabs container not found');
             return;
         }
+        if (!container.dataset.configUrl) {
+            startElevenLabsWidget(container);
+            return;
+        }
+
+        // Reuse the config already requested by the loader
+        var loader = window.ElevenLabsLoader;
+        var configRequest = loader && loader.config ? loader.config : loadWidgetConfig(container.dataset.configUrl);
+
+        configRequest.then(function(config) {
+            if (!config) {
+                return;
+            }
+            setContainerData(container, config);
 
+            // The user data is only needed once the page qualifies for the widget
+            if (!config.enabled || !_shouldShowOnCurrentPage(config.pages_to_show || null, config.pages_to_hide || null)) {
+                startElevenLabsWidget(container);
+                return;
+            }
+            bootstrapWidget().then(function(result) {
+                if (result.user) {
+                    setContainerData(container, result.user);
+                }
+                startElevenLabsWidget(container);
+            });
+        });
+    }
+
+    function startElevenLabsWidget(container) {
         // Check for debug mode first (always show debug panel if debug=1)
         var urlParams = new URLSearchParams(window.location.search);
         if (urlParams.get('debug') === '1') {
@@ -785,6 +913,14 @@
         var triggerOnScroll = parseFloat(container.dataset.triggerOnScroll) || 0;
         var triggerOnTime = parseInt(container.dataset.triggerOnTime) || 0;
         var triggerOnExitIntent = container.dataset.triggerOnExitIntent === 'true';
+
+        // The loader only adds this script once a trigger fired
+        if (window.ElevenLabsLoader && window.ElevenLabsLoader.triggered) {
+            triggerDelay = 0;
+            triggerOnScroll = 0;
+            triggerOnTime = 0;
+            triggerOnExitIntent = false;
+        }
         var showFirstTimeVisitorsOnly = container.dataset.showFirstTimeVisitorsOnly === 'true';
 
         // Integration controls
@@ -945,7 +1081,7 @@
         var publicUserId = null;
         if (userIsPublic) {
             // Store in a global variable for later use
-            // Will be populated by getClientInfo when needed
+            // Will be returned by the bootstrap request
             publicUserId = null;  // Will be generated from IP on the backend
         }
 
@@ -1206,7 +1342,111 @@
             debugError('No products to display');
             return;
         }
-        
+
+        loadProductCards(products).then(renderProductCards);
+    }
+
+    function loadProductCards(products) {
+        // Merge the server card payloads (thumbnail sized, browser cacheable
+        // images) into the products sent by the agent. Products that are
+        // unknown or fail to load keep the data they came with.
+        var productIds = [];
+        var skus = [];
+        products.forEach(function(product) {
+            var productId = parseInt(product.id || product.product_id, 10);
+            if (productId) {
+                if (productIds.indexOf(productId) === -1) {
+                    productIds.push(productId);
+                }
+            } else if (product.sku && skus.indexOf(String(product.sku).trim()) === -1) {
+                skus.push(String(product.sku).trim());
+            }
+        });
+
+        if (productIds.length === 0 && skus.length === 0) {
+            return Promise.resolve(products);
+        }
+
+        // Products known by SKU only are resolved with the IDs in a single lookup
+        var request = skus.length ? lookupProductCards(productIds, skus) : fetchProductCards(productIds);
+
+        return request
+        .then(function(cards) {
+            if (!cards) {
+                return products;
+            }
+            return products.map(function(product) {
+                var card = cards.byId[parseInt(product.id || product.product_id, 10)] ||
+                    (product.sku ? cards.bySku[String(product.sku).trim()] : null);
+                return card ? Object.assign({}, product, card) : product;
+            });
+        })
+        .catch(function(error) {
+            debugWarn('Product cards could not be loaded:', error);
+            return products;
+        });
+    }
+
+    function fetchProductCards(productIds) {
+        // Sorted IDs keep the URL stable so the browser cache can answer
+        productIds = productIds.slice().sort(function(a, b) { return a - b; });
+
+        return fetch('/api/elevenlabs/products/cards?ids=' + productIds.join(','), {
+            credentials: 'same-origin'
+        })
+        .then(function(response) {
+            return response.json();
+        })
+        .then(function(data) {
+            if (!data.success) {
+                return null;
+            }
+            var cards = { byId: {}, bySku: {} };
+            data.cards.forEach(function(card) {
+                cards.byId[card.id] = card;
+            });
+            return cards;
+        });
+    }
+
+    function lookupProductCards(productIds, skus) {
+        return fetch('/api/elevenlabs/products/lookup', {
+            method: 'POST',
+            credentials: 'same-origin',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                jsonrpc: '2.0',
+                method: 'call',
+                params: { ids: productIds, skus: skus },
+                id: Math.floor(Math.random() * 1000000)
+            })
+        })
+        .then(function(response) {
+            return response.json();
+        })
+        .then(function(data) {
+            if (!data.result || !data.result.success) {
+                return null;
+            }
+            if (data.result.not_found.skus.length) {
+                debugLog('Unknown product SKUs:', data.result.not_found.skus);
+            }
+            var cards = { byId: {}, bySku: {} };
+            data.result.results.forEach(function(result) {
+                if (result.product) {
+                    cards.byId[result.product.id] = result.product;
+                    if (result.key === 'sku') {
+                        cards.bySku[result.value] = result.product;
+                    }
+                }
+            });
+            return cards;
+        });
+    }
+
+    function renderProductCards(products) {
         // Remove any existing product modal
         var existingModal = document.querySelector('.elevenlabs-product-modal');
         if (existingModal) {
@@ -1328,6 +1568,7 @@
             var productName = product.name || product.Name || 'Product';
             var productPrice = product.price || product.Price || '0.00';
             var productImage = product.image || product.Image || null;
+            var productImageLarge = product.image_large || null;
             var productSku = product.sku || product.SKU || product.default_code || 'SKU-' + index;
             var productId = product.id || product.product_id || null;
 
@@ -1342,7 +1583,8 @@
             if (productImage) {
                 // Add unique ID for each image to prevent mixing
                 var imageId = 'el-prod-img-' + index + '-' + Date.now();
-                html += '<img id="' + imageId + '" src="' + productImage + '" alt="' + productName + '" loading="eager" data-src="' + productImage + '" style="width: 100%; height: 100%; object-fit: cover;" onerror="this.onerror=null;this.parentElement.innerHTML=\'<i class=\\\'fa fa-cube\\\' style=\\\'font-size: 24px; color: #cbd5e0;\\\'></i>\';" />';
+                var srcset = productImageLarge ? ' srcset="' + productImage + ' 256w, ' + productImageLarge + ' 512w" sizes="120px"' : '';
+                html += '<img id="' + imageId + '" src="' + productImage + '"' + srcset + ' alt="' + productName + '" loading="eager" data-src="' + productImage + '" style="width: 100%; height: 100%; object-fit: cover;" onerror="this.onerror=null;this.parentElement.innerHTML=\'<i class=\\\'fa fa-cube\\\' style=\\\'font-size: 24px; color: #cbd5e0;\\\'></i>\';" />';
             } else {
                 html += '<div class="no-image-placeholder" style="display: flex; align-items: center; justify-content: center; width: 100%; height: 100%; color: #cbd5e0;">';
                 html += '<i class="fa fa-cube" style="font-size: 24px;"></i>';
@@ -1427,10 +1669,12 @@
             modal._escapeHandler = escapeHandler;
         }
 
-        // Initialize Swiper
-        var swiperContainer = document.querySelector('.eleventlabs-swiper');
-        if (swiperContainer && typeof Swiper !== 'undefined') {
-            var swiper = new Swiper('.eleventlabs-swiper', {
+        // Initialize Swiper, loaded the first time cards are shown
+        loadSwiper().then(function() {
+            if (!document.querySelector('.eleventlabs-swiper')) {
+                return;  // Modal closed in the meantime
+            }
+            new Swiper('.eleventlabs-swiper', {
                 slidesPerView: 'auto',
                 spaceBetween: 8,
                 resistanceRatio: 0,
@@ -1456,7 +1700,48 @@
                     }
                 }
             });
+        }).catch(function(error) {
+            debugError('Product carousel unavailable:', error);
+        });
+    }
+
+    var swiperRequest = null;
+
+    /**
+     * Load the Swiper stylesheet and script from the configured URL, once
+     * Returns a promise that resolves when Swiper is available
+     */
+    function loadSwiper() {
+        if (typeof Swiper !== 'undefined') {
+            return Promise.resolve();
         }
+        if (swiperRequest) {
+            return swiperRequest;
+        }
+        var container = document.querySelector('.elevenlabs-agent-container');
+        var baseUrl = (container && container.dataset.swiperUrl) || 'https://cdn.jsdelivr.net/npm/swiper@11';
+        baseUrl = baseUrl.replace(/\/+$/, '');
+
+        swiperRequest = new Promise(function(resolve, reject) {
+            var link = document.createElement('link');
+            link.rel = 'stylesheet';
+            link.type = 'text/css';
+            link.href = baseUrl + '/swiper-bundle.min.css';
+            document.head.appendChild(link);
+
+            var script = document.createElement('script');
+            script.type = 'text/javascript';
+            script.src = baseUrl + '/swiper-bundle.min.js';
+            script.onload = function() {
+                resolve();
+            };
+            script.onerror = function() {
+                swiperRequest = null;
+                reject(new Error('Swiper could not be loaded from ' + baseUrl));
+            };
+            document.head.appendChild(script);
+        });
+        return swiperRequest;
     }
 
     function handleSearchProducts(params) {
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+
+from . import test_benchmarks
+from . import test_query_budgets
+from . import test_usage_partitioning
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic data and helpers shared by the ElevenLabs benchmarks and query
+budget tests.
+
+Catalogs and usage histories are generated in SQL: one seed record is
+created through the ORM, so every column gets its regular default, and
+then copied with generate_series, which takes seconds where the ORM
+would take hours for hundreds of thousands of rows. Nothing requires
+network access.
+"""
+
+import math
+
+from odoo.tools import SQL
+
+SKU_FORMAT = 'BENCH-%07d'
+
+# Public visitors of the seeded usage history
+USAGE_VISITORS = 5000
+
+# Days covered by the seeded usage history
+USAGE_DAYS = 30
+
+
+def _insert_copies(cr, table, source_id, count, overrides):
+    """
+    Insert ``count`` copies of the row ``source_id`` of ``table``.
+
+    Args:
+        overrides: dict mapping column name to an SQL expression of ``n``
+            (1..count) and ``src`` (the copied row)
+
+    Returns: list of the new ids, in ``n`` order
+    """
+    cr.execute("""
+        SELECT column_name
+          FROM information_schema.columns
+         WHERE table_schema = current_schema() AND table_name = %s AND column_name != 'id'
+      ORDER BY ordinal_position
+    """, [table])
+    columns = [row[0] for row in cr.fetchall()]
+    values = [overrides.get(column, SQL('src.%s', SQL.identifier(column))) for column in columns]
+    cr.execute(SQL("""
+        INSERT INTO %s (%s)
+        SELECT %s
+          FROM %s src, generate_series(1, %s) AS n
+         WHERE src.id = %s
+      ORDER BY n
+     RETURNING id
+    """, SQL.identifier(table), SQL(', ').join(SQL.identifier(column) for column in columns),
+        SQL(', ').join(values), SQL.identifier(table), count, source_id))
+    return sorted(row[0] for row in cr.fetchall())
+
+
+def seed_catalog(env, count, offset=0):
+    """
+    Add ``count`` published, saleable single-variant products numbered
+    from ``offset + 1``, with the SKU ``SKU_FORMAT % number``, in one
+    public category.
+
+    Returns: product.product recordset of the new variants
+    """
+    category = env['product.public.category'].search([('name', '=', 'Bench Category')], limit=1) \
+        or env['product.public.category'].create({'name': 'Bench Category'})
+    seed = env['product.template'].create({
+        'name': 'Bench Seed',
+        'list_price': 10.0,
+        'sale_ok': True,
+        'is_published': True,
+        'description_sale': 'Synthetic product for the ElevenLabs benchmarks',
+        'public_categ_ids': [(6, 0, category.ids)],
+    })
+    env.flush_all()
+    cr = env.cr
+
+    number = SQL('(n + %s)', offset)
+    template_ids = _insert_copies(cr, 'product_template', seed.id, count, {
+        'name': SQL("jsonb_build_object('en_US', 'Bench Product ' || %s)", number),
+        'list_price': SQL('(mod(%s, 500) + 0.99)', number),
+        'default_code': SQL("'BENCH-' || lpad(%s::text, 7, '0')", number),
+    })
+    first_template_id = template_ids[0]
+    product_ids = _insert_copies(cr, 'product_product', seed.product_variant_id.id, count, {
+        'product_tmpl_id': SQL('(%s + n - 1)', first_template_id),
+        'default_code': SQL("'BENCH-' || lpad(%s::text, 7, '0')", number),
+        'barcode': SQL('NULL'),
+    })
+
+    field = env['product.template']._fields['public_categ_ids']
+    cr.execute(SQL("""
+        INSERT INTO %s (%s, %s)
+        SELECT id, %s FROM product_template WHERE id >= %s
+    """, SQL.identifier(field.relation), SQL.identifier(field.column1), SQL.identifier(field.column2),
+        category.id, first_template_id))
+
+    seed.unlink()
+    env['elevenlabs.product.search.index']._refresh(product_ids)
+    cr.execute("ANALYZE product_template, product_product, elevenlabs_product_search")
+    env.invalidate_all()
+    return env['product.product'].browse(product_ids)
+
+
+def public_user_id(env, number):
+    """Public user ID of the seeded visitor ``number``, visitor 0 being 127.0.0.1"""
+    ip_address = '127.0.0.1' if number == 0 else '10.%d.%d.%d' % (number >> 16, (number >> 8) & 255, number & 255)
+    return env['elevenlabs.agent.usage'].get_or_create_public_user_id(ip_address)
+
+
+def seed_usage_history(env, rows, visitors=USAGE_VISITORS, days=USAGE_DAYS):
+    """
+    Add ``rows`` ended conversations spread over ``visitors`` public
+    visitors and the last ``days`` days, in the agent usage table, its
+    daily rollup and the legacy usage table.
+    """
+    cr = env.cr
+    visitor_ids = [public_user_id(env, number) for number in range(visitors)]
+    minutes = days * 24 * 60
+    chunk = 500000
+    for start in range(0, rows, chunk):
+        size = min(chunk, rows - start)
+        params = {
+            'start': start,
+            'size': size,
+            'visitors': visitor_ids,
+            'minutes': minutes,
+            'uid': env.uid,
+        }
+        cr.execute("""
+            INSERT INTO elevenlabs_agent_usage
+                   (session_id, public_user_id, message_count, is_active,
+                    session_start_date, session_end_date, last_activity_date,
+                    create_uid, create_date, write_uid, write_date)
+            SELECT 'bench-' || (%(start)s + n),
+                   (%(visitors)s::varchar[])[1 + mod(n, array_length(%(visitors)s::varchar[], 1))],
+                   1 + mod(n, 20), FALSE, d, d, d, %(uid)s, d, %(uid)s, d
+              FROM generate_series(1, %(size)s) AS n,
+                   LATERAL (SELECT (now() at time zone 'UTC') - make_interval(mins => mod(n * 7919, %(minutes)s)) AS d) AS t
+        """, params)
+        cr.execute("""
+            INSERT INTO elevenlabs_usage
+                   (session_id, user_identifier, message_count,
+                    create_uid, create_date, write_uid, write_date)
+            SELECT 'bench-' || (%(start)s + n),
+                   (%(visitors)s::varchar[])[1 + mod(n, array_length(%(visitors)s::varchar[], 1))],
+                   1 + mod(n, 20), %(uid)s, d, %(uid)s, d
+              FROM generate_series(1, %(size)s) AS n,
+                   LATERAL (SELECT (now() at time zone 'UTC') - make_interval(mins => mod(n * 7919, %(minutes)s)) AS d) AS t
+        """, params)
+
+    cr.execute("""
+        INSERT INTO elevenlabs_agent_usage_daily
+               (day, scope, key, public_user_id, message_count, create_uid, create_date, write_uid, write_date)
+        SELECT create_date::date, 'public', 'public:' || public_user_id, public_user_id, SUM(message_count),
+               %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+          FROM elevenlabs_agent_usage
+         WHERE session_id LIKE 'bench-%%'
+      GROUP BY create_date::date, public_user_id
+        UNION ALL
+        SELECT create_date::date, 'global', 'global', NULL, SUM(message_count),
+               %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+          FROM elevenlabs_agent_usage
+         WHERE session_id LIKE 'bench-%%'
+      GROUP BY create_date::date
+            ON CONFLICT (day, key) DO UPDATE
+           SET message_count = elevenlabs_agent_usage_daily.message_count + EXCLUDED.message_count
+    """, {'uid': env.uid})
+    cr.execute("ANALYZE elevenlabs_agent_usage, elevenlabs_usage, elevenlabs_agent_usage_daily")
+    env.invalidate_all()
+
+
+class JsonRpcMixin:
+    """Helpers of the HttpCase classes calling the JSON-RPC routes"""
+
+    def _jsonrpc_success(self, url, params=None):
+        """
+        Returns: result of the JSON-RPC call of ``url``, failing the test
+        unless it succeeded (a failed call measures the error path)
+        """
+        result = self.make_jsonrpc_request(url, params)
+        self.assertTrue(result['success'], "%s failed: %s" % (url, result))
+        return result
+
+
+def latency_summary(samples, elapsed):
+    """
+    Args:
+        samples: durations of the calls, in seconds
+        elapsed: wall time of the whole run, in seconds
+
+    Returns: dict with {calls, throughput_per_s, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}
+    """
+    ordered = sorted(samples)
+
+    def percentile(pct):
+        # nearest-rank percentile
+        return ordered[max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)]
+
+    return {
+        'calls': len(ordered),
+        'throughput_per_s': round(len(ordered) / elapsed, 2) if elapsed else None,
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+        'p50_ms': round(percentile(50) * 1000, 3),
+        'p95_ms': round(percentile(95) * 1000, 3),
+        'p99_ms': round(percentile(99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
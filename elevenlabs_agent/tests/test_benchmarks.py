@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Offline benchmarks of the ElevenLabs agent endpoints.
+
+Excluded from the standard test run, run them with e.g.:
+
+    odoo-bin -d bench -i elevenlabs_agent --test-tags elevenlabs_benchmark --stop-after-init
+
+Environment variables:
+    ELEVENLABS_BENCH_PRODUCTS    catalog sizes, comma-separated (default 10000;
+                                 e.g. 10000,50000,200000)
+    ELEVENLABS_BENCH_USAGE_ROWS  seeded conversations, in both usage tables (default 1000000)
+    ELEVENLABS_BENCH_ITERATIONS  measured calls per endpoint and catalog size (default 200)
+    ELEVENLABS_BENCH_OUTPUT      JSON result file (default: <data_dir>/elevenlabs_benchmarks/)
+
+Every call goes through the HTTP stack of the test server, sequentially,
+so throughput is the single-client rate of one worker.
+"""
+
+import json
+import logging
+import os
+import platform
+import subprocess
+import time
+
+from odoo import release
+from odoo.modules.module import get_module_path
+from odoo.tests import HttpCase, tagged
+from odoo.tools import config
+
+from ..tools.rate_limiter import ALGORITHMS, get_rate_limiter
+from .common import (
+    SKU_FORMAT, USAGE_VISITORS, JsonRpcMixin, latency_summary, public_user_id, seed_catalog, seed_usage_history,
+)
+
+_logger = logging.getLogger(__name__)
+
+WARMUP_CALLS = 10
+
+SEARCH_QUERIES = ['Bench Product 1', 'product 42', 'bench', 'BENCH-00001', 'no such product']
+
+
+def _env_int_list(name, default):
+    return sorted({int(value) for value in os.environ.get(name, default).split(',') if value.strip()})
+
+
+@tagged('post_install', '-at_install', '-standard', 'elevenlabs_benchmark')
+class TestEndpointBenchmarks(JsonRpcMixin, HttpCase):
+
+    def setUp(self):
+        super().setUp()
+        self.catalog_sizes = _env_int_list('ELEVENLABS_BENCH_PRODUCTS', '10000')
+        self.usage_rows = int(os.environ.get('ELEVENLABS_BENCH_USAGE_ROWS', 1000000))
+        self.iterations = int(os.environ.get('ELEVENLABS_BENCH_ITERATIONS', 200))
+
+        # Exercise the database path of every check: limits set, caches and rate limiting off
+        params = self.env['ir.config_parameter'].sudo()
+        params.set_param('elevenlabs_agent.enabled', True)
+        params.set_param('elevenlabs_agent.daily_usage_limit', 1000000)
+        params.set_param('elevenlabs_agent.global_usage_limit', 1000000000)
+        params.set_param('elevenlabs_agent.max_messages_per_conversation', 1000000)
+        params.set_param('elevenlabs_agent.product_search_cache_enabled', False)
+        params.set_param('elevenlabs_agent.rate_limit_enabled', False)
+        params.set_param('elevenlabs_agent.usage_write_mode', 'direct')
+
+    def _measure(self, call, iterations):
+        """
+        Returns: latency_summary() of ``iterations`` calls of ``call(i)``, after a warmup
+        """
+        for i in range(WARMUP_CALLS):
+            call(i)
+        samples = []
+        started = time.perf_counter()
+        for i in range(iterations):
+            start = time.perf_counter()
+            call(i)
+            samples.append(time.perf_counter() - start)
+        return latency_summary(samples, time.perf_counter() - started)
+
+    def _benchmark_endpoints(self, catalog_size):
+        """
+        Returns: list of result dicts, one per endpoint (and search mode)
+        """
+        results = []
+        params = self.env['ir.config_parameter'].sudo()
+
+        def record(endpoint, summary, **extra):
+            results.append(dict(endpoint=endpoint, catalog_size=catalog_size, **extra, **summary))
+            _logger.info("ElevenLabs benchmark %s %s (%s products): p50 %.2f ms, p95 %.2f ms, p99 %.2f ms",
+                         endpoint, extra.get('variant', ''), catalog_size,
+                         summary['p50_ms'], summary['p95_ms'], summary['p99_ms'])
+
+        for search_mode in ('ilike', 'fulltext'):
+            params.set_param('elevenlabs_agent.product_search_mode', search_mode)
+            if search_mode == 'fulltext':
+                # the documents are not maintained in the other modes
+                self.env['elevenlabs.product.search.index']._refresh()
+            summary = self._measure(lambda i: self.make_jsonrpc_request('/api/elevenlabs/products/search', {
+                'query': SEARCH_QUERIES[i % len(SEARCH_QUERIES)],
+                'limit': 6,
+            }), self.iterations)
+            record('search_products', summary, variant=search_mode)
+        params.set_param('elevenlabs_agent.product_search_mode', 'ilike')
+
+        summary = self._measure(lambda i: self.make_jsonrpc_request(
+            '/api/elevenlabs/product/sku/%s' % (SKU_FORMAT % (1 + (i * 7919) % catalog_size))), self.iterations)
+        record('get_product_by_sku', summary)
+
+        summary = self._measure(
+            lambda i: self.make_jsonrpc_request('/api/elevenlabs/usage/check'), self.iterations)
+        record('check_usage_limits', summary)
+
+        session_id = 'bench-live-%s' % catalog_size
+        self._jsonrpc_success('/api/elevenlabs/usage/session/start', {
+            'session_id': session_id,
+            'public_user_id': public_user_id(self.env, 0),
+        })
+        summary = self._measure(lambda i: self._jsonrpc_success(
+            '/api/elevenlabs/usage/message', {'session_id': session_id}), self.iterations)
+        record('record_message', summary)
+
+        summary = self._measure(lambda i: self.make_jsonrpc_request('/api/elevenlabs/session/check', {
+            'userIdentifier': public_user_id(self.env, i % USAGE_VISITORS),
+            'sessionId': 'bench-%s' % (1 + i),
+        }), self.iterations)
+        record('session_check', summary)
+        return results
+
+    def _benchmark_limit_decisions(self):
+        """
+        Decisions per second of the in-memory rate limiter algorithms,
+        against the daily limit check answered by the database.
+
+        Returns: list of result dicts
+        """
+        results = []
+        calls = self.iterations * 50
+        for algorithm in ALGORITHMS:
+            limiter = get_rate_limiter('benchmark', algorithm=algorithm, limit=1000000, window=60)
+            started = time.perf_counter()
+            for i in range(calls):
+                limiter.hit('benchmark:usage:visitor_%s' % (i % USAGE_VISITORS))
+            elapsed = time.perf_counter() - started
+            results.append({'path': 'rate_limiter', 'algorithm': algorithm, 'backend': 'memory',
+                            'calls': calls, 'decisions_per_s': round(calls / elapsed, 2)})
+
+        Usage = self.env['elevenlabs.agent.usage']
+        calls = self.iterations
+        started = time.perf_counter()
+        for i in range(calls):
+            Usage.check_daily_limit(public_user_id=public_user_id(self.env, i % USAGE_VISITORS), daily_limit=1000000)
+        elapsed = time.perf_counter() - started
+        results.append({'path': 'database', 'check': 'check_daily_limit',
+                        'calls': calls, 'decisions_per_s': round(calls / elapsed, 2)})
+        return results
+
+    def _get_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], cwd=get_module_path('elevenlabs_agent'),
+                capture_output=True, text=True, check=True, timeout=10,
+            ).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    def _write_results(self, report):
+        path = os.environ.get('ELEVENLABS_BENCH_OUTPUT') or os.path.join(
+            config['data_dir'], 'elevenlabs_benchmarks', 'benchmark-%s.json' % time.strftime('%Y%m%d-%H%M%S'))
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as result_file:
+            json.dump(report, result_file, indent=2, sort_keys=True)
+        _logger.info("ElevenLabs benchmark results written to %s", path)
+        return path
+
+    def test_benchmark_endpoints(self):
+        seeding_started = time.perf_counter()
+        seed_usage_history(self.env, self.usage_rows)
+        usage_seconds = time.perf_counter() - seeding_started
+
+        results = []
+        seeded = 0
+        for catalog_size in self.catalog_sizes:
+            seed_catalog(self.env, catalog_size - seeded, offset=seeded)
+            seeded = catalog_size
+            results.extend(self._benchmark_endpoints(catalog_size))
+
+        self.env.cr.execute("SHOW server_version")
+        report = {
+            'commit': self._get_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'environment': {
+                'odoo': release.version,
+                'postgresql': self.env.cr.fetchone()[0],
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+            },
+            'parameters': {
+                'catalog_sizes': self.catalog_sizes,
+                'usage_rows': self.usage_rows,
+                'usage_visitors': USAGE_VISITORS,
+                'iterations': self.iterations,
+                'warmup_calls': WARMUP_CALLS,
+            },
+            'usage_seeding_seconds': round(usage_seconds, 2),
+            'results': results,
+            'limit_decisions': self._benchmark_limit_decisions(),
+        }
+        self._write_results(report)
+        self.assertTrue(results)
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+SQL query budgets of the ElevenLabs agent endpoints.
+
+Every public route is called once to warm the caches, then once more
+while counting its queries, for catalogs of different sizes returning
+different numbers of products. The count must stay within the route
+budget and must not change with the catalog: a difference means a query
+is issued per product (or per record) again.
+
+The queries of the request dispatch (test cursor savepoint, public user
+lookup) are measured on the client-ip route, which issues none of its
+own, and have their own budget. Route budgets only count the queries
+issued on top of them.
+"""
+
+import inspect
+
+from odoo.tests import HttpCase, TransactionCase, tagged
+
+from ..controllers.main import MAX_CARD_PRODUCTS, ElevenLabsController
+from .common import JsonRpcMixin, public_user_id, seed_catalog
+
+# Catalog sizes compared, the largest one filling the result limits
+CATALOG_SIZES = (3, 30)
+
+# Maximum number of queries of the request dispatch
+DISPATCH_BUDGET = 6
+
+# Maximum number of queries of a warm call on top of the dispatch, per
+# route: the queries the route issues, plus a margin of 2
+QUERY_BUDGETS = {
+    'get_client_info': 0,
+    'session_init': 2,
+    'get_widget_config': 2,
+    'get_metrics': 2,
+    'bootstrap': 4,
+    'check_usage_limits': 4,
+    'start_session': 3,
+    'record_message': 3,
+    'end_session': 4,
+    'record_usage_batch': 7,
+    'session_record': 5,
+    'session_check': 3,
+    'get_product_by_sku': 12,
+    'get_product_details': 12,
+    'get_product_cards': 14,
+    'lookup_products': 14,
+    'get_recommended_products': 12,
+    'search_products': 12,
+}
+
+# Additional queries of a website page when the widget is injected
+WIDGET_INJECT_BUDGET = 4
+
+# Maximum number of queries of _elevenlabs_serialize on cold caches
+SERIALIZE_BUDGET = 12
+
+
+def _bench_products(env):
+    return env['product.product'].search([('default_code', '=like', 'BENCH-%')], order='id')
+
+
+def _public_api_routes():
+    """Returns: names of the controller methods serving a public /api/elevenlabs/ route"""
+    names = set()
+    for name, method in inspect.getmembers(ElevenLabsController, inspect.isfunction):
+        routing = getattr(method, 'original_routing', None) or {}
+        if routing.get('auth') == 'public' and any(
+                url.startswith('/api/elevenlabs/') for url in routing.get('routes', ())):
+            names.add(name)
+    return names
+
+
+class QueryCountMixin:
+
+    def _query_count(self, call):
+        """
+        Returns: number of queries of ``call()``, counted on the test
+        cursor (shared with the requests of the test server)
+        """
+        count = self.cr.sql_log_count
+        call()
+        return self.cr.sql_log_count - count
+
+    def _hot_query_count(self, call):
+        """Returns: number of queries of ``call()`` once its caches are warm"""
+        call()
+        return self._query_count(call)
+
+    def assertSizeIndependent(self, counts, name):
+        """Fail when the query counts measured for the catalog sizes differ"""
+        self.assertEqual(
+            len(set(counts)), 1,
+            "Query count of %s depends on the catalog size: %s" % (name, dict(zip(CATALOG_SIZES, counts))))
+
+
+@tagged('post_install', '-at_install')
+class TestRouteQueryBudgets(QueryCountMixin, JsonRpcMixin, HttpCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        params = cls.env['ir.config_parameter'].sudo()
+        params.set_param('elevenlabs_agent.enabled', True)
+        params.set_param('elevenlabs_agent.daily_usage_limit', 1000)
+        params.set_param('elevenlabs_agent.global_usage_limit', 100000)
+        params.set_param('elevenlabs_agent.max_messages_per_conversation', 1000)
+        params.set_param('elevenlabs_agent.rate_limit_enabled', False)
+        params.set_param('elevenlabs_agent.product_search_cache_enabled', False)
+        params.set_param('elevenlabs_agent.product_search_mode', 'ilike')
+        params.set_param('elevenlabs_agent.metrics_token', 'budget-token')
+        cls.visitor = public_user_id(cls.env, 0)
+
+    def _url_get(self, url, headers=None):
+        response = self.url_open(url, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def _route_calls(self, products):
+        """
+        Returns: dict mapping route name to a call of the route, returning
+        as many products as the catalog allows
+        """
+        category = products.public_categ_ids[:1]
+        card_ids = ','.join(str(product_id) for product_id in products.ids[:MAX_CARD_PRODUCTS])
+        config_version = self.env['elevenlabs.settings'].sudo().get_widget_config_version()
+        session_id = 'budget-%s' % len(products)
+        self._jsonrpc_success('/api/elevenlabs/usage/session/start', {
+            'session_id': session_id,
+            'public_user_id': self.visitor,
+        })
+        started = []
+
+        def new_session_id():
+            started.append(1)
+            return '%s-%s' % (session_id, len(started))
+
+        def start_session():
+            self._jsonrpc_success('/api/elevenlabs/usage/session/start', {
+                'session_id': new_session_id(),
+                'public_user_id': self.visitor,
+            })
+
+        def record_usage_batch():
+            batch_session_id = new_session_id()
+            result = self._jsonrpc_success('/api/elevenlabs/usage/batch', {'events': [
+                {'type': 'start', 'session_id': batch_session_id, 'public_user_id': self.visitor},
+                {'type': 'message', 'session_id': batch_session_id},
+                {'type': 'end', 'session_id': batch_session_id},
+            ]})
+            self.assertTrue(all(event['success'] for event in result['results']), result)
+
+        def lookup_products():
+            result = self._jsonrpc_success('/api/elevenlabs/products/lookup', {
+                'ids': products.ids[::2],
+                'skus': products[1::2].mapped('default_code') + ['NO-SUCH-SKU'],
+            })
+            self.assertEqual(result['not_found'], {'ids': [], 'skus': ['NO-SUCH-SKU']})
+
+        return {
+            'get_client_info': lambda: self._jsonrpc_success('/api/elevenlabs/usage/client-ip'),
+            'session_init': lambda: self._jsonrpc_success('/api/elevenlabs/session/init'),
+            'get_widget_config': lambda: self._url_get('/api/elevenlabs/config/%s.json' % config_version),
+            'get_metrics': lambda: self._url_get(
+                '/api/elevenlabs/metrics', headers={'Authorization': 'Bearer budget-token'}),
+            'bootstrap': lambda: self._jsonrpc_success('/api/elevenlabs/bootstrap'),
+            'check_usage_limits': lambda: self._jsonrpc_success('/api/elevenlabs/usage/check'),
+            'start_session': start_session,
+            'record_message': lambda: self._jsonrpc_success(
+                '/api/elevenlabs/usage/message', {'session_id': session_id}),
+            'end_session': lambda: self._jsonrpc_success(
+                '/api/elevenlabs/usage/session/end', {'session_id': session_id}),
+            'record_usage_batch': record_usage_batch,
+            'session_record': lambda: self._jsonrpc_success('/api/elevenlabs/session/record', {
+                'sessionId': session_id,
+                'userIdentifier': self.visitor,
+            }),
+            'session_check': lambda: self._jsonrpc_success('/api/elevenlabs/session/check', {
+                'userIdentifier': self.visitor,
+                'sessionId': session_id,
+            }),
+            'get_product_by_sku': lambda: self._jsonrpc_success(
+                '/api/elevenlabs/product/sku/%s' % products[-1].default_code),
+            'get_product_details': lambda: self._jsonrpc_success(
+                '/api/elevenlabs/product/%s' % products[-1].id),
+            'get_product_cards': lambda: self._url_get('/api/elevenlabs/products/cards?ids=%s' % card_ids),
+            'lookup_products': lookup_products,
+            'get_recommended_products': lambda: self._jsonrpc_success(
+                '/api/elevenlabs/products/recommended', {'category_id': category.id, 'limit': len(products)}),
+            'search_products': lambda: self._jsonrpc_success(
+                '/api/elevenlabs/products/search', {'query': 'bench product', 'limit': 20}),
+        }
+
+    def test_every_public_route_has_a_budget(self):
+        self.assertEqual(
+            set(QUERY_BUDGETS), _public_api_routes(),
+            "Every public /api/elevenlabs/ route needs a query budget, and only those")
+
+    def test_route_query_budgets(self):
+        counts = {}
+        seeded = 0
+        for size in CATALOG_SIZES:
+            seed_catalog(self.env, size - seeded, offset=seeded)
+            seeded = size
+            for route, call in self._route_calls(_bench_products(self.env)).items():
+                counts.setdefault(route, []).append(self._hot_query_count(call))
+
+        self.assertEqual(set(counts), set(QUERY_BUDGETS), "Every route with a budget must be measured")
+        dispatch_counts = counts['get_client_info']
+        self.assertLessEqual(max(dispatch_counts), DISPATCH_BUDGET, "The request dispatch exceeds its query budget")
+        for route, route_counts in counts.items():
+            with self.subTest(route=route):
+                self.assertLessEqual(
+                    max(count - dispatch for count, dispatch in zip(route_counts, dispatch_counts)),
+                    QUERY_BUDGETS[route],
+                    "%s exceeds its query budget: %s" % (route, route_counts))
+                self.assertSizeIndependent(route_counts, route)
+
+    def _widget_inject_queries(self):
+        """
+        Returns: queries added to the homepage by the widget injection
+        """
+        params = self.env['ir.config_parameter'].sudo()
+        params.set_param('elevenlabs_agent.enabled', False)
+        without_widget = self._hot_query_count(lambda: self.url_open('/'))
+        params.set_param('elevenlabs_agent.enabled', True)
+        with_widget = self._hot_query_count(lambda: self.url_open('/'))
+        response = self.url_open('/')
+        self.assertIn(b'elevenlabs-agent-container', response.content)
+        return with_widget - without_widget
+
+    def test_widget_inject_query_budget(self):
+        counts = []
+        seeded = 0
+        for size in CATALOG_SIZES:
+            seed_catalog(self.env, size - seeded, offset=seeded)
+            seeded = size
+            counts.append(self._widget_inject_queries())
+        self.assertLessEqual(max(counts), WIDGET_INJECT_BUDGET)
+        self.assertSizeIndependent(counts, 'elevenlabs_widget_inject')
+
+    def test_widget_inject_query_budget_vip_segment(self):
+        # The customer rules check the groups of the logged-in user
+        params = self.env['ir.config_parameter'].sudo()
+        params.set_param('elevenlabs_agent.customer_segment_targeting', 'vip')
+        params.set_param('elevenlabs_agent.exclude_public_users', True)
+        self.env.ref('base.user_admin').is_elevenlabs_vip = True
+        self.authenticate('admin', 'admin')
+        self.assertLessEqual(self._widget_inject_queries(), WIDGET_INJECT_BUDGET)
+
+
+@tagged('post_install', '-at_install')
+class TestSerializeQueryBudget(QueryCountMixin, TransactionCase):
+
+    def test_serialize_query_budget(self):
+        counts = []
+        seeded = 0
+        for size in CATALOG_SIZES:
+            seed_catalog(self.env, size - seeded, offset=seeded)
+            seeded = size
+            products = _bench_products(self.env)
+            self.env.invalidate_all()
+            counts.append(self._query_count(products._elevenlabs_serialize))
+        self.assertLessEqual(max(counts), SERIALIZE_BUDGET)
+        self.assertSizeIndependent(counts, '_elevenlabs_serialize')
+
+    def test_usage_display_name_query_budget(self):
+        Usage = self.env['elevenlabs.agent.usage']
+        user_ids = self.env['res.users'].search([], limit=2).ids
+        counts = []
+        for size in CATALOG_SIZES:
+            usages = Usage.create([{
+                'session_id': 'budget-name-%s-%s' % (size, number),
+                'user_id': user_ids[number % len(user_ids)] if number % 3 else False,
+                'public_user_id': False if number % 3 else public_user_id(self.env, number),
+            } for number in range(size)])
+            self.env.invalidate_all()
+            counts.append(self._query_count(lambda: usages.mapped('display_name')))
+        self.assertSizeIndependent(counts, 'elevenlabs.agent.usage display_name')
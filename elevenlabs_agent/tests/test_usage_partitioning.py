@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import fields
+from odoo.exceptions import ValidationError
+from odoo.tests import TransactionCase, tagged
+
+from ..models.elevenlabs_usage_partition import PARTITIONED_TABLES, SESSION_KEY_TABLE, USAGE_KEY_TABLE
+from .common import public_user_id
+
+
+@tagged('post_install', '-at_install')
+class TestUsagePartitioning(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Partition = cls.env['elevenlabs.usage.partition']
+        cls.Usage = cls.env['elevenlabs.agent.usage']
+        cls.this_month = fields.Datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        cls.old_month = cls.this_month - relativedelta(months=14)
+
+        cls.visitor = visitor = public_user_id(cls.env, 1)
+        cls.usages = cls.Usage.create([
+            {'session_id': 'partition-old', 'public_user_id': visitor},
+            {'session_id': 'partition-recent', 'public_user_id': visitor},
+            {'session_id': 'partition-user', 'user_id': cls.env.uid},
+        ])
+        cls.env['elevenlabs.usage'].create([
+            {'session_id': 'partition-old', 'user_identifier': visitor},
+            {'session_id': 'partition-recent', 'user_identifier': visitor},
+        ])
+        cls.env.flush_all()
+        for table in PARTITIONED_TABLES:
+            cls.env.cr.execute(
+                "UPDATE %s SET create_date = %%s WHERE session_id = 'partition-old'" % table,
+                [cls.old_month + relativedelta(days=3)])
+            cls.env.cr.execute(
+                "UPDATE %s SET create_date = %%s WHERE session_id = 'partition-recent'" % table,
+                [cls.this_month - relativedelta(months=2)])
+        cls.env.invalidate_all()
+
+    def setUp(self):
+        super().setUp()
+        # the partitioned tables are rolled back with the test, not the cached lookup
+        self.addCleanup(self.env.registry.clear_cache)
+
+    def _count(self, table):
+        self.env.cr.execute("SELECT COUNT(*) FROM %s" % table)
+        return self.env.cr.fetchone()[0]
+
+    def _constraints(self, table, contype):
+        self.env.cr.execute("""
+            SELECT conname, pg_get_constraintdef(oid)
+              FROM pg_constraint
+             WHERE conrelid = %s::regclass AND contype = %s
+        """, [table, contype])
+        return set(self.env.cr.fetchall())
+
+    def _plain_indexes(self, table):
+        self.env.cr.execute("""
+            SELECT i.indexrelid::regclass::text
+              FROM pg_index i
+             WHERE i.indrelid = %s::regclass AND NOT i.indisunique
+        """, [table])
+        return {row[0] for row in self.env.cr.fetchall()}
+
+    def _convert(self):
+        before = {
+            table: (self._count(table), self._constraints(table, 'f'), self._plain_indexes(table))
+            for table in PARTITIONED_TABLES
+        }
+        # small batches so that the rows are moved over several statements
+        self.assertTrue(self.Partition._enable_partitioning(batch_size=2))
+        return before
+
+    def test_convert_keeps_rows_and_schema(self):
+        before = self._convert()
+        for table in PARTITIONED_TABLES:
+            count, foreign_keys, indexes = before[table]
+            self.assertTrue(self.Partition._is_partitioned(table))
+            self.env.cr.execute("SELECT to_regclass(%s)", [table + '_heap'])
+            self.assertIsNone(self.env.cr.fetchone()[0], "the former table is dropped once emptied")
+            self.assertEqual(self._count(table), count)
+            self.assertEqual(self._constraints(table, 'f'), foreign_keys)
+            self.assertTrue(indexes <= self._plain_indexes(table))
+            self.assertEqual(
+                {definition for _name, definition in self._constraints(table, 'p')},
+                {'PRIMARY KEY (id, create_date)'})
+
+        # the rows land in their monthly partition and keep their ids
+        self.env.cr.execute("""
+            SELECT tableoid::regclass::text FROM elevenlabs_agent_usage WHERE session_id = 'partition-old'
+        """)
+        self.assertEqual(self.env.cr.fetchone()[0], 'elevenlabs_agent_usage_p%s' % self.old_month.strftime('%Y%m'))
+        self.assertEqual(self.Usage.search([('session_id', 'like', 'partition-%')]), self.usages)
+        self.assertEqual(self.usages.filtered('user_id').user_id, self.env.user)
+
+    def test_start_session_deduplicates_sessions(self):
+        self._convert()
+        self.env.cr.execute("SELECT COUNT(DISTINCT session_id) FROM elevenlabs_agent_usage")
+        self.assertEqual(self._count(SESSION_KEY_TABLE), self.env.cr.fetchone()[0])
+        visitor = public_user_id(self.env, 2)
+
+        # a session started before the conversion is found through its key,
+        # as when a concurrent start inserted the key and the row first
+        existing = self.usages.filtered(lambda usage: usage.session_id == 'partition-recent')
+        result = self.Usage.start_session('partition-recent', public_user_id=visitor)
+        self.assertEqual(result, {'usage_id': existing.id, 'message_count': 1, 'created': False})
+
+        result = self.Usage.start_session('partition-new', public_user_id=visitor)
+        self.assertTrue(result['created'])
+        self.assertTrue(result['usage_id'])
+        again = self.Usage.start_session('partition-new', public_user_id=visitor)
+        self.assertEqual(again, dict(result, created=False))
+        self.assertEqual(self.Usage.search_count([('session_id', '=', 'partition-new')]), 1)
+
+    def test_usage_keys_stay_unique(self):
+        self._convert()
+        self.env.cr.execute("""
+            SELECT COUNT(*) FROM (SELECT DISTINCT session_id, user_id, user_identifier FROM elevenlabs_usage) keys
+        """)
+        self.assertEqual(self._count(USAGE_KEY_TABLE), self.env.cr.fetchone()[0])
+        Usage = self.env['elevenlabs.usage']
+        # like the unique constraint it replaces, NULL columns never conflict
+        key = {'session_id': 'partition-new', 'user_id': self.env.uid, 'user_identifier': self.visitor}
+        Usage.create(key)
+        with self.assertRaises(ValidationError):
+            Usage.create(key)
+
+    def test_lookups_during_conversion(self):
+        # switched, but no row moved out of the former tables yet
+        self.assertFalse(self.Partition._enable_partitioning(batch_size=2, deadline=time.monotonic()))
+        for table in PARTITIONED_TABLES:
+            self.assertEqual(self._count(table), 0)
+        recent = self.usages.filtered(lambda usage: usage.session_id == 'partition-recent')
+
+        result = self.Usage.start_session('partition-recent', public_user_id=self.visitor)
+        self.assertEqual(result, {'usage_id': recent.id, 'message_count': 1, 'created': False})
+        self.assertEqual(self.Usage.record_session_message('partition-user')['message_count'], 2)
+        self.assertTrue(self.Usage.end_session('partition-old'))
+
+        Legacy = self.env['elevenlabs.usage']
+        limits = Legacy.check_user_limits(user_identifier=self.visitor, history_days=500)
+        self.assertEqual(limits['global_usage'], 2)
+        record, created = Legacy.get_or_create_usage_record('partition-recent', user_identifier=self.visitor)
+        self.assertFalse(created)
+        self.assertEqual(record.message_count, 2)
+
+        # the rows moved on demand are not moved again
+        self.assertTrue(self.Partition._enable_partitioning(batch_size=2))
+        self.assertEqual(self._count('elevenlabs_agent_usage'), 3)
+        self.assertEqual(self._count('elevenlabs_usage'), 2)
+
+    def test_drop_expired_partitions(self):
+        self._convert()
+        count = self._count('elevenlabs_agent_usage')
+        cutoff = self.this_month - relativedelta(months=12)
+        dropped = self.Partition._drop_expired_partitions('elevenlabs_agent_usage', cutoff)
+        self.assertEqual(dropped, 1)
+        self.assertEqual(self._count('elevenlabs_agent_usage'), count - 1)
+        self.env.cr.execute("SELECT to_regclass(%s)", ['elevenlabs_agent_usage_p%s' % self.old_month.strftime('%Y%m')])
+        self.assertIsNone(self.env.cr.fetchone()[0])
+        # later months are kept
+        self.assertEqual(self.Usage.search_count([('session_id', '=', 'partition-recent')]), 1)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+In-process result cache with a bounded size and a time to live.
+
+Caches are kept per process and per database. Entries older than the TTL
+are never returned, which bounds how stale a worker can get when another
+worker changes the data, while invalidate() drops the entries of the
+current worker immediately.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+# Cache of the agent product search results
+PRODUCT_SEARCH_CACHE = 'product_search'
+
+# Cache of the product IDs matching a SKU (default code or barcode)
+PRODUCT_SKU_CACHE = 'product_sku'
+
+
+class TTLCache:
+    """LRU cache whose entries expire ``ttl`` seconds after being stored"""
+
+    def __init__(self, max_size=512, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns: dict with {size, max_size, ttl, hits, misses, evictions, hit_ratio}
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(dbname, name, max_size=512, ttl=60):
+    """
+    Return the named cache of a database, rebuilding it when its size or
+    TTL changes. Rebuilding drops the cached entries and the counters.
+    """
+    key = (dbname, name)
+    config = (max_size, ttl)
+    cache_config = _caches.get(key)
+    if cache_config and cache_config[0] == config:
+        return cache_config[1]
+    with _caches_lock:
+        cache_config = _caches.get(key)
+        if cache_config and cache_config[0] == config:
+            return cache_config[1]
+        cache = TTLCache(max_size=max_size, ttl=ttl)
+        _caches[key] = (config, cache)
+        return cache
+
+
+def invalidate(dbname, name=None):
+    """Drop the entries of one or all caches of a database in this process"""
+    for (cache_dbname, cache_name), (_config, cache) in list(_caches.items()):
+        if cache_dbname == dbname and (name is None or cache_name == name):
+            cache.clear()
+
+
+def get_stats(dbname):
+    """
+    Returns: dict mapping cache name to its stats for the given database
+    """
+    return {
+        cache_name: cache.stats()
+        for (cache_dbname, cache_name), (_config, cache) in list(_caches.items())
+        if cache_dbname == dbname
+    }
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+Process-wide metrics of the ElevenLabs API, rendered in the Prometheus
+text exposition format.
+
+Recording never waits for a lock: every thread writes to its own shard
+of each metric, which only that thread mutates, and a scrape sums the
+shards. The shards of finished threads are folded into a retired total
+at scrape time, and when a thread registers a new shard while no scrape
+is running, so request threads coming and going do not accumulate
+between scrapes.
+
+Values are per process: with several workers, each scrape reports the
+worker that served it, identified by the ``worker`` label.
+"""
+
+import abc
+import bisect
+import functools
+import os
+import threading
+import time
+
+from odoo.http import request
+
+# Latency buckets of the API routes, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# SQL query count buckets of the API routes
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_registry = []
+_scrape_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (name, _escape(value)) for name, value in pairs)
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value) if value != int(value) else '%d' % value
+    return str(value)
+
+
+class _Metric(abc.ABC):
+    """Metric whose samples are kept in one dict per thread"""
+    type = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._local = threading.local()
+        self._shards = {}
+        self._retired = {}
+        _registry.append(self)
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            self._shards[threading.current_thread()] = shard
+            # Never blocks on a scrape in progress, which retires them anyway
+            if _scrape_lock.acquire(blocking=False):
+                try:
+                    self._retire_dead_shards()
+                finally:
+                    _scrape_lock.release()
+        return shard
+
+    @abc.abstractmethod
+    def _new_entry(self):
+        """Returns: empty entry of one label values combination"""
+
+    @abc.abstractmethod
+    def _merge_entry(self, total, entry):
+        """Add ``entry`` to the ``total`` entry, in place"""
+
+    @abc.abstractmethod
+    def _render_entry(self, labels, entry, extra_labels):
+        """Yield the exposition lines of one entry"""
+
+    def _retire_dead_shards(self):
+        """
+        Fold the shards of finished threads into the retired total.
+        Only called under the scrape lock.
+        """
+        for thread, shard in list(self._shards.items()):
+            if not thread.is_alive():
+                for labels, entry in list(shard.items()):
+                    self._merge_entry(self._retired.setdefault(labels, self._new_entry()), entry)
+                del self._shards[thread]
+
+    def _collect(self):
+        """
+        Sum the shards of every thread, retiring those of finished threads.
+        Only called under the scrape lock.
+
+        Returns: dict mapping label values to the merged entry
+        """
+        self._retire_dead_shards()
+        totals = {}
+        for source in [self._retired] + list(self._shards.values()):
+            for labels, entry in list(source.items()):
+                self._merge_entry(totals.setdefault(labels, self._new_entry()), entry)
+        return totals
+
+    def render(self, extra_labels=()):
+        lines = [
+            '# HELP %s %s' % (self.name, self.documentation),
+            '# TYPE %s %s' % (self.name, self.type),
+        ]
+        for labels, entry in sorted(self._collect().items()):
+            lines.extend(self._render_entry(labels, entry, extra_labels))
+        return lines
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        shard = self._shard()
+        shard[label_values] = shard.get(label_values, 0) + amount
+
+    def _new_entry(self):
+        return [0]
+
+    def _merge_entry(self, total, entry):
+        total[0] += entry[0] if isinstance(entry, list) else entry
+
+    def _render_entry(self, labels, entry, extra_labels):
+        yield '%s%s %s' % (self.name, _format_labels(self.labels, labels, extra_labels), _format_value(entry[0]))
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        shard = self._shard()
+        entry = shard.get(label_values)
+        if entry is None:
+            entry = shard[label_values] = self._new_entry()
+        # one count per bucket (upper bound inclusive) plus +Inf, then the sum
+        entry[bisect.bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def _new_entry(self):
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def _merge_entry(self, total, entry):
+        for index, value in enumerate(entry):
+            total[index] += value
+
+    def _render_entry(self, labels, entry, extra_labels):
+        cumulative = 0
+        bounds = [_format_value(float(bound)) for bound in self.buckets] + ['+Inf']
+        for bound, count in zip(bounds, entry[:-1]):
+            cumulative += count
+            yield '%s_bucket%s %s' % (
+                self.name, _format_labels(self.labels + ('le',), labels + (bound,), extra_labels), cumulative)
+        yield '%s_sum%s %s' % (self.name, _format_labels(self.labels, labels, extra_labels), _format_value(entry[-1]))
+        yield '%s_count%s %s' % (self.name, _format_labels(self.labels, labels, extra_labels), cumulative)
+
+
+REQUESTS = Counter(
+    'elevenlabs_http_requests_total', 'Requests served by the ElevenLabs API routes.',
+    labels=('route', 'outcome'))
+REQUEST_DURATION = Histogram(
+    'elevenlabs_http_request_duration_seconds', 'Wall time of the ElevenLabs API routes.',
+    labels=('route',), buckets=DURATION_BUCKETS)
+REQUEST_QUERIES = Histogram(
+    'elevenlabs_http_request_sql_queries', 'SQL queries executed per ElevenLabs API request.',
+    labels=('route',), buckets=QUERY_COUNT_BUCKETS)
+LIMIT_DENIALS = Counter(
+    'elevenlabs_limit_denials_total', 'Widget requests denied by a usage or rate limit.',
+    labels=('reason',))
+
+
+def count_limit_denial(reason):
+    """Count a request denied by a limit: rate_limited, daily_limit, global_limit, ..."""
+    LIMIT_DENIALS.inc(reason)
+
+
+def _get_outcome(result):
+    """Classify a route result: success, failure (handled error) or the HTTP status"""
+    if isinstance(result, dict):
+        return 'failure' if result.get('success') is False else 'success'
+    status_code = getattr(result, 'status_code', None)
+    if status_code is not None:
+        return str(status_code)
+    return 'success'
+
+
+def instrument_route(func):
+    """
+    Record the outcome, wall time and SQL query count of a controller route.
+    Apply it below ``@http.route``.
+    """
+    route = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        cr = request.env.cr if request else None
+        query_count = cr.sql_log_count if cr is not None else 0
+        start = time.perf_counter()
+        outcome = 'exception'
+        try:
+            result = func(*args, **kwargs)
+            outcome = _get_outcome(result)
+            return result
+        finally:
+            REQUESTS.inc(route, outcome)
+            REQUEST_DURATION.observe(time.perf_counter() - start, route)
+            if cr is not None:
+                REQUEST_QUERIES.observe(cr.sql_log_count - query_count, route)
+
+    return wrapper
+
+
+def render(cache_stats=None):
+    """
+    Render every metric, plus the given result cache stats, in the
+    Prometheus text format.
+
+    Args:
+        cache_stats: dict mapping cache name to TTLCache.stats()
+
+    Returns: str
+    """
+    worker = (('worker', os.getpid()),)
+    lines = []
+    with _scrape_lock:
+        for metric in _registry:
+            lines.extend(metric.render(worker))
+
+    cache_metrics = [
+        ('elevenlabs_cache_hits_total', 'counter', 'Lookups answered by an ElevenLabs result cache.', 'hits'),
+        ('elevenlabs_cache_misses_total', 'counter', 'Lookups missed by an ElevenLabs result cache.', 'misses'),
+        ('elevenlabs_cache_evictions_total', 'counter', 'Entries evicted from an ElevenLabs result cache.', 'evictions'),
+        ('elevenlabs_cache_entries', 'gauge', 'Entries held by an ElevenLabs result cache.', 'size'),
+        ('elevenlabs_cache_hit_ratio', 'gauge', 'Hit ratio of an ElevenLabs result cache.', 'hit_ratio'),
+    ]
+    for name, metric_type, documentation, key in cache_metrics:
+        lines.append('# HELP %s %s' % (name, documentation))
+        lines.append('# TYPE %s %s' % (name, metric_type))
+        for cache_name, stats in sorted((cache_stats or {}).items()):
+            lines.append('%s%s %s' % (
+                name, _format_labels(('cache',), (cache_name,), worker), _format_value(stats[key])))
+    return '\n'.join(lines) + '\n'
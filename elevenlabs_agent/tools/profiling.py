@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Opt-in profiling of the ElevenLabs API routes.
+
+When enabled in the settings, every call records its wall time and, via
+the cursor query hooks of the current thread, the count and time of its
+SQL statements. Calls slower than the threshold are logged as one JSON
+record with the route, the redacted parameters and the most expensive
+statements. A sample of the calls is also run under cProfile and dumped
+to the Odoo data directory for offline analysis (pstats, snakeviz).
+"""
+
+import cProfile
+import functools
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+
+from odoo.http import request
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+# Parameters whose value is never logged (matched as substrings, case-insensitive)
+REDACTED_PARAMS = (
+    'email', 'login', 'password', 'token', 'secret', 'identifier', 'public_user',
+    'user_agent', 'referrer', 'ip_address', 'client_ip', 'phone',
+)
+
+# Number of statements reported in a slow call record
+TOP_STATEMENTS = 5
+
+# Profile dumps kept per database, the oldest are removed first
+MAX_PROFILE_DUMPS = 100
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _redact(value):
+    """Replace the sensitive values of nested dicts and lists"""
+    if isinstance(value, dict):
+        return {
+            name: '***' if any(marker in str(name).lower() for marker in REDACTED_PARAMS) else _redact(item)
+            for name, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [_redact(item) for item in value]
+    return value
+
+
+def redact_params(params, max_length=100):
+    """
+    Returns: dict of the route parameters safe to log, with sensitive
+    values replaced (also inside nested values) and long values truncated
+    """
+    redacted = {}
+    for name, value in _redact(params).items():
+        text = value if isinstance(value, str) else json.dumps(value, default=str)
+        redacted[name] = text if len(text) <= max_length else text[:max_length] + '...'
+    return redacted
+
+
+def summarize_statements(statements, limit=TOP_STATEMENTS):
+    """
+    Group the statements of a call by text.
+
+    Args:
+        statements: list of (query, duration in seconds)
+
+    Returns: list of dicts with {statement, count, total_ms}, most expensive first
+    """
+    totals = defaultdict(lambda: [0, 0.0])
+    for query, duration in statements:
+        if isinstance(query, bytes):
+            query = query.decode(errors='replace')
+        total = totals[_WHITESPACE.sub(' ', str(query)).strip()]
+        total[0] += 1
+        total[1] += duration
+    ranked = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+    return [
+        {'statement': statement[:500], 'count': count, 'total_ms': round(duration * 1000, 2)}
+        for statement, (count, duration) in ranked
+    ]
+
+
+def _dump_profile(profiler, dbname, route):
+    """
+    Write a cProfile dump and drop the oldest ones beyond MAX_PROFILE_DUMPS.
+
+    Returns: path of the dump
+    """
+    directory = os.path.join(config['data_dir'], 'elevenlabs_profiles', dbname)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, '%s-%s-%s.prof' % (
+        time.strftime('%Y%m%d-%H%M%S'), route, os.getpid()))
+    profiler.dump_stats(path)
+
+    dumps = sorted(entry for entry in os.listdir(directory) if entry.endswith('.prof'))
+    for entry in dumps[:-MAX_PROFILE_DUMPS]:
+        try:
+            os.remove(os.path.join(directory, entry))
+        except OSError:
+            pass
+    return path
+
+
+def profile_route(func):
+    """
+    Profile a controller route when profiling is enabled in the settings.
+    Apply it below ``@http.route``.
+    """
+    route = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        settings = request.env['elevenlabs.settings'].sudo() if request else None
+        if settings is None or not settings.get('profiling_enabled'):
+            return func(*args, **kwargs)
+
+        statements = []
+
+        def query_hook(cr, query, params, start, delay, *_extra):
+            statements.append((query, delay))
+
+        thread = threading.current_thread()
+        if not hasattr(thread, 'query_hooks'):
+            thread.query_hooks = []
+        thread.query_hooks.append(query_hook)
+
+        profiler = None
+        if random.random() < settings.get('profiling_sample_rate'):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # another profiler (e.g. Odoo's) is already active
+                profiler = None
+
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            wall_time = time.perf_counter() - start
+            if profiler:
+                profiler.disable()
+            thread.query_hooks.remove(query_hook)
+            try:
+                _report(settings, route, kwargs, wall_time, statements, profiler)
+            except Exception:
+                _logger.exception("ElevenLabs profiling of %s failed", route)
+
+    return wrapper
+
+
+def _report(settings, route, params, wall_time, statements, profiler):
+    dbname = request.env.cr.dbname
+    profile_path = _dump_profile(profiler, dbname, route) if profiler else None
+    threshold = settings.get('profiling_slow_threshold')
+    if wall_time * 1000 < threshold:
+        if profile_path:
+            _logger.info("ElevenLabs profile of %s written to %s", route, profile_path)
+        return
+
+    record = {
+        'route': route,
+        'db': dbname,
+        'wall_ms': round(wall_time * 1000, 2),
+        'sql_count': len(statements),
+        'sql_ms': round(sum(delay for _query, delay in statements) * 1000, 2),
+        'threshold_ms': threshold,
+        'params': redact_params(params),
+        'top_sql': summarize_statements(statements),
+        'profile': profile_path,
+    }
+    _logger.warning("ElevenLabs slow call: %s", json.dumps(record, sort_keys=True))
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+Rate limiter engine for the ElevenLabs usage endpoints.
+
+Two algorithms are available:
+- token_bucket: bursts up to ``limit`` requests, refilled continuously
+  at ``limit / window`` tokens per second
+- sliding_window: sliding window counter, weighting the previous fixed
+  window by how much of it still overlaps the sliding window
+
+Two backends store the limiter state:
+- MemoryBackend: per-process dictionary with LRU eviction (default)
+- RedisBackend: shared store so every worker agrees on the counts. It
+  works with any client exposing the redis ``eval`` API, including a
+  local stand-in such as fakeredis.
+
+The shared backend is optional: when it cannot be built or does not
+answer, the limiter logs a warning and counts in a per-process memory
+backend instead, so an outage never denies every request.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from urllib.parse import urlsplit
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+_logger = logging.getLogger(__name__)
+
+ALGORITHMS = ('token_bucket', 'sliding_window')
+
+REDIS_URL_SCHEMES = ('redis', 'rediss', 'unix')
+
+# Seconds a redis command may wait for the connection or the answer
+REDIS_TIMEOUT = 0.5
+
+# Seconds the fallback backend is used after a shared backend error,
+# before the shared backend is tried again
+FALLBACK_RETRY_DELAY = 30
+
+Decision = namedtuple('Decision', ['allowed', 'remaining', 'retry_after'])
+
+
+def check_redis_url(url):
+    """
+    Raise ValueError when the shared backend cannot be built from ``url``:
+    the redis package is missing or ``url`` is not a redis URL
+    """
+    if redis is None:
+        raise ValueError("The 'redis' python package is required for the shared rate limiter backend.")
+    if not url or urlsplit(url).scheme not in REDIS_URL_SCHEMES:
+        raise ValueError("The rate limiter Redis URL must start with redis://, rediss:// or unix://.")
+
+
+class MemoryBackend:
+    """In-process limiter state with LRU eviction"""
+
+    # exceptions raised when the backend is unavailable
+    errors = ()
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_state(self, key, default):
+        state = self._states.get(key)
+        if state is None:
+            state = default
+            self._states[key] = state
+            if len(self._states) > self.max_keys:
+                self._states.popitem(last=False)
+        else:
+            self._states.move_to_end(key)
+        return state
+
+    def token_bucket(self, key, capacity, refill_rate, cost, now):
+        with self._lock:
+            state = self._get_state(key, [float(capacity), now])
+            tokens = min(capacity, state[0] + (now - state[1]) * refill_rate)
+            state[1] = now
+            if tokens >= cost:
+                state[0] = tokens - cost
+                return Decision(True, int(state[0]), 0.0)
+            state[0] = tokens
+            return Decision(False, int(tokens), (cost - tokens) / refill_rate)
+
+    def sliding_window(self, key, limit, window, cost, now):
+        with self._lock:
+            current_window = math.floor(now / window)
+            # state: [window index, count in window, count in previous window]
+            state = self._get_state(key, [current_window, 0, 0])
+            if state[0] != current_window:
+                state[2] = state[1] if state[0] == current_window - 1 else 0
+                state[1] = 0
+                state[0] = current_window
+            elapsed = (now - current_window * window) / window
+            weighted = state[2] * (1 - elapsed) + state[1]
+            if weighted + cost <= limit:
+                state[1] += cost
+                return Decision(True, int(limit - weighted - cost), 0.0)
+            return Decision(False, max(0, int(limit - weighted)), (1 - elapsed) * window)
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+
+    def __len__(self):
+        return len(self._states)
+
+
+class RedisBackend:
+    """Limiter state shared by every worker through a redis compatible store"""
+
+    TOKEN_BUCKET_SCRIPT = """
+        local capacity = tonumber(ARGV[1])
+        local refill_rate = tonumber(ARGV[2])
+        local cost = tonumber(ARGV[3])
+        local now = tonumber(ARGV[4])
+        local ttl = tonumber(ARGV[5])
+        local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+        local tokens = tonumber(state[1]) or capacity
+        local ts = tonumber(state[2]) or now
+        tokens = math.min(capacity, tokens + (now - ts) * refill_rate)
+        local allowed = 0
+        if tokens >= cost then
+            tokens = tokens - cost
+            allowed = 1
+        end
+        redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+        redis.call('EXPIRE', KEYS[1], ttl)
+        return {allowed, tostring(tokens)}
+    """
+
+    SLIDING_WINDOW_SCRIPT = """
+        local limit = tonumber(ARGV[1])
+        local window = tonumber(ARGV[2])
+        local cost = tonumber(ARGV[3])
+        local now = tonumber(ARGV[4])
+        local current_window = math.floor(now / window)
+        local current_key = KEYS[1] .. ':' .. current_window
+        local previous_key = KEYS[1] .. ':' .. (current_window - 1)
+        local current = tonumber(redis.call('GET', current_key)) or 0
+        local previous = tonumber(redis.call('GET', previous_key)) or 0
+        local elapsed = (now - current_window * window) / window
+        local weighted = previous * (1 - elapsed) + current
+        if weighted + cost <= limit then
+            redis.call('INCRBY', current_key, cost)
+            redis.call('EXPIRE', current_key, math.ceil(window * 2))
+            return {1, tostring(limit - weighted - cost)}
+        end
+        return {0, tostring(limit - weighted)}
+    """
+
+    errors = (OSError,) + ((redis.RedisError,) if redis is not None else ())
+
+    def __init__(self, client, prefix='elevenlabs:rl:'):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        check_redis_url(url)
+        return cls(redis.Redis.from_url(
+            url, socket_timeout=REDIS_TIMEOUT, socket_connect_timeout=REDIS_TIMEOUT), **kwargs)
+
+    def token_bucket(self, key, capacity, refill_rate, cost, now):
+        ttl = max(1, math.ceil(capacity / refill_rate))
+        allowed, tokens = self.client.eval(
+            self.TOKEN_BUCKET_SCRIPT, 1, self.prefix + key, capacity, refill_rate, cost, now, ttl)
+        tokens = float(tokens)
+        if int(allowed):
+            return Decision(True, int(tokens), 0.0)
+        return Decision(False, int(tokens), (cost - tokens) / refill_rate)
+
+    def sliding_window(self, key, limit, window, cost, now):
+        allowed, remaining = self.client.eval(
+            self.SLIDING_WINDOW_SCRIPT, 1, self.prefix + key, limit, window, cost, now)
+        remaining = max(0, int(float(remaining)))
+        if int(allowed):
+            return Decision(True, remaining, 0.0)
+        elapsed = (now % window) / window
+        return Decision(False, remaining, (1 - elapsed) * window)
+
+
+class RateLimiter:
+    """
+    Apply one algorithm with a fixed limit over a backend, and over the
+    ``fallback`` backend while the first one is unavailable
+    """
+
+    def __init__(self, backend, algorithm='token_bucket', limit=60, window=60, fallback=None):
+        if algorithm not in ALGORITHMS:
+            raise ValueError("Unknown rate limiting algorithm: %s" % algorithm)
+        if limit <= 0 or window <= 0:
+            raise ValueError("Rate limit and window must be positive.")
+        self.backend = backend
+        self.algorithm = algorithm
+        self.limit = limit
+        self.window = window
+        self.fallback = fallback
+        # time before which the fallback is used without trying the backend
+        self._fallback_until = 0
+
+    def _apply(self, backend, key, cost, now):
+        if self.algorithm == 'token_bucket':
+            return backend.token_bucket(key, self.limit, self.limit / self.window, cost, now)
+        return backend.sliding_window(key, self.limit, self.window, cost, now)
+
+    def hit(self, key, cost=1, now=None):
+        """
+        Consume ``cost`` units for ``key``.
+
+        Returns: Decision(allowed, remaining, retry_after) where retry_after
+        is the number of seconds to wait before the request would be allowed
+        """
+        now = time.time() if now is None else now
+        if self.fallback is None:
+            return self._apply(self.backend, key, cost, now)
+        if time.monotonic() < self._fallback_until:
+            return self._apply(self.fallback, key, cost, now)
+        try:
+            decision = self._apply(self.backend, key, cost, now)
+        except self.backend.errors as e:
+            if not self._fallback_until:
+                _logger.warning("Rate limiter backend unavailable, counting per process until it answers: %s", e)
+            self._fallback_until = time.monotonic() + FALLBACK_RETRY_DELAY
+            return self._apply(self.fallback, key, cost, now)
+        if self._fallback_until:
+            self._fallback_until = 0
+            _logger.info("Rate limiter backend available again")
+        return decision
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(dbname, algorithm, limit, window, backend='memory', redis_url=None, max_keys=10000):
+    """
+    Return the limiter of a database, rebuilding it when its configuration changes.
+
+    Limiters are kept per process so the memory backend state survives
+    across requests handled by the same worker.
+    """
+    config = (algorithm, limit, window, backend, redis_url, max_keys)
+    limiter_config = _limiters.get(dbname)
+    if limiter_config and limiter_config[0] == config:
+        return limiter_config[1]
+    with _limiters_lock:
+        limiter_config = _limiters.get(dbname)
+        if limiter_config and limiter_config[0] == config:
+            return limiter_config[1]
+        store = fallback = None
+        if backend == 'redis':
+            try:
+                store = RedisBackend.from_url(redis_url)
+                fallback = MemoryBackend(max_keys=max_keys)
+            except ValueError as e:
+                _logger.warning("Rate limiter backend not available, counting per process: %s", e)
+        if store is None:
+            store = MemoryBackend(max_keys=max_keys)
+        limiter = RateLimiter(store, algorithm=algorithm, limit=limit, window=window, fallback=fallback)
+        _limiters[dbname] = (config, limiter)
+        return limiter
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Request classifiers used to decide server-side whether a page gets the
+widget: page type from the route, device class from the user agent and
+country from a local GeoIP2 database.
+
+Every classifier is memoized per process with a bounded LRU cache, as
+the same user agents and client IPs come back on every page view.
+"""
+
+import functools
+import logging
+import re
+
+from odoo.tools import config
+
+try:
+    import geoip2.database
+    import geoip2.errors
+except ImportError:
+    geoip2 = None
+
+_logger = logging.getLogger(__name__)
+
+MOBILE_USER_AGENT = re.compile(r'Android|webOS|iPhone|iPad|iPod|BlackBerry|IEMobile|Opera Mini', re.IGNORECASE)
+
+# Country names commonly used instead of their ISO 3166 code
+COUNTRY_ALIASES = {'UK': 'GB'}
+
+
+def get_page_type(path, lang_url_code=None):
+    """
+    Page type of a website path, as matched by the page visibility settings:
+    'homepage' for the root, otherwise the first path segment (after the
+    language prefix, if any).
+    """
+    segments = [segment for segment in (path or '').split('/') if segment]
+    if segments and lang_url_code and segments[0] == lang_url_code:
+        segments = segments[1:]
+    return segments[0] if segments else 'homepage'
+
+
+@functools.lru_cache(maxsize=1024)
+def get_device_class(user_agent):
+    """
+    Returns: 'mobile' or 'desktop'
+    """
+    return 'mobile' if MOBILE_USER_AGENT.search(user_agent or '') else 'desktop'
+
+
+@functools.lru_cache(maxsize=4)
+def _get_geoip_reader(path):
+    return geoip2.database.Reader(path)
+
+
+@functools.lru_cache(maxsize=4096)
+def get_country_code(ip_address):
+    """
+    Country of an IP address from the local GeoIP2 database configured for
+    Odoo (geoip_country_db, else geoip_city_db).
+
+    Returns: ISO 3166 alpha-2 code, or None when unknown (no geoip2
+    package or database, private or unlisted address)
+    """
+    if geoip2 is None or not ip_address:
+        return None
+    for option in ('geoip_country_db', 'geoip_city_db'):
+        path = config.get(option)
+        if not path:
+            continue
+        try:
+            reader = _get_geoip_reader(path)
+            if option == 'geoip_country_db':
+                return reader.country(ip_address).country.iso_code
+            return reader.city(ip_address).country.iso_code
+        except (OSError, ValueError, TypeError, RuntimeError, geoip2.errors.GeoIP2Error) as e:
+            _logger.debug("GeoIP lookup of %s in %s failed: %s", ip_address, path, e)
+    return None
+
+
+def parse_country_codes(raw):
+    """
+    Returns: frozenset of upper-case country codes from a comma-separated setting
+    """
+    codes = (code.strip().upper() for code in (raw or '').split(','))
+    return frozenset(COUNTRY_ALIASES.get(code, code) for code in codes if code)
+
+
+def parse_page_types(raw):
+    """
+    Returns: frozenset of page types from a comma-separated setting
+    """
+    return frozenset(page.strip() for page in (raw or '').split(',') if page.strip())